@@ -29,4 +29,7 @@ along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 
-__all__ = ['cosmology', 'lcdmcosmology', 'structures', 'structuresPS']
\ No newline at end of file
+__all__ = ['cosmology', 'lcdmcosmology', 'structures', 'structuresPS',
+           'quadrature', 'executor', 'arraycache', 'cachekey',
+           'cachemanager', 'warmup', 'registry',
+           'integrators', 'sweep']
\ No newline at end of file
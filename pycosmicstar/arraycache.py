@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Persistent dictionary of numpy arrays.
+
+Each table is stored in its own .npy file, inside the directory
+<name>.arrays, and an index file keeps the keys of the tables. The tables
+are read as memory maps, so loading a table do not copy it. The files
+are written in a temporary file and renamed, so tables already mapped
+are not changed.
+
+The cache can be shared by many processes. The index is changed under a
+file lock, the tables written together are added to it in one commit,
+and the lock of a table (ArrayCache.lock) let only one process calculate
+it while the others wait for the result.
+
+The index keeps also the version of the tables. If it is not the
+version expected by the model, the tables are removed when the cache is
+opened.
+
+The tables of an old cache file, <name>.cache, written by
+filedict.FileDict, are imported on the first use of the directory.
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from numpy import asarray, load, save, ndarray, number
+
+from .cachekey import normalize
+
+import sys
+pyversion = sys.version_info
+if pyversion[0] >= 3:
+    from . import filedict
+else:
+    from . import filedict_old as filedict
+
+INDEX = "index.json"
+INDEX_LOCK = "index.lock"
+
+
+def _fileName(key):
+    """Return the name of the file of the table key"""
+    if(isinstance(key, tuple)):
+        name = "_".join([str(part) for part in key])
+    else:
+        name = str(key)
+    return name.replace(os.sep, "-") + ".npy"
+
+
+@contextmanager
+def file_lock(path):
+    """Hold the exclusive lock of the file path, shared by all the
+    processes. Without fcntl nothing is locked.
+    """
+    with open(path, "a") as lockFile:
+        if(fcntl is not None):
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if(fcntl is not None):
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+
+def _writeAtomic(path, write):
+    """Write the file path by write(fileObject) in a temporary file that is
+    then renamed to path.
+    """
+    fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path),
+                                   suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fileObject:
+            write(fileObject)
+        os.replace(tmpPath, path)
+    except:
+        os.remove(tmpPath)
+        raise
+
+
+class ArrayCache(object):
+    """A dictionary of numpy arrays stored in the directory
+    name + '.arrays'. Keys are strings or tuples of strings and numbers.
+    Scalars are stored as arrays of dimension zero and are returned as
+    python numbers.
+
+    Keyword arguments:
+        name -- path of the cache, without extension
+        mmap -- (default True) if True the tables are read as read only
+                memory maps
+        version -- (default None) version of the tables (see
+                   cachekey.version_tag)
+        parameters -- (default None) parameters of the tables, stored in
+                      the index to identify the cache
+        legacyFile -- (default name + '.cache') old cache file imported
+                      on the first use
+        legacyKeys -- (default None, all the tables) keys of the tables
+                      imported from legacyFile
+    """
+
+    def __init__(self, name, mmap=True, version=None, parameters=None,
+                 legacyFile=None, legacyKeys=None):
+        self.__directory = name + ".arrays"
+        self.__mmapMode = "r" if mmap else None
+        self.__version = version
+        self.__parameters = normalize(parameters)
+
+        with self.__fileLock(INDEX_LOCK):
+            self.__index = self.__readIndex()
+            if self.__index is None:
+                self.__clear()
+                if(legacyFile is None):
+                    legacyFile = name + ".cache"
+                self.__migrate(legacyFile, legacyKeys)
+                self.__writeIndex(self.__index)
+
+    def __makeDirectory(self):
+        """Create the directory, if it does not exist or was removed by
+        the cache manager.
+        """
+        if not os.path.isdir(self.__directory):
+            try:
+                os.makedirs(self.__directory)
+            except OSError:
+                if not os.path.isdir(self.__directory):
+                    raise
+
+    def __fileLock(self, lockName):
+        """Return the lock of the file lockName of the directory"""
+        self.__makeDirectory()
+        return file_lock(os.path.join(self.__directory, lockName))
+
+    @contextmanager
+    def lock(self, key):
+        """Context that hold the lock of the table key. Only one process,
+        or thread, hold it at a time, so the table is calculated once: the
+        others wait and find the table in the cache, e.g.
+
+            with cache.lock('sg'):
+                if 'sg' not in cache:
+                    cache['sg'] = calculateSigma()
+        """
+        with self.__fileLock(_fileName(key) + ".lock"):
+            self.__refresh()
+            yield self
+
+    def __readIndex(self):
+        """Return the index of the tables, or None if there is no index or
+        its version is not the version of the cache.
+        """
+        try:
+            with open(os.path.join(self.__directory, INDEX)) as fileObject:
+                index = json.load(fileObject)
+            if(index["version"] != self.__version):
+                return None
+            tables = index["tables"]
+        except (IOError, ValueError, KeyError, TypeError):
+            return None
+        return dict([(fileName, tuple(key) if isinstance(key, list)
+                      else key) for fileName, key in tables.items()])
+
+    def __refresh(self):
+        """Read the tables added to the index by other processes"""
+        index = self.__readIndex()
+        if(index is not None):
+            self.__index = index
+
+    def __clear(self):
+        """Remove the tables of the directory"""
+        self.__index = {}
+        for fileName in os.listdir(self.__directory):
+            if(fileName.endswith(".npy")):
+                os.remove(os.path.join(self.__directory, fileName))
+
+    def __writeIndex(self, index):
+        data = json.dumps({"version": self.__version,
+                           "parameters": self.__parameters,
+                           "tables": index}, sort_keys=True).encode()
+        _writeAtomic(os.path.join(self.__directory, INDEX),
+                     lambda fileObject: fileObject.write(data))
+
+    def __commit(self, added=None, removed=()):
+        """Add and remove tables of the index. The index of the directory is
+        read, changed and written under its lock, so the tables committed
+        by other processes are kept. The tables added are visible to the
+        other processes only after the commit, all at once.
+        """
+        with self.__fileLock(INDEX_LOCK):
+            index = self.__readIndex()
+            if(index is None):
+                index = {}
+            if(added is not None):
+                index.update(added)
+            for fileName in removed:
+                index.pop(fileName, None)
+            self.__writeIndex(index)
+            self.__index = index
+
+    def __migrate(self, oldCacheFile, keys=None):
+        """Import the tables keys, or all the tables if keys is None, of
+        the old cache file oldCacheFile
+        """
+        if not os.path.exists(oldCacheFile):
+            return
+        try:
+            oldCache = filedict.FileDict(filename=oldCacheFile)
+            items = list(oldCache.items())
+        except Exception:
+            return
+        for key, value in items:
+            if(keys is not None and key not in keys):
+                continue
+            if(isinstance(value, (ndarray, float, int, number))):
+                fileName = self.__save(key, value)
+                self.__index[fileName] = key
+
+    def __save(self, key, value):
+        """Write the file of the table key and return its name"""
+        fileName = _fileName(key)
+        self.__makeDirectory()
+        _writeAtomic(os.path.join(self.__directory, fileName),
+                     lambda fileObject: save(fileObject, asarray(value)))
+        return fileName
+
+    def __load(self, key, fileName):
+        try:
+            value = load(os.path.join(self.__directory, fileName),
+                         mmap_mode=self.__mmapMode)
+        except (IOError, ValueError):
+            raise KeyError(key)
+        if(value.ndim == 0):
+            return value.item()
+        return value
+
+    def __getitem__(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        """Return the list of the tables keys. The index is read again at
+        most once, if some table is missing. Raise KeyError if a table is
+        not in the cache.
+        """
+        fileNames = [_fileName(key) for key in keys]
+        if any([fileName not in self.__index for fileName in fileNames]):
+            self.__refresh()
+        for key, fileName in zip(keys, fileNames):
+            if fileName not in self.__index:
+                raise KeyError(key)
+        return [self.__load(key, fileName)
+                for key, fileName in zip(keys, fileNames)]
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def update(self, tables):
+        """Store all the tables of the dictionary tables in a single commit
+        of the index.
+        """
+        added = dict([(self.__save(key, value), key)
+                      for key, value in list(tables.items())])
+        self.__commit(added=added)
+
+    def set_many(self, tables):
+        """Same as update"""
+        self.update(tables)
+
+    def __delitem__(self, key):
+        fileName = _fileName(key)
+        if fileName not in self.__index:
+            raise KeyError(key)
+        self.__commit(removed=[fileName])
+        try:
+            os.remove(os.path.join(self.__directory, fileName))
+        except OSError:
+            pass
+
+    def __contains__(self, key):
+        if _fileName(key) not in self.__index:
+            self.__refresh()
+        return _fileName(key) in self.__index
+
+    def __iter__(self):
+        return iter(list(self.__index.values()))
+
+    def keys(self):
+        return list(self.__index.values())
+
+    def __len__(self):
+        return len(self.__index)
+
+    def getDirectory(self):
+        """Return the directory of the tables"""
+        return self.__directory
+
+    def getVersion(self):
+        """Return the version of the tables"""
+        return self.__version
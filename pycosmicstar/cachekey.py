@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Names of the cache files from the parameters of the models.
+
+The parameters are normalized, so equivalent values (0.7 and 0.70, 200
+and 200.0) give the same name, and hashed together with the version of
+the tables. The version is also stored with the tables, and tables of
+other version are discarded when the cache is opened (see arraycache).
+
+    SCHEMA_VERSION -- version of the layout of the cache
+    ALGORITHM_VERSIONS -- version of the algorithms of each kind of table.
+                          It must be increased when a change of the code
+                          changes the values of the tables.
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import json
+import hashlib
+from numbers import Number
+
+SCHEMA_VERSION = 1
+
+ALGORITHM_VERSIONS = {"cosmology": 1,
+                      "structures": 3,
+                      "csfr": 7,
+                      "imf": 1
+                      }
+
+#Significant digits kept of the numerical parameters
+DIGITS = 12
+
+
+def normalize(value):
+    """Return value in a canonical form: numbers as floats with DIGITS
+    significant digits, sequences as lists and dictionaries with
+    normalized values.
+    """
+    if(value is None or isinstance(value, (bool, str))):
+        return value
+    if(isinstance(value, Number)):
+        return float("%.*g" % (DIGITS, float(value)))
+    if(isinstance(value, dict)):
+        return dict([(str(k), normalize(v)) for k, v in value.items()])
+    if(isinstance(value, (list, tuple))):
+        return [normalize(v) for v in value]
+    if(hasattr(value, "item")):
+        return normalize(value.item())
+    return str(value)
+
+
+def version_tag(kind):
+    """Return the version of the tables of kind"""
+    if(kind not in ALGORITHM_VERSIONS):
+        raise NameError("Kind of cache not defined: " + str(kind))
+    return "%d.%d" % (SCHEMA_VERSION, ALGORITHM_VERSIONS[kind])
+
+
+def cache_key(kind, parameters):
+    """Return the hash of the normalized parameters and of the version of
+    the tables of kind.
+
+    Keyword arguments:
+        kind -- 'cosmology', 'structures', 'csfr' or 'imf'
+        parameters -- dictionary with the parameters of the tables
+    """
+    payload = json.dumps({"kind": kind,
+                          "version": version_tag(kind),
+                          "parameters": normalize(parameters)},
+                         sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def cache_name(kind, label, parameters):
+    """Return the name of the cache file, kind_label_hash, where label is
+    only to make the name readable.
+    """
+    return "%s_%s_%s" % (kind, label, cache_key(kind, parameters))
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Manager of the cache directory, by default ~/.cosmicstarformation.
+
+The entries of the directory are the tables of the models (<name>.arrays,
+see arraycache) and the old sqlite cache files (<name>.cache). The manager
+keeps, in the file cachestats.json of the directory, the last access of
+each entry, the byte budget of the directory and the counters of hits,
+misses and evictions. When the budget is set, the entries used least
+recently are removed until the directory fits in it. The entries opened
+by the running process are never removed.
+
+The models record their accesses by record_access. The directory can be
+inspected and cleaned from the command line:
+
+    pycosmicstar-cache stats
+    pycosmicstar-cache list
+    pycosmicstar-cache budget 2G
+    pycosmicstar-cache evict
+    pycosmicstar-cache clear
+
+or python -m pycosmicstar.cachemanager.
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from contextlib import contextmanager
+
+from .arraycache import file_lock, _writeAtomic
+
+STATS = "cachestats.json"
+STATS_LOCK = "cachestats.lock"
+
+#Extensions of the entries, and of the files that go with the old sqlite
+#cache files.
+ENTRY_EXTENSIONS = (".arrays", ".cache")
+SQLITE_SUFFIXES = ("", "-wal", "-shm", "-journal")
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3,
+          "T": 1024 ** 4}
+
+_managers = {}
+
+
+def default_directory():
+    """Return the default cache directory"""
+    return os.path.join(os.path.expanduser('~'), '.cosmicstarformation')
+
+
+def parse_size(text):
+    """Return the number of bytes of text, e.g. '500M', '2G' or '1024'"""
+    text = str(text).strip().upper()
+    if(text.endswith("B")):
+        text = text[:-1]
+    unit = text[-1:] if text[-1:] in _UNITS else ""
+    try:
+        value = float(text[:len(text) - len(unit)])
+    except ValueError:
+        raise NameError("Size not defined: " + str(text))
+    return int(value * _UNITS[unit])
+
+
+def format_size(size):
+    """Return size in bytes in a readable form"""
+    for unit in ["", "K", "M", "G"]:
+        if(size < 1024):
+            return "%.1f%sB" % (size, unit)
+        size = size / 1024.0
+    return "%.1fTB" % size
+
+
+def _entrySize(path):
+    if(os.path.isdir(path)):
+        size = 0
+        for fileName in os.listdir(path):
+            try:
+                size += os.path.getsize(os.path.join(path, fileName))
+            except OSError:
+                pass
+        return size
+    size = 0
+    for suffix in SQLITE_SUFFIXES:
+        if(os.path.exists(path + suffix)):
+            size += os.path.getsize(path + suffix)
+    return size
+
+
+def _removeEntry(path):
+    """Remove the entry path. A directory is first renamed, so the
+    processes do not see it half removed.
+    """
+    if(os.path.isdir(path)):
+        trash = "%s.evicted-%d" % (path, os.getpid())
+        try:
+            os.rename(path, trash)
+        except OSError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+    else:
+        for suffix in SQLITE_SUFFIXES:
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+class CacheManager(object):
+    """Accesses, budget and counters of a cache directory.
+
+    Keyword arguments:
+        directory -- (default ~/.cosmicstarformation) the cache directory
+        maxBytes -- (default None) budget of the directory in bytes. If
+                    None, the budget stored in the directory is used.
+    """
+
+    def __init__(self, directory=None, maxBytes=None):
+        if(directory is None):
+            directory = default_directory()
+        self.__directory = os.path.abspath(directory)
+        self.__maxBytes = maxBytes
+        self.__protected = set()
+
+    def getDirectory(self):
+        """Return the cache directory"""
+        return self.__directory
+
+    def __emptyStats(self):
+        return {"budget": None, "hits": 0, "misses": 0, "evictions": 0,
+                "access": {}}
+
+    def __readStats(self):
+        try:
+            with open(os.path.join(self.__directory, STATS)) as fileObject:
+                stats = json.load(fileObject)
+        except (IOError, ValueError):
+            return self.__emptyStats()
+        return dict(self.__emptyStats(), **stats)
+
+    @contextmanager
+    def __stats(self):
+        """Context that yield the stats of the directory, to be changed, and
+        write them back under the lock of the stats file.
+        """
+        if not os.path.isdir(self.__directory):
+            os.makedirs(self.__directory)
+        with file_lock(os.path.join(self.__directory, STATS_LOCK)):
+            stats = self.__readStats()
+            yield stats
+            data = json.dumps(stats, sort_keys=True).encode()
+            _writeAtomic(os.path.join(self.__directory, STATS),
+                         lambda fileObject: fileObject.write(data))
+
+    def entries(self):
+        """Return the entries of the directory, from the least to the most
+        recently used, as dictionaries with name, path, size (bytes) and
+        access (time of the last access). Entries never recorded have the
+        time of their last change.
+        """
+        if not os.path.isdir(self.__directory):
+            return []
+        access = self.__readStats()["access"]
+        entries = []
+        for name in os.listdir(self.__directory):
+            if not name.endswith(ENTRY_EXTENSIONS):
+                continue
+            path = os.path.join(self.__directory, name)
+            try:
+                lastAccess = access.get(name, os.path.getmtime(path))
+            except OSError:
+                continue
+            entries.append({"name": name, "path": path,
+                            "size": _entrySize(path),
+                            "access": lastAccess})
+        entries.sort(key=lambda entry: entry["access"])
+        return entries
+
+    def usage(self):
+        """Return the bytes used by the entries"""
+        return sum([entry["size"] for entry in self.entries()])
+
+    def getBudget(self):
+        """Return the budget of the directory in bytes, or None"""
+        if(self.__maxBytes is not None):
+            return self.__maxBytes
+        return self.__readStats()["budget"]
+
+    def setBudget(self, maxBytes):
+        """Store the budget of the directory, None to remove it"""
+        with self.__stats() as stats:
+            stats["budget"] = None if maxBytes is None else int(maxBytes)
+
+    def access(self, path, hit):
+        """Record an access to the entry path, a hit if its tables were
+        already in the cache, and remove the least recently used entries if
+        the directory is over its budget.
+        """
+        name = os.path.basename(os.path.normpath(path))
+        self.__protected.add(name)
+        with self.__stats() as stats:
+            stats["access"][name] = time.time()
+            stats["hits" if hit else "misses"] += 1
+        if(self.getBudget() is not None):
+            self.evict()
+
+    def evict(self, maxBytes=None):
+        """Remove the least recently used entries, except the ones opened
+        by this process, until the directory fits in maxBytes (default the
+        budget). Return the names of the entries removed.
+        """
+        if(maxBytes is None):
+            maxBytes = self.getBudget()
+        if(maxBytes is None):
+            return []
+
+        entries = self.entries()
+        usage = sum([entry["size"] for entry in entries])
+        removed = []
+        for entry in entries:
+            if(usage <= maxBytes):
+                break
+            if(entry["name"] in self.__protected):
+                continue
+            _removeEntry(entry["path"])
+            usage -= entry["size"]
+            removed.append(entry["name"])
+
+        if(len(removed) > 0):
+            with self.__stats() as stats:
+                stats["evictions"] += len(removed)
+                for name in removed:
+                    stats["access"].pop(name, None)
+        return removed
+
+    def clear(self):
+        """Remove all the entries, except the ones opened by this process.
+        Return the names of the entries removed.
+        """
+        return self.evict(maxBytes=0)
+
+    def getStats(self):
+        """Return the counters of hits, misses and evictions, the number of
+        entries, the bytes used and the budget.
+        """
+        stats = self.__readStats()
+        entries = self.entries()
+        return {"hits": stats["hits"], "misses": stats["misses"],
+                "evictions": stats["evictions"], "entries": len(entries),
+                "bytes": sum([entry["size"] for entry in entries]),
+                "budget": self.getBudget()}
+
+    def resetStats(self):
+        """Set the counters to zero"""
+        with self.__stats() as stats:
+            stats["hits"] = stats["misses"] = stats["evictions"] = 0
+
+
+def get_manager(directory=None):
+    """Return the manager of directory shared by the models of the
+    process.
+    """
+    if(directory is None):
+        directory = default_directory()
+    directory = os.path.abspath(directory)
+    if(directory not in _managers):
+        _managers[directory] = CacheManager(directory)
+    return _managers[directory]
+
+
+def record_access(cache):
+    """Record the access of a model to the arraycache.ArrayCache cache. It
+    is a hit if the cache already has tables.
+    """
+    path = cache.getDirectory()
+    manager = get_manager(os.path.dirname(os.path.abspath(path)))
+    manager.access(path, hit=len(cache) > 0)
+
+
+def main(argv=None):
+    """Command line interface of the manager"""
+    parser = argparse.ArgumentParser(
+        prog="pycosmicstar-cache",
+        description="Manage the cache directory of pycosmicstar.")
+    parser.add_argument("--dir", default=None,
+                        help="cache directory (default %s)"
+                        % default_directory())
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("stats", help="show the counters and the usage")
+    commands.add_parser("list", help="list the entries, least recently "
+                        "used first")
+    budget = commands.add_parser("budget", help="show or set the budget, "
+                                 "e.g. 500M or 2G, 'none' to remove it")
+    budget.add_argument("size", nargs="?", default=None)
+    evict = commands.add_parser("evict", help="remove the least recently "
+                                "used entries over the budget")
+    evict.add_argument("size", nargs="?", default=None)
+    commands.add_parser("clear", help="remove all the entries")
+    commands.add_parser("reset", help="set the counters to zero")
+
+    args = parser.parse_args(argv)
+    manager = CacheManager(args.dir)
+
+    if(args.command == "list"):
+        for entry in manager.entries():
+            print("%s  %10s  %s" % (time.strftime("%Y-%m-%d %H:%M:%S",
+                                    time.localtime(entry["access"])),
+                                    format_size(entry["size"]),
+                                    entry["name"]))
+    elif(args.command == "budget"):
+        if(args.size is not None):
+            manager.setBudget(None if args.size.lower() == "none"
+                              else parse_size(args.size))
+            manager.evict()
+        budget = manager.getBudget()
+        print("budget: %s" % ("none" if budget is None
+                              else format_size(budget)))
+    elif(args.command in ("evict", "clear")):
+        if(args.command == "clear"):
+            removed = manager.clear()
+        elif(args.size is not None):
+            removed = manager.evict(parse_size(args.size))
+        else:
+            removed = manager.evict()
+        for name in removed:
+            print("removed %s" % name)
+    elif(args.command == "reset"):
+        manager.resetStats()
+    else:
+        stats = manager.getStats()
+        budget = stats["budget"]
+        print("directory: %s" % manager.getDirectory())
+        print("entries: %d" % stats["entries"])
+        print("usage: %s" % format_size(stats["bytes"]))
+        print("budget: %s" % ("none" if budget is None
+                              else format_size(budget)))
+        print("hits: %d" % stats["hits"])
+        print("misses: %d" % stats["misses"])
+        print("evictions: %d" % stats["evictions"])
+    return 0
+
+
+if(__name__ == "__main__"):
+    sys.exit(main())
@@ -30,21 +30,69 @@ along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 
-from numpy import log10, sqrt, array
-from numpy import zeros
+from numpy import log10, sqrt, array, clip, sort, unique, concatenate
+from numpy import zeros, asarray, ndim, where, minimum, ma, linspace
+from numpy import broadcast_arrays, broadcast_to, moveaxis, isfinite
 from numpy import float64 as Float64
-from .structures import Structures
+from .structures import Structures, _cubicPoly
 import scipy.interpolate as spint
 from scipy.integrate import romberg
-from .run_kut4 import rk4_int
+from .integrators import get_integrator
 
-import sys
-pyversion = sys.version_info
-if pyversion[0] >= 3:
-    from . import filedict
-else:
-    print("Importing filedict for python2.7")
-    from . import filedict_old as filedict
+from .arraycache import ArrayCache
+from .cachekey import cache_name, version_tag
+from .cachemanager import record_access
+
+#Range of log10 of the age of the stars, in years, and number of nodes of
+#the tables of the mass ejected. The turnoff masses at the ends of the
+#range are 20.4 and 0.73 solar masses.
+_LOG_AGE_RANGE = (7.0, 10.5)
+_LOG_AGE_NODES = 1000
+
+#Masses where the remnant mass or the Kroupa IMF change. The derivative of
+#the mass ejected jumps at their ages, so they are also nodes of the tables.
+_MASS_BREAKS = (0.08, 0.5, 1.0, 8.0, 10.0, 25.0)
+
+#Present CSFR, in solar masses per year per Mpc^3, of the normalized
+#models.
+_CSFR0 = 1.62593696e-2
+
+#Steps of the integration of the gas density, and of the integrations
+#used to find the normalization of the models with nsch != 1.
+_GAS_STEPS = 5000
+_NORMALIZATION_STEPS = 100
+_NORMALIZATION_ITERATIONS = 50
+_NORMALIZATION_TOL = 1.0e-10
+
+
+def _turnoffMass(logAge):
+    """Return the turnoff mass, in solar masses, of the stars with log10
+    of the age, in years, logAge
+    """
+    return 1.0e+01 ** ((3.6 - sqrt(4.0 * logAge - 2.704e+01)) / 2.0)
+
+
+def _turnoffLogAge(mass):
+    """Return log10 of the age of the stars of turnoff mass mass"""
+    return ((3.6 - 2.0 * log10(mass)) ** 2.0 + 2.704e+01) / 4.0
+
+
+def _breakSpline(x, y, breaks):
+    """Return the cubic spline, scipy.interpolate.PPoly, that interpolate y
+    over the nodes x. The nodes breaks split the spline in independent
+    pieces, so the derivatives of y can jump there.
+    """
+    edges = concatenate(([x[0]], breaks, [x[-1]]))
+    poly = None
+    for i in range(len(edges) - 1):
+        inside = (x >= edges[i]) & (x <= edges[i + 1])
+        piece = spint.PPoly.from_spline(
+            spint.make_interp_spline(x[inside], y[inside], k=3))
+        if(poly is None):
+            poly = piece
+        else:
+            poly.extend(piece.c, piece.x[1:])
+    return poly
 
 
 class Cosmicstarformation(Structures):
@@ -84,21 +132,46 @@ class Cosmicstarformation(Structures):
         function of dark matter halos used. Possibles values:
              \"ST\" for Seth and Thormen mass function.
              \"TK\" for Tinker et al. mass function.
-    """
 
-    def __init__(self, cosmology,
-                       tau=2.29, eimf=1.35, nsch=1, zmax=20.0,
-                       imfType="S", **kwargs):
+        executor -- (default None) the backend of the parallel loops,
+        'serial', 'thread' or 'process' (see Structures).
 
-        Structures.__init__(self, cosmology, **kwargs)
+        n_jobs -- (default None) the number of workers of the executor.
 
-        cacheFile = self._cacheFIle + "_CSFR_" + str(tau)\
-                 + "_" + str(eimf) + "_" + str(nsch) + "_" + imfType
+        integrator -- (default 'rk4') the integrator of the gas density
+        (see integrators): 'rk4', with a fixed step of 1/5000 of the
+        interval, or 'rk45', adaptive, whose dense output gives the gas
+        density at the 5001 scale factors of the tables.
 
-        self._cache_dictS = filedict.FileDict(filename=cacheFile + ".cache")
+        integratorTol -- (default 1.0e-8) relative tolerance of 'rk45'.
+    """
+
+    def __init__(self, cosmology,
+                       tau=2.29, eimf=1.35, nsch=1, zmax=20.0,
+                       imfType="S", integrator="rk4", integratorTol=1.0e-8,
+                       **kwargs):
+
+        #NameError if the integrator is not defined
+        get_integrator(integrator)
+        self.__integrator = integrator
+        self.__integratorTol = integratorTol
+
+        Structures.__init__(self, cosmology, zmax=zmax, **kwargs)
+
+        lmInf, lmSup = self.getIntegralLimitsFb()
+        self.__csfrParameters = dict(lmin=lmInf, lmax=lmSup, zmax=self._zmax,
+                                     tau=tau, eimf=eimf, nsch=nsch,
+                                     imfType=imfType)
+        if(integrator != "rk4"):
+            self.__csfrParameters["integrator"] = integrator
+            self.__csfrParameters["integratorTol"] = integratorTol
+        self.__structuresParameters = None
+        self._cache_dictS = None
 
         tau = tau * 1.0e9
-        self._cc = self._tck_ab[1]
+        #Interpolant of log10 of the age of the universe, used by the
+        #integration of the gas density.
+        self.__logAgePoly = self.__logAgeTable()
 
         #Cosmic Star Formation Rate normalization
         lmin, lmax = self.getIntegralLimitsFb()
@@ -122,25 +195,67 @@ class Cosmicstarformation(Structures):
                           }
 
         self.__anorm1 = None
+        self.__ejectedPoly = None
         self.__eimf = eimf
         self.__eimf0 = eimf - 1.0
 
-        try:
-
-            self.__astar = self._cache_dictS['astar']
-            self.__csfr = self._cache_dictS['csfr']
-            self.__rho_gas = self._cache_dictS['rho_gas']
-            self.__esnor = self._cache_dictS["esnor"]
-            print("Data CSFR in Cache")
+        #The cache of the CSFR of the model is opened, and the CSFR read
+        #from it or calculated, on its first use, see __results.
+        self.__csfrPoly, self.__gasPoly = None, None
 
-        except:
-            self.__csfr, self.__rho_gas, self.__astar = self.__sfr()
+    def __results(self):
+        """Read from the cache, or calculate, the CSFR and the density of
+        gas of the model on the first call. The CSFR is calculated under
+        the lock of the cache, so processes sharing the cache calculate it
+        once.
+        """
+        #The parameters of the structures are new after setDeltaHTinker
+        #or setQBurrFunction, and so is the CSFR.
+        if(self.__csfrPoly is not None and
+           self.__structuresParameters is self._cacheParameters):
+            return
+        self.__structuresParameters = self._cacheParameters
+
+        cacheParameters = dict(self._cacheParameters, **self.__csfrParameters)
+        cacheFile = str(self._cacheDir) + "/" + \
+                    cache_name("csfr", self._cacheParameters[
+                        "massFunctionType"], cacheParameters)
+        #The CSFR of the old cache files was integrated by other methods,
+        #so it is not imported.
+        self._cache_dictS = ArrayCache(cacheFile,
+                                       version=version_tag("csfr"),
+                                       parameters=cacheParameters,
+                                       legacyKeys=())
+        record_access(self._cache_dictS)
 
-        tck_sf = spint.splrep(self.__astar, self.__csfr)
-        self.__cs = tck_sf[1]
+        try:
+            self.__csfr, self.__rho_gas, self.__astar = self.__csfrInCache()
+        except KeyError:
+            with self._cache_dictS.lock('csfr'):
+                try:
+                    self.__csfr, self.__rho_gas, self.__astar = \
+                        self.__csfrInCache()
+                except KeyError:
+                    self.__csfr, self.__rho_gas, self.__astar = self.__sfr()
+
+        #Piecewise polynomials of the CSFR and of the gas density, whose
+        #segments are found by binary search.
+        self.__gasPoly = _cubicPoly(self.__astar, self.__rho_gas.ravel())
+        self.__csfrPoly = _cubicPoly(self.__astar, self.__csfr.ravel())
+
+    def __csfrInCache(self):
+        """Return the CSFR, the density of gas and the scale factors from
+        the cache. Raise KeyError if they are not there.
+        """
+        #The CSFR in cache is only valid for the cached barionic
+        #accretion rate.
+        if(not self._structuresInCache):
+            raise KeyError("astar")
 
-        tck_sg = spint.splrep(self.__astar, self.__rho_gas)
-        self.__cs2 = tck_sg[1]
+        astar, csfr, rho_gas, self.__esnor = self._cache_dictS.get_many(
+            ['astar', 'csfr', 'rho_gas', 'esnor'])
+        print("Data CSFR in Cache")
+        return csfr, rho_gas, astar
 
     def gasStarInfallEffi(self, lnM):
         raise NameError("Not implemented yet")
@@ -158,164 +273,294 @@ class Cosmicstarformation(Structures):
         """
         Put a new term in the imf Dictionary
         """
-
+        self._checkNotShared()
         self.__imfDict[key] = value
 
-    def __spn(self, a):
-        """Return the interpolated, by cubi-spline, barionic accretion
-        rate into structures
+    def __logAgeTable(self):
+        """Return the spline of log10 of the age of the universe over the
+        redshift, from the age table of the structures.
         """
-        j = -1
-
-        while(1):
-            j = j + 1
-            if(a < self._ascale[j + 1] and
-               a >= self._ascale[j] and
-               j <= (len(self._ascale) - 3)
-               ):
-                resp = (self._cc[j] / 6.0) * \
-                       (((a - self._ascale[j + 1]) ** 3.0) /
-                       (self._ascale[j] - self._ascale[j + 1])
-                       - (a - self._ascale[j + 1]) *
-                       (self._ascale[j] - self._ascale[j + 1])) \
-                       - (self._cc[j + 1] / 6.0) * \
-                       (((a - self._ascale[j]) ** 3.0) /
-                       (self._ascale[j] - self._ascale[j + 1])
-                       - (a - self._ascale[j]) *
-                       (self._ascale[j] - self._ascale[j + 1])) \
-                       + (self._abt2[j] * (a - self._ascale[j + 1])
-                       - self._abt2[j + 1] * (a - self._ascale[j]))\
-                       / (self._ascale[j] - self._ascale[j + 1])
-                return resp
-
-            elif(j >= (len(self._ascale) - 2) and j <= len(self._ascale)):
-                return self._abt2[j]
-            elif(a < self._ascale[0]):
-                raise NameError("Error in the spline function")
-                break
-
-    def __fcn(self, a, rho_g):
+        return spint.PPoly.from_spline(spint.make_interp_spline(
+            self._zred[::-1], log10(self._t_z[::-1]), k=3))
+
+    def __gasEquation(self, tau, eimf, nsch, esnor):
         """Return the numerical function to be integrated to calculate
-        the mass density of barions into structures.
+        the mass density of barions into structures. tau, eimf, nsch and
+        esnor are arrays with the parameters of each component of the
+        density.
         """
+        timeScale = tau * self._cosmology.getRobr0() ** (nsch - 1.0)
+        massEjected = self.__massEjected(eimf)
+        abPoly = self._abPoly
 
-        z = 1.0 / a - 1.0
-
-        if(z < 0.0):
-            z = 0.0
+        def fcn(a, rho_g):
+            z = 1.0 / a - 1.0
 
-        tage = self._cosmology.age(z)
+            if(z < 0.0):
+                z = 0.0
 
-        age01 = 4.0 * log10(tage) - 2.704e+01
-        age02 = (3.6 - sqrt(age01)) / 2.0
+            yr = massEjected(self.__logAgePoly(z))
 
-        mi_1 = 1.0e+01 ** age02
-        yr = self.__massEjected(mi_1)
+            sexp = (1.0 - yr) / timeScale
 
-        if(self.__nsch == 1.0):
-            sexp = (1.0 - yr) / self.__tau
-        else:
-            sexp = (1.0 - yr) / self.__tau /\
-             self._cosmology.getRobr0() ** (self.__nsch - 1.0)
+            return (- sexp * rho_g ** nsch
+                    + esnor * abPoly(a)
+                    ) * self._cosmology.dt_dz(z) / a ** 2.0
 
-        F = zeros(1)
-        F[0] = (- sexp * (rho_g[0]) ** self.__nsch
-                + self.__esnor * self.__spn(a)
-                # / self._cosmology.getRobr0()
-                ) * self._cosmology.dt_dz(z) / a ** 2.0
-        return F
+        return fcn
 
-    def __csfr_gas(self, rg):
+    def __csfr_gas(self, rg, tau, nsch):
         """Return the Cosmic Star Formation Rate
         from the barionic gas into structures
         """
-        if(self.__nsch == 1):
-            roes = rg / self.__tau
-        else:
-            roes = (rg ** self.__nsch) / self.__tau\
-            / self._cosmology.getRobr0() ** (self.__nsch - 1.0)
-        return roes
+        return (rg ** nsch) / tau\
+            / self._cosmology.getRobr0() ** (nsch - 1.0)
+
+    def __integrateGas(self, tau, eimf, nsch, esnor, rho_g0, a0, steps,
+                       sample=True, integrator=None):
+        """Return the scale factors and the density of barionic gas into
+        structures integrated from a0 to the present in steps steps, by
+        the integrator of the model or by integrator. With sample, the
+        tables of the adaptive integrators are sampled from their dense
+        output over the grid of the fixed step integration.
+        """
+        if(integrator is None):
+            integrator = self.__integrator
+        af = self._ascale[-1]
+        A, R_g, dense = get_integrator(integrator)(
+            self.__gasEquation(tau, eimf, nsch, esnor), a0, rho_g0, af,
+            (af - a0) / steps, self.__integratorTol)
+
+        if(sample and integrator != "rk4"):
+            A = linspace(A[0], A[-1], _GAS_STEPS + 1)
+            R_g = dense(A)
+
+        return A, R_g
+
+    def __normalization(self, tau, eimf, nsch, rho_g0, a0):
+        """Return the normalization of the CSFR, for nsch != 1, that gives
+        the present CSFR _CSFR0. It is found by the secant method over the
+        rk4 integration of _NORMALIZATION_STEPS steps, all the sets of
+        parameters together, whatever the integrator of the model: the
+        steps of the adaptive integrators change with the normalization,
+        so their CSFR is not smooth enough for the secant method. The CSFR
+        is then integrated with it in _GAS_STEPS steps, so with rk4 its
+        present value differs from _CSFR0 by about 1e-5, the difference
+        of the two integrations.
+        """
+        def coarse(esnor):
+            return self.__integrateGas(tau, eimf, nsch, esnor, rho_g0, a0,
+                                       _NORMALIZATION_STEPS, sample=False,
+                                       integrator="rk4")
+
+        return self.__secant(coarse, tau, nsch, zeros(len(tau)) + 1.0)[0]
+
+    def __secant(self, integrate, tau, nsch, e0):
+        """Return the normalizations, starting from e0, for which the
+        present CSFR of the solutions integrate(esnor) is _CSFR0, and the
+        last solution. Each iteration reuses the two solutions before it.
+        Raise NameError if the method fails or does not converge.
+        """
+        def csfr0(esnor):
+            solution = integrate(esnor)
+            return self.__csfr_gas(solution[1][-1], tau, nsch), solution
+
+        r0, solution = csfr0(e0)
+        e1 = e0 * _CSFR0 / r0
+        r1, solution = csfr0(e1)
+        for i in range(_NORMALIZATION_ITERATIONS):
+            done = abs(r1 - _CSFR0) <= _NORMALIZATION_TOL * _CSFR0
+            if(done.all()):
+                return e1, solution
+            if(not (isfinite(e1).all() and isfinite(r1).all()) or
+               (r1 == r0)[~done].any()):
+                raise NameError("The normalization of the CSFR failed")
+            e2 = where(done, e1, e1 + (_CSFR0 - r1) * (e1 - e0)
+                       / where(done, 1.0, r1 - r0))
+            e0, r0, e1 = e1, r1, e2
+            r1, solution = csfr0(e1)
+        raise NameError("The normalization of the CSFR did not converge")
+
+    def __gasDensity(self, tau, eimf, nsch):
+        """Return the scale factors, the density of barionic gas into
+        structures, of shape (len(scale factors), N), and the
+        normalization of the CSFR for the N sets of parameters tau, eimf
+        and nsch, integrated together.
+
+        For nsch == 1 the equation is linear, so the density is the sum
+        of the solution without source, from the initial density, and of
+        the normalization times the solution with source, from zero. Both
+        are integrated in the same pass and the normalization is solved
+        from them. For the other sets the normalization is found first,
+        see __normalization.
+        """
+        ones = zeros(len(tau)) + 1.0
+        rho_g0 = 1.0e-9 * ones
+
+        if(not self._globalNormalization):
+            A, R_g = self.__integrateGas(tau, eimf, nsch, ones, rho_g0,
+                                         self._ascale[0],
+                                         _NORMALIZATION_STEPS)
+            return A, R_g, ones
+
+        a0 = 1.0 / (self._zmax + 1.0)
+        linear = nsch == 1.0
+        nonlinear = ~linear
+        nl = linear.sum()
+
+        esnor = ones.copy()
+        if(nonlinear.any()):
+            esnor[nonlinear] = self.__normalization(
+                tau[nonlinear], eimf[nonlinear], nsch[nonlinear],
+                rho_g0[nonlinear], a0)
+
+        #Columns: linear sets without source, linear sets with source
+        #and normalization 1, the other sets.
+        columns = concatenate((linear.nonzero()[0], linear.nonzero()[0],
+                               nonlinear.nonzero()[0]))
+        source = concatenate((zeros(nl), ones[linear], esnor[nonlinear]))
+        initial = concatenate((rho_g0[linear], zeros(nl),
+                               rho_g0[nonlinear]))
+        A, R = self.__integrateGas(tau[columns], eimf[columns],
+                                   nsch[columns], source, initial, a0,
+                                   _GAS_STEPS)
+
+        R_g = zeros((len(A), len(tau)))
+        R_h, R_s = R[:, :nl], R[:, nl:2 * nl]
+        esnor[linear] = (_CSFR0 * tau[linear] - R_h[-1]) / R_s[-1]
+        R_g[:, linear] = R_h + esnor[linear] * R_s
+        R_g[:, nonlinear] = R[:, 2 * nl:]
+
+        return A, R_g, esnor
 
     def __sfr(self):
         """Return the Cosmic Star Formation rate, density of barionic
         gas into structures
         """
+        tau = array([self.__tau], dtype=Float64)
+        nsch = array([self.__nsch], dtype=Float64)
+        A, R_g, self.__esnor = self.__gasDensity(tau, array([self.__eimf]),
+                                                 nsch)
 
-        #Normalization of the cosmic star formation rate
-        rho_g0 = array([1.0e-9])
-        a0 = self._ascale[0]
-        nf = len(self._ascale) - 1
-        af = self._ascale[nf]
-        step = (af - a0) / 100.0
+        rho_s = self.__csfr_gas(R_g, tau, nsch)
 
-        A, R_g = rk4_int(self.__fcn, a0, rho_g0, af, step)
-
-        ng = len(A) - 1
-
-        if(self.__nsch == 1):
-            roes = R_g[ng] / self.__tau
-        else:
-            roes = (R_g[ng] ** self.__nsch) / self.__tau /\
-            self._cosmology.getRobr0() ** (self.__nsch - 1.0)
-
-        if(self._globalNormalization):
-            self.__esnor = 1.62593696e-2 / roes
-            rho_g0 = array([1.0e-9])
-            a0 = 1.0 / (self._zmax + 1.0)
-            nf = len(self._ascale) - 1
-            af = self._ascale[nf]
-            step = (af - a0) / 5000.
-            A, R_g = rk4_int(self.__fcn, a0, rho_g0, af, step)
-
-        rho_s = self.__csfr_gas(R_g)
-
-        self._cache_dictS['astar'] = A
-        self._cache_dictS['csfr'] = rho_s
-        self._cache_dictS['rho_gas'] = R_g
-        self._cache_dictS["esnor"] = self.__esnor
+        self._cache_dictS.set_many({'astar': A, 'csfr': rho_s,
+                                    'rho_gas': R_g, 'esnor': self.__esnor})
 
         return rho_s, R_g, A
 
-    def __massEjectedSalpeter(self, m_min):
-        if(self.__anorm1 is None):
-            self.__imfSalpeter(10)
-        amexp1 = (1.0 / m_min) ** self.__eimf0
-        amexp2 = (1.0 / self.__amsup1) ** self.__eimf0
-        amexp3 = (1.0 / 8.0) ** self.__eimf0
-        amexp4 = (1.0 / self.__aminf1) ** self.__eimf0
-        amexp5 = (1.0 / m_min) ** self.__eimf
-        amexp6 = (1.0 / 8.0) ** self.__eimf
-        amexp7 = (1.0 / 10.0) ** self.__eimf
-        amexp8 = (1.0 / self.__aminf1) ** self.__eimf
-        amexp9 = (1.0 / self.__amsup1) ** self.__eimf
-
-        yrem1 = (amexp1 - amexp2) / self.__eimf0
-        yrem2 = 1.156e-01 * (amexp1 - amexp3) / self.__eimf0
-        yrem3 = 1.3e+01 * (amexp4 - amexp2) / self.__eimf0 / 2.4e+01
-        yrem4 = 4.551e-01 * (amexp5 - amexp6) / self.__eimf
-        yrem5 = 1.35e+00 * (amexp6 - amexp7) / self.__eimf
-        yrem6 = 1.40e+00 * (amexp7 - amexp8) / self.__eimf
-        yrem7 = 6.5e+01 * (amexp8 - amexp9) / self.__eimf / 6.0
-
-        yr = self.__anorm1 * (yrem1 - yrem2 - yrem3
-                            - yrem4 - yrem5 - yrem6 + yrem7)
-
-        return yr
-
-    def __massEjected(self, m_min):
+    def __massEjectedSalpeter(self, eimf):
+        """Return the function of the turnoff mass, a scalar or an array,
+        that gives the mass ejected for the Salpeter IMF of exponent eimf.
+        The terms that do not depend on the turnoff mass are calculated
+        once.
         """
-        Return the mass integration of the mass ejected by the collapse of the
-        star
+        eimf0 = eimf - 1.0
+        anorm1 = eimf0 / (1.0 / self.__amin ** eimf0
+                          - 1.0 / self.__amsup1 ** eimf0)
+        amexp2 = (1.0 / self.__amsup1) ** eimf0
+        amexp3 = (1.0 / 8.0) ** eimf0
+        amexp4 = (1.0 / self.__aminf1) ** eimf0
+        amexp6 = (1.0 / 8.0) ** eimf
+        amexp7 = (1.0 / 10.0) ** eimf
+        amexp8 = (1.0 / self.__aminf1) ** eimf
+        amexp9 = (1.0 / self.__amsup1) ** eimf
+
+        yrem3 = 1.3e+01 * (amexp4 - amexp2) / eimf0 / 2.4e+01
+        yrem5 = 1.35e+00 * (amexp6 - amexp7) / eimf
+        yrem6 = 1.40e+00 * (amexp7 - amexp8) / eimf
+        yrem7 = 6.5e+01 * (amexp8 - amexp9) / eimf / 6.0
+        constant = (- amexp2 / eimf0 + 1.156e-01 * amexp3 / eimf0
+                    - yrem3 + 4.551e-01 * amexp6 / eimf
+                    - yrem5 - yrem6 + yrem7)
+
+        def massEjected(m_min):
+            amexp1 = (1.0 / m_min) ** eimf0
+            amexp5 = (1.0 / m_min) ** eimf
+            return anorm1 * ((1.0 - 1.156e-01) * amexp1 / eimf0
+                             - 4.551e-01 * amexp5 / eimf + constant)
+
+        return massEjected
+
+    def __massEjected(self, eimf):
+        """Return the function of log10 of the age of the stars that gives
+        the mass ejected. eimf is used only by the Salpeter IMF, in closed
+        form. For the other IMFs it is interpolated from their table.
         """
         if(self.imfType == "S"):
-            return self.__massEjectedSalpeter(m_min)
+            salpeter = self.__massEjectedSalpeter(eimf)
+            return lambda logAge: salpeter(_turnoffMass(logAge))
 
-        else:
-            mEject = (romberg(self.__mPhi, m_min, self.__amsup1, tol=1.48e-04)
-                 - romberg(self.__mrPhi, m_min, self.__amsup1, tol=1.48e-04)
-                      )
+        if(self.__ejectedPoly is None):
+            self.__ejectedPoly = self.__ejectedTable()
+        ejectedPoly = self.__ejectedPoly
+        return lambda logAge: ejectedPoly(clip(logAge, _LOG_AGE_RANGE[0],
+                                               _LOG_AGE_RANGE[1]))
+
+    def __massEjectedIntegral(self, m_min):
+        """
+        Return the mass integration of the mass ejected by the collapse of the
+        star.
+        """
+        mEject = (romberg(self.__mPhi, m_min, self.__amsup1, tol=1.48e-04)
+                  - romberg(self.__mrPhi, m_min, self.__amsup1, tol=1.48e-04)
+                  )
         return mEject
 
+    def __ejectedTable(self):
+        """Return the spline of the mass ejected over log10 of the age of
+        the stars, for the IMF of the model. The table is integrated once
+        for each IMF and kept in the cache.
+        """
+        parameters = {"imfType": self.imfType, "amin": self.__amin,
+                      "amsup1": self.__amsup1,
+                      "logAgeRange": list(_LOG_AGE_RANGE),
+                      "nodes": _LOG_AGE_NODES}
+        cache = ArrayCache(str(self._cacheDir) + "/" +
+                           cache_name("imf", self.imfType, parameters),
+                           version=version_tag("imf"),
+                           parameters=parameters)
+        record_access(cache)
+
+        breaks = sort(_turnoffLogAge(array(_MASS_BREAKS)))
+        breaks = breaks[(breaks > _LOG_AGE_RANGE[0]) &
+                        (breaks < _LOG_AGE_RANGE[1])]
+
+        try:
+            logAge, ejected = cache.get_many(['logAge', 'ejected'])
+        except KeyError:
+            with cache.lock('ejected'):
+                try:
+                    logAge, ejected = cache.get_many(['logAge', 'ejected'])
+                except KeyError:
+                    logAge = unique(concatenate((
+                        linspace(_LOG_AGE_RANGE[0], _LOG_AGE_RANGE[1],
+                                 _LOG_AGE_NODES), breaks)))
+                    ejected = array([self.__massEjectedIntegral(
+                        _turnoffMass(t)) for t in logAge])
+                    cache.set_many({'logAge': logAge, 'ejected': ejected})
+
+        return _breakSpline(logAge, ejected, breaks)
+
+    def massEjected(self, tage, exact=False):
+        """Return the fraction of the mass of a generation of stars
+        returned to the gas by the stars of age tage, in years, for the
+        IMF of the model. With the Salpeter IMF it is calculated in closed
+        form; with the other IMFs it is interpolated from a table, which
+        covers the ages 10**7 to 10**10.5 years.
+
+        Keyword arguments:
+            tage -- age of the stars, scalar or array
+            exact -- (default False) if True, the mass ejected is
+                     integrated, slowly, as a reference for the table and
+                     the closed form
+        """
+        logAge = log10(asarray(tage, dtype=Float64))
+        if(not exact):
+            return self.__massEjected(self.__eimf)(logAge)
+        return array([self.__massEjectedIntegral(_turnoffMass(t))
+                      for t in logAge.ravel()]).reshape(logAge.shape)
+
     def __mPhi(self, m):
         return m * self.phi(m)
 
@@ -388,72 +633,104 @@ class Cosmicstarformation(Structures):
         except:
             raise NameError("No Defined Initial Mass Function")
 
-    def cosmicStarFormationRate(self, z):
-        """Return the Cosmic Star Formation rate as a function of z
+    def __splineAt(self, poly, z, fill, error):
+        """Return poly at the scale factors of the redshifts z. The points
+        after the last node of the CSFR, z greater than its zmax, are out
+        of range: they are replaced by fill or, if fill is None, masked for
+        an array z, and raise NameError for a scalar z.
         """
-
-        a = 1.0 / (1.0 + z)
-
-        j = -1
-
-        while(1):
-            j = j + 1
-            if(a < self.__astar[j + 1] and
-               a >= self.__astar[j] and
-               j <= (len(self.__astar) - 3)):
-                resp = (self.__cs[j] / 6.0) * \
-                       (((a - self.__astar[j + 1]) ** 3.0) /
-                       (self.__astar[j] - self.__astar[j + 1])
-                       - (a - self.__astar[j + 1]) *
-                       (self.__astar[j] - self.__astar[j + 1])) \
-                       - (self.__cs[j + 1] / 6.0) * \
-                       (((a - self.__astar[j]) ** 3.0) /
-                       (self.__astar[j] - self.__astar[j + 1])
-                       - (a - self.__astar[j]) *
-                       (self.__astar[j] - self.__astar[j + 1])) \
-                       + (self.__csfr[j] * (a - self.__astar[j + 1])
-                       - self.__csfr[j + 1] * (a - self.__astar[j])) / \
-                        (self.__astar[j] - self.__astar[j + 1])
-                return resp[0]
-
-            elif(j >= (len(self.__astar) - 2) and j <= len(self.__astar)):
-                return self.__csfr[j]
-            elif(a < self.__astar[0]):
-                raise NameError("Error in spline csfr")
-                break
+        a = 1.0 / (1.0 + asarray(z, dtype=Float64))
+        value = poly(minimum(a, poly.x[-1]))
+        valid = a >= poly.x[0]
+        valid = valid.reshape(valid.shape + (1,) * (value.ndim - valid.ndim))
+
+        if(fill is not None):
+            return where(valid, value, fill)
+        if(ndim(z) == 0):
+            if(not valid.all()):
+                raise NameError(error)
+            return value
+        return ma.masked_array(value, mask=~broadcast_to(valid, value.shape))
+
+    def cosmicStarFormationRate(self, z, fill=None):
+        """Return the Cosmic Star Formation rate as a function of z.
+
+        z can be a scalar or a numpy array. Redshifts greater than the
+        zmax of the model are out of range: they are replaced by fill if it
+        is given, otherwise for an array a numpy.ma.MaskedArray is returned
+        with them masked and a scalar raises NameError.
+        """
+        self.__results()
+        value = self.__splineAt(self.__csfrPoly, z, fill,
+                                "Error in spline csfr")
+        if(ndim(value) == 0 and not ma.isMaskedArray(value)):
+            return float(value)
+        return value
 
     def getEfficiency(self):
+        self.__results()
         return self.__esnor
 
-    def gasDensityInStructures(self, z):
-        """Return the barionic gas density into structures
+    def gasDensityInStructures(self, z, fill=None):
+        """Return the barionic gas density into structures.
+
+        z can be a scalar, for which an array of one element is returned,
+        or a numpy array. Redshifts out of range are treated as in
+        cosmicStarFormationRate.
+        """
+        self.__results()
+        value = self.__splineAt(self.__gasPoly, z, fill,
+                                "Error spline gas density")
+        if(ndim(z) == 0):
+            return value.reshape(1)
+        return value
+
+    def ensembleStarFormationRate(self, z, tau=None, eimf=None, nsch=None,
+                                  fill=None):
+        """Return the Cosmic Star Formation rate at z of the models with
+        the parameters tau, eimf and nsch, arrays that broadcast to N sets
+        of parameters. The other parameters are the ones of this model.
+        The gas densities of the N models are integrated together, as one
+        system of N equations, so N models cost little more than one.
+
+        The result has shape (N,) + shape(z). Redshifts out of range are
+        treated as in cosmicStarFormationRate.
+
+        Keyword arguments:
+            z -- redshift, scalar or array
+            tau -- (default the one of this model) time scale, in Gyr, of
+                   the CSFR
+            eimf -- (default the one of this model) exponent of the IMF
+            nsch -- (default the one of this model) exponent of the CSFR
+            fill -- (default None) value of the points out of range
+        """
+        return self.ensembleResults(z, tau, eimf, nsch, fill)[0]
+
+    def ensembleResults(self, z, tau=None, eimf=None, nsch=None,
+                        fill=None):
+        """Return the Cosmic Star Formation rate and the density of gas
+        into structures at z, of shape (N,) + shape(z), and the
+        efficiency, of shape (N,), of the N models with the parameters
+        tau, eimf and nsch, integrated together. See
+        ensembleStarFormationRate.
         """
-        a = 1.0 / (1.0 + z)
-
-        j = -1
-
-        while(1):
-            j = j + 1
-            if(a < self.__astar[j + 1] and
-               a >= self.__astar[j] and
-               j <= (len(self.__astar) - 3)):
-                resp = (self.__cs2[j] / 6.0) * ((
-                       (a - self.__astar[j + 1]) ** 3.0) /
-                       (self.__astar[j] - self.__astar[j + 1])
-                       - (a - self.__astar[j + 1]) *
-                       (self.__astar[j] - self.__astar[j + 1])) \
-                       - (self.__cs2[j + 1] / 6.0) * \
-                       (((a - self.__astar[j]) ** 3.0) /
-                       (self.__astar[j] - self.__astar[j + 1])
-                       - (a - self.__astar[j]) *
-                       (self.__astar[j] - self.__astar[j + 1])) \
-                       + (self.__rho_gas[j] * (a - self.__astar[j + 1])
-                       - self.__rho_gas[j + 1] * (a - self.__astar[j])) \
-                       / (self.__astar[j] - self.__astar[j + 1])
-                return resp
-
-            elif(j >= (len(self.__astar) - 2) and j <= len(self.__astar)):
-                return self.__rho_gas[j]
-            elif(a < self.__astar[0]):
-                raise NameError("Error spline gas density")
-                break
+        if(tau is None):
+            tau = self.__tau / 1.0e9
+        if(eimf is None):
+            eimf = self.__eimf
+        if(nsch is None):
+            nsch = self.__nsch
+
+        tau, eimf, nsch = [parameter.ravel() for parameter in
+                           broadcast_arrays(asarray(tau, dtype=Float64)
+                                            * 1.0e9,
+                                            asarray(eimf, dtype=Float64),
+                                            asarray(nsch, dtype=Float64))]
+
+        A, R_g, esnor = self.__gasDensity(tau, eimf, nsch)
+        csfrPoly = _cubicPoly(A, self.__csfr_gas(R_g, tau, nsch))
+        gasPoly = _cubicPoly(A, R_g)
+        csfr = self.__splineAt(csfrPoly, z, fill, "Error in spline csfr")
+        rho_gas = self.__splineAt(gasPoly, z, fill,
+                                  "Error spline gas density")
+        return moveaxis(csfr, -1, 0), moveaxis(rho_gas, -1, 0), esnor
@@ -26,13 +26,14 @@ __status__ = "Stable"
     You should have received a copy of the GNU General Public License
     along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
-Fornce as funcoes locate(xx,n,x), dfridr(func,x,h,err) e
+Fornce as funcoes locate(xx,n,x), dfridr(func,x,h,err), suas versoes
+vetorizadas locate_array(xx,x) e dfridr_array(func,x,h) e
 int_simples(func,a,b,dx =0.001)
 """
 
 from numpy import zeros
 from numpy import float64 as Float64
-from numpy import abs
+from numpy import abs, asarray, searchsorted
 
 
 def locate(xx, n, x):
@@ -89,3 +90,31 @@ def dfridr(func, x, h, err):
                 dfit = a[j, i]
                 return dfit
     return None
+
+
+def dfridr_array(func, x, h):
+    '''Versao vetorizada de dfridr, para x e h escalares ou arrays.
+    Fornece, ponto a ponto, o mesmo valor de dfridr(func, x, h, err=0.0),
+    com func avaliada uma unica vez para cada passo sobre todo o array.
+           argumentos:  func --- funcao vetorizada a ser derivada
+                        x    --- dlog10 m ou z
+                        h    --- passo para a diferencicao
+    '''
+    CON = 1.4
+    CON2 = CON * CON
+    x = asarray(x, dtype=Float64)
+    hh = asarray(h, dtype=Float64) / CON
+    a01 = (func(x + hh) - func(x - hh)) / (2.0 * hh)
+    hh = hh / CON
+    a02 = (func(x + hh) - func(x - hh)) / (2.0 * hh)
+    return (a02 * CON2 - a01) / (CON2 - 1.0)
+
+
+def locate_array(xx, x):
+    """Versao vetorizada de locate(xx, len(xx) - 1, x), para tabelas
+    crescentes, usando busca binaria do numpy.
+
+argumentos:  xx   --- tabela de entrada
+x    --- valor, ou array de valores, de x que se deseja determinar y
+"""
+    return searchsorted(xx[1:], x, side='left')
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Executor of functions over the points of an array.
+
+The points are split in chunks that are sent to a pool of workers. The
+pool is created on the first call and kept alive, so the cost of starting
+the workers is paid only once. The backends are:
+
+    serial -- the points are evaluated in the calling process
+    thread -- pool of threads
+    process -- pool of processes
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import atexit
+import pickle
+import multiprocessing as mpg
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import Future, as_completed
+
+from numpy import array, asarray, array_split, concatenate
+
+BACKENDS = ["serial", "thread", "process"]
+
+_defaultExecutor = None
+
+
+def _evaluateChunk(func, x):
+    return [func(xi) for xi in x]
+
+
+def _evaluateFuture(func, item):
+    future = Future()
+    try:
+        future.set_result(func(item))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+class Executor:
+    """Evaluate a function over the points of an array with a pool of
+    workers kept alive between the calls.
+
+    Keyword arguments:
+        backend -- (default 'process') 'serial', 'thread' or 'process'
+
+        n_jobs -- (default number of cpus) number of workers. With one
+                  worker the points are evaluated serially.
+
+        chunksPerJob -- (default 4) number of chunks sent to each worker
+                        by call
+    """
+
+    def __init__(self, backend="process", n_jobs=None, chunksPerJob=4):
+
+        if(backend not in BACKENDS):
+            raise NameError("Backend not defined: " + str(backend))
+
+        if(n_jobs is None):
+            n_jobs = mpg.cpu_count()
+
+        self.__backend = backend
+        self.__n_jobs = max(int(n_jobs), 1)
+        self.__chunksPerJob = chunksPerJob
+        self.__pool = None
+
+    def __getstate__(self):
+        """An executor sent to a worker runs serially there, so the pools
+        are not nested.
+        """
+        state = self.__dict__.copy()
+        state['_Executor__backend'] = "serial"
+        state['_Executor__pool'] = None
+        return state
+
+    def getBackend(self):
+        """Return the backend and the number of workers"""
+        return self.__backend, self.__n_jobs
+
+    def isParallel(self):
+        """Return True if the calls are evaluated by a pool of workers"""
+        return self.__backend != "serial" and self.__n_jobs > 1
+
+    def __getPool(self):
+        if(self.__pool is None):
+            if(self.__backend == "thread"):
+                self.__pool = ThreadPoolExecutor(max_workers=self.__n_jobs)
+            else:
+                self.__pool = ProcessPoolExecutor(max_workers=self.__n_jobs)
+        return self.__pool
+
+    def __isSerial(self, func, size):
+        if(not self.isParallel() or size <= 1):
+            return True
+
+        if(self.__backend == "process"):
+            #Functions that can not be sent to other processes are
+            #evaluated in the calling one.
+            try:
+                pickle.dumps(func)
+            except Exception:
+                return True
+
+        return False
+
+    def map(self, func, x):
+        """Return the array func(xi) for each point xi of x. No point is
+        lost when the size of x is not a multiple of the number of
+        chunks.
+
+        Keyword arguments:
+            func -- function of a scalar that return a scalar
+            x -- one dimensional array
+        """
+        x = asarray(x)
+
+        if(self.__isSerial(func, x.size)):
+            return array(_evaluateChunk(func, x), dtype=float)
+
+        nChunks = min(self.__n_jobs * self.__chunksPerJob, x.size)
+        futures = [self.__getPool().submit(_evaluateChunk, func, chunk)
+                   for chunk in array_split(x, nChunks)]
+        result = []
+        for future in futures:
+            result.extend(future.result())
+        return array(result, dtype=float)
+
+    def mapChunks(self, func, x):
+        """Return func(x) computed by chunks of x. func must take an array
+        and return an array, or a tuple of arrays, of the same size.
+
+        Keyword arguments:
+            func -- vectorized function
+            x -- one dimensional array
+        """
+        x = asarray(x)
+
+        if(self.__isSerial(func, x.size)):
+            return func(x)
+
+        nChunks = min(self.__n_jobs * self.__chunksPerJob, x.size)
+        futures = [self.__getPool().submit(func, chunk)
+                   for chunk in array_split(x, nChunks)]
+        result = [future.result() for future in futures]
+        if(isinstance(result[0], tuple)):
+            return tuple(concatenate(part) for part in zip(*result))
+        return concatenate(result)
+
+    def mapUnordered(self, func, items):
+        """Return an iterator over the pairs (item, future) for each item
+        of items, in the order they end. future is the
+        concurrent.futures.Future of func(item), so an item that fails does
+        not stop the others. When the executor is serial, func(item) is
+        evaluated in the calling process when its pair is reached.
+
+        Keyword arguments:
+            func -- function of an item
+            items -- list of items, each one sent to a worker
+        """
+        items = list(items)
+
+        if(self.__isSerial(func, len(items))):
+            return ((item, _evaluateFuture(func, item)) for item in items)
+
+        futures = dict([(self.__getPool().submit(func, item), item)
+                        for item in items])
+        return ((futures[future], future)
+                for future in as_completed(futures))
+
+    def shutdown(self):
+        """Stop the workers. A new pool is started by the next call of
+        map.
+        """
+        if(self.__pool is not None):
+            self.__pool.shutdown()
+            self.__pool = None
+
+
+def get_executor():
+    """Return the executor shared by all the models, a pool of
+    processes with one worker for each cpu.
+    """
+    global _defaultExecutor
+    if(_defaultExecutor is None):
+        _defaultExecutor = Executor()
+    return _defaultExecutor
+
+
+def make_executor(executor=None, n_jobs=None):
+    """Return the executor for the options executor and n_jobs of a
+    model. executor can be an Executor, that is returned, or the name
+    of a backend. Without both options the shared executor is returned.
+    """
+    if(isinstance(executor, Executor)):
+        return executor
+    if(executor is None and n_jobs is None):
+        return get_executor()
+    if(executor is None):
+        executor = "process"
+    return Executor(executor, n_jobs)
+
+
+def _shutdownDefault():
+    if(_defaultExecutor is not None):
+        _defaultExecutor.shutdown()
+
+
+atexit.register(_shutdownDefault)
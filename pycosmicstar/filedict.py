@@ -20,17 +20,24 @@ class FileDict(UserDict):
         filename - which file to use
         connection - use an existing connection instead of a filename (overrides filename)
         table - which table name to use for storing data (default: 'dict')
+        timeout - seconds to wait for a lock of other process (default: 60)
+
+    The database is opened in WAL mode, so readers do not block the writer
+    of other process. The writes inside a batch are committed together when
+    the batch ends.
 
     """
 
     def __init__(self, filename=None, solution=Solutions.Sqlite3, **options):
         assert solution == Solutions.Sqlite3, "Only sqlite3 is supported right now"
+        timeout = options.pop('timeout', 60)
         try:
             self.__conn = options.pop('connection')
         except KeyError:
             if not filename:
                 raise ValueError("Must provide 'connection' or 'filename'")
-            self.__conn = sqlite3.connect(filename)
+            self.__conn = sqlite3.connect(filename, timeout=timeout)
+            self.__conn.execute('PRAGMA journal_mode=WAL;')
 
         self.__tablename = options.pop('table', 'dict')
 
@@ -75,6 +82,65 @@ class FileDict(UserDict):
 
         raise KeyError(key)
 
+    def get_many(self, keys):
+        """Return the list of the values of keys, read by a single query.
+        Raise KeyError if a key is missing."""
+        keys = list(keys)
+        hashes = [self.__hash(key) for key in keys]
+        if not keys:
+            return []
+
+        found = {}
+        uniqueHashes = list(set(hashes))
+        for i in range(0, len(uniqueHashes), 500):
+            chunk = uniqueHashes[i:i + 500]
+            cursor = self.__conn.execute('SELECT hash,key,value FROM %s WHERE hash IN (%s);'
+                    % (self.__tablename, ','.join('?' * len(chunk))), chunk)
+            for h, k, v in cursor:
+                found.setdefault(h, []).append((self.__unpack(k), v))
+
+        values = []
+        for key, h in zip(keys, hashes):
+            for k, v in found.get(h, []):
+                if k == key:
+                    values.append(self.__unpack(v))
+                    break
+            else:
+                raise KeyError(key)
+        return values
+
+    def set_many(self, mapping):
+        """Store all the items of mapping in a single transaction"""
+        items = list(mapping.items())
+        if not items:
+            return
+
+        hashes = [self.__hash(key) for key, value in items]
+        ids = {}
+        uniqueHashes = list(set(hashes))
+        for i in range(0, len(uniqueHashes), 500):
+            chunk = uniqueHashes[i:i + 500]
+            cursor = self.__conn.execute('SELECT hash,key,id FROM %s WHERE hash IN (%s);'
+                    % (self.__tablename, ','.join('?' * len(chunk))), chunk)
+            for h, k, id in cursor:
+                ids.setdefault(h, []).append((self.__unpack(k), id))
+
+        updates = []
+        inserts = []
+        for (key, value), h in zip(items, hashes):
+            value_pickle = self.__pack(value)
+            for k, id in ids.get(h, []):
+                if k == key:
+                    updates.append((value_pickle, id))
+                    break
+            else:
+                inserts.append((h, self.__pack(key), value_pickle))
+
+        with self.__conn:
+            self.__conn.executemany('UPDATE %s SET value=? WHERE id=?;'%self.__tablename, updates)
+            self.__conn.executemany('INSERT INTO %s (hash, key, value) values (?, ?, ?);'
+                    %self.__tablename, inserts)
+
     def __setitem(self, key, value):
         value_pickle = self.__pack(value)
 
@@ -102,9 +168,11 @@ class FileDict(UserDict):
 
 
     def update(self, d):
-        for k,v in d.items():
-            self.__setitem(k, v)
-        self._commit()
+        if self._nocommit:
+            for k,v in d.items():
+                self.__setitem(k, v)
+        else:
+            self.set_many(d)
 
     def __iter__(self):
         return (self.__unpack(x[0]) for x in self.__conn.execute('SELECT key FROM %s;'%self.__tablename) )
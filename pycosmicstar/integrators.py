@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Integrators of the initial value problem y' = func(x, y), y(x0) = y0.
+
+All the integrators have the same arguments and return the abscissas X,
+the solution Y, of shape (len(X), len(y0)), and the dense output, a
+function that return the solution at any x between x0 and xStop (or None
+if it was not asked).
+
+    rk4 -- fixed step 4th-order Runge-Kutta
+    rk45 -- adaptive Runge-Kutta 5(4) with error control
+            (scipy.integrate.solve_ivp)
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+from numpy import asarray, empty, ceil, concatenate, abs, amin
+from scipy.integrate import solve_ivp
+from scipy.interpolate import CubicHermiteSpline
+
+
+def rk4(func, x0, y0, xStop, step=None, tol=None, dense=False):
+    """Return X, Y and the dense output of the 4th-order Runge-Kutta
+    integration from x0 to xStop with steps of size step, the last one
+    shorter to stop at xStop. The arrays of the solution are allocated
+    once. The dense output is the cubic Hermite interpolation of the
+    steps, with the derivatives already evaluated by the method.
+
+    Keyword arguments:
+        func -- function func(x, y) that return the array y'
+        x0, y0 -- initial conditions
+        xStop -- final value of x
+        step -- size of the steps
+        tol -- not used, the error is set by step
+        dense -- (default False) if True the dense output is returned,
+                 else None
+    """
+    if(step is None or step <= 0.0):
+        raise NameError("The step of rk4 must be positive")
+
+    y = asarray(y0, dtype=float)
+    x = x0
+    h = step
+    size = max(int(ceil((xStop - x0) / step)) + 2, 2)
+    X = empty(size)
+    Y = empty((size,) + y.shape)
+    dY = empty((size,) + y.shape)
+    X[0] = x
+    Y[0] = y
+
+    i = 0
+    while x < xStop:
+        h = min(h, xStop - x)
+        F0 = func(x, y)
+        K0 = h * F0
+        K1 = h * func(x + h / 2.0, y + K0 / 2.0)
+        K2 = h * func(x + h / 2.0, y + K1 / 2.0)
+        K3 = h * func(x + h, y + K2)
+        y = y + (K0 + 2.0 * K1 + 2.0 * K2 + K3) / 6.0
+        x = x + h
+
+        if(i + 2 > len(X)):
+            X = concatenate((X, empty(size)))
+            Y = concatenate((Y, empty((size,) + y.shape)))
+            dY = concatenate((dY, empty((size,) + y.shape)))
+        dY[i] = F0
+        i = i + 1
+        X[i] = x
+        Y[i] = y
+
+    X, Y, dY = X[:i + 1], Y[:i + 1], dY[:i + 1]
+    if(not dense):
+        return X, Y, None
+
+    dY[i] = func(x, y)
+    return X, Y, CubicHermiteSpline(X, Y, dY, axis=0)
+
+
+def rk45(func, x0, y0, xStop, step=None, tol=None, dense=True):
+    """Return X, Y and the dense output of the adaptive Runge-Kutta 5(4)
+    integration from x0 to xStop. The steps are chosen to keep the
+    relative error of each step below tol, and the absolute error below
+    tol times the smallest non-zero value of y0.
+
+    Keyword arguments:
+        func -- function func(x, y) that return the array y'
+        x0, y0 -- initial conditions
+        xStop -- final value of x
+        step -- (default chosen by the method) size of the first step
+        tol -- (default 1.0e-6) relative tolerance
+        dense -- (default True) if True the dense output is returned,
+                 else None
+    """
+    if(tol is None):
+        tol = 1.0e-6
+
+    y0 = asarray(y0, dtype=float)
+    scale = abs(y0[y0 != 0.0])
+    atol = tol * amin(scale) if len(scale) > 0 else tol
+    solution = solve_ivp(func, (x0, xStop), y0, method="RK45", rtol=tol,
+                         atol=atol, first_step=step, dense_output=dense)
+    if(not solution.success):
+        raise NameError("Error in the integration: " + solution.message)
+
+    if(not dense):
+        return solution.t, solution.y.T, None
+    return solution.t, solution.y.T, lambda x: solution.sol(x).T
+
+
+INTEGRATORS = {"rk4": rk4, "rk45": rk45}
+
+
+def get_integrator(name):
+    """Return the integrator name, 'rk4' or 'rk45'"""
+    if(name not in INTEGRATORS):
+        raise NameError("Integrator not defined: " + str(name))
+    return INTEGRATORS[name]
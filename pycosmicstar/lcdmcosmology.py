@@ -43,7 +43,11 @@ along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 
+import threading
+from functools import partial
+
 from .cosmology import Cosmology
+from .executor import make_executor
 from numpy import sqrt, pi, log, log10, exp, sin, cos
 from numpy import zeros
 from numpy import float64 as Float64
@@ -59,6 +63,10 @@ except:
     cosmolibImportStatus = False
     print('lcdmlib not imported, using pure python version of sigma')
 
+#The parameters set by lcdmlib.init are shared by the whole process, so
+#they are set again, under this lock, before each call that reads them.
+_lcdmlibLock = threading.Lock()
+
 
 class Lcdmcosmology(Cosmology):
     """The Cold Dark Matter (CDM) plus Cosmolocical Constan (Lambda) -  lcdm
@@ -71,9 +79,16 @@ class Lcdmcosmology(Cosmology):
         omegal -- (default 0.73) - The dark energy parameter
 
         h -- (default 0.7) - The h of the Hubble constant (H = h * 100)
+
+        executor -- (default 'serial') - Backend of the evaluation of
+                    sigma over arrays of masses: 'serial', 'thread',
+                    'process' or an executor.Executor
+
+        n_jobs -- (default None) - Number of workers of the executor
     """
 
-    def __init__(self, omegam=0.24, omegab=0.04, omegal=0.73, h=0.7):
+    def __init__(self, omegam=0.24, omegab=0.04, omegal=0.73, h=0.7,
+                 executor=None, n_jobs=None):
         self.__omegab = omegab
         self.__omegam = omegam
         self.__omegal = omegal
@@ -85,6 +100,10 @@ class Lcdmcosmology(Cosmology):
 
         self.__cosmolibImportStatus = cosmolibImportStatus
 
+        if(executor is None and n_jobs is None):
+            executor = "serial"
+        self.__executor = make_executor(executor, n_jobs)
+
         if(self.__cosmolibImportStatus is True):
             self.__lcdmlib = lcdmlib
             self.__lcdmlib.init(omegab, omegam, omegal, h)
@@ -132,6 +151,21 @@ class Lcdmcosmology(Cosmology):
         self.__beta = 3.0 / self.__gamam / h
         self.__gama = 1.7 / self.__gamam / h
 
+    def __getstate__(self):
+        """The lcdmlib module is not pickled, so the cosmology can be sent
+        to the workers of a pool of processes.
+        """
+        state = self.__dict__.copy()
+        state.pop('_Lcdmcosmology__lcdmlib', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if(self.__cosmolibImportStatus is True):
+            self.__lcdmlib = lcdmlib
+            self.__lcdmlib.init(self.__omegab, self.__omegam,
+                                self.__omegal, self.__h)
+
     def dt_dz(self, z):
         dtdz = self.__ct3 / ((1.0 + z) * sqrt(self.__omegal +
                                     self.__omegam * (1.0 + z) ** 3.0))
@@ -224,6 +258,15 @@ class Lcdmcosmology(Cosmology):
             kmass -- mass scale
         """
 
+        if(self.__executor.isParallel()):
+            return self.__executor.mapChunks(self._sigmaSerial, kmass)
+        return self._sigmaSerial(kmass)
+
+    def _sigmaSerial(self, kmass):
+        """Return the sigma, evaluated in the calling thread. The chunks
+        of sigma are evaluated by it, so they are not sent to the executor
+        again.
+        """
         if(self.__cosmolibImportStatus is not True):
             return self.__sigma(kmass)
         else:
@@ -234,12 +277,14 @@ class Lcdmcosmology(Cosmology):
                                     self.__ct2,
                                     kmass)
 
-    def dsigma2_dk(self, kl):
+    def dsigma2_dk(self, kl, escala=None):
         """"Return the integrating of sigma(M,z) for a top-hat filtering.
         In z = 0 return sigma_8, for z > 0 return sigma(M,z)
         """
+        if(escala is None):
+            escala = self.__escala
         k = exp(kl)
-        x = self.__escala * k
+        x = escala * k
         pk1 = 1.0 + (self.__alfa * k + (self.__beta * k) ** 1.5
                      + (self.__gama * k) ** 2.0) ** 1.13
         pk2 = 1.0 / pk1
@@ -254,19 +299,23 @@ class Lcdmcosmology(Cosmology):
         sg = zeros(n)
 
         for i in range(0, n):
-            self.__escala = (kmass[i] / self.__ct2) ** (1.0 / 3.0)
+            #The scale is passed to the integrand, since the chunks of
+            #the executor can run in threads of the same model.
+            escala = (kmass[i] / self.__ct2) ** (1.0 / 3.0)
+            self.__escala = escala
             km[i] = log10(kmass[i])
 
-            t0 = log10(1.0e-7 / self.__escala)
-            t1 = log10(1.0e-3 / self.__escala)
-            t2 = log10(1.0e+0 / self.__escala)
-            t3 = log10(10.0e+0 / self.__escala)
-            t4 = log10(100.0e+0 / self.__escala)
+            t0 = log10(1.0e-7 / escala)
+            t1 = log10(1.0e-3 / escala)
+            t2 = log10(1.0e+0 / escala)
+            t3 = log10(10.0e+0 / escala)
+            t4 = log10(100.0e+0 / escala)
 
-            sig2_1 = romberg(self.dsigma2_dk, t0, t1, tol=1.48e-09)
-            sig2_2 = romberg(self.dsigma2_dk, t1, t2, tol=1.48e-09)
-            sig2_3 = romberg(self.dsigma2_dk, t2, t3, tol=1.48e-09)
-            sig2_4 = romberg(self.dsigma2_dk, t3, t4, tol=1.48e-09)
+            dsigma2_dk = partial(self.dsigma2_dk, escala=escala)
+            sig2_1 = romberg(dsigma2_dk, t0, t1, tol=1.48e-09)
+            sig2_2 = romberg(dsigma2_dk, t1, t2, tol=1.48e-09)
+            sig2_3 = romberg(dsigma2_dk, t2, t3, tol=1.48e-09)
+            sig2_4 = romberg(dsigma2_dk, t3, t4, tol=1.48e-09)
 
             sg[i] = sqrt(self.__anorm * (sig2_1 + sig2_2 + sig2_3 + sig2_4))
 
@@ -306,7 +355,10 @@ class Lcdmcosmology(Cosmology):
             z -- redshift
         """
         if(self.__cosmolibImportStatus is True):
-            return  self.__lcdmlib.age(z)
+            with _lcdmlibLock:
+                self.__lcdmlib.init(self.__omegab, self.__omegam,
+                                    self.__omegal, self.__h)
+                return self.__lcdmlib.age(z)
         else:
             z1 = 1.0 + z
             ascale = 1.0 / z1
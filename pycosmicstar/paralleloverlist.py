@@ -17,6 +17,8 @@ __date__ = '09/12/2013'
 import multiprocessing as mpg
 from numpy import array
 
+from .executor import get_executor
+
 ##@file paralleloverlist.py
 ##@author  Eduardo dos Santos Pereira <pereira.somoza@gmail.com>
 ##@version 1.1
@@ -61,10 +63,13 @@ class paralleloverlist:
         x = self.__inputArray[k: E + k]
         self.__output[k: E + k] = [func(xi) for xi in x]
 
-    def __acaoParalera(self, n, q, Dmatriz, func, n_process):
+    def __acaoParalera(self, n, Dmatriz, func, n_process):
         E = Dmatriz // n_process
         k = n * E
-        q.put(self.__Calcula(func, k, E, n))
+        #The last process takes also the remainder of the division
+        if(n == n_process - 1):
+            E = Dmatriz - k
+        self.__Calcula(func, k, E, n)
 
     def __runProcess(self):
 
@@ -72,9 +77,8 @@ class paralleloverlist:
         subprocess = []
 
         for i in range(n_process):
-            q = mpg.Queue()
             p = mpg.Process(target=self.__acaoParalera,
-                args=(i, q, self.__sizeArray, self.__func, n_process))
+                args=(i, self.__sizeArray, self.__func, n_process))
             p.start()
             subprocess.append(p)
 
@@ -83,8 +87,10 @@ class paralleloverlist:
 
 
 def parallel_list(func, x):
-    result = paralleloverlist(func, x)
-    return result()
+    """Return the array func(xi) for each xi of x, computed by the
+    executor shared by the models (see executor.get_executor).
+    """
+    return get_executor().map(func, x)
 
 
 if(__name__ == "__main__"):
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Quadrature rules for integrands evaluated over many points at once.
+
+The integrand func(x) receives a one dimensional array x with the
+abscissas and must return an array whose first axis runs over x; the
+other axes (e.g. redshift) are integrated in the same pass. All the rules
+return the integral and an estimate of its absolute error.
+
+    spline_quad -- cubic spline over an uniform grid
+    gauss_legendre_quad -- fixed Gauss-Legendre nodes
+    gauss_kronrod_quad -- adaptive 7-15 Gauss-Kronrod
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import warnings
+
+from numpy import arange, abs, array, asarray, empty, tensordot, amax
+from numpy import concatenate
+from numpy.polynomial.legendre import leggauss
+from scipy.interpolate import make_interp_spline
+
+#Maximum number of points used by the rules when a tolerance is given. A
+#RuntimeWarning is issued when they stop before the tolerance.
+MAXPOINTS = 6400
+
+_legendreNodes = {}
+
+#Nodes and weights of the 7-15 Gauss-Kronrod rule, the Gauss weights are
+#zero at the nodes of the Kronrod extension.
+_KRONROD_NODES = array([-0.991455371120812639206854697526329,
+                        -0.949107912342758524526189684047851,
+                        -0.864864423359769072789712788640926,
+                        -0.741531185599394439863864773280788,
+                        -0.586087235467691130294144845693013,
+                        -0.405845151377397166906606412076961,
+                        -0.207784955007898467600689403773245,
+                        0.000000000000000000000000000000000,
+                        0.207784955007898467600689403773245,
+                        0.405845151377397166906606412076961,
+                        0.586087235467691130294144845693013,
+                        0.741531185599394439863864773280788,
+                        0.864864423359769072789712788640926,
+                        0.949107912342758524526189684047851,
+                        0.991455371120812639206854697526329])
+
+_KRONROD_WEIGHTS = array([0.022935322010529224963732008058970,
+                          0.063092092629978553290700663189204,
+                          0.104790010322250183839876322541518,
+                          0.140653259715525918745189590510238,
+                          0.169004726639267902826583426598550,
+                          0.190350578064785409913256402421014,
+                          0.204432940075298892414161999234649,
+                          0.209482141084727828012999174891714,
+                          0.204432940075298892414161999234649,
+                          0.190350578064785409913256402421014,
+                          0.169004726639267902826583426598550,
+                          0.140653259715525918745189590510238,
+                          0.104790010322250183839876322541518,
+                          0.063092092629978553290700663189204,
+                          0.022935322010529224963732008058970])
+
+_GAUSS_WEIGHTS = array([0.0, 0.129484966168869693270611432679082,
+                        0.0, 0.279705391489276667901467771423780,
+                        0.0, 0.381830050505118944950369775488975,
+                        0.0, 0.417959183673469387755102040816327,
+                        0.0, 0.381830050505118944950369775488975,
+                        0.0, 0.279705391489276667901467771423780,
+                        0.0, 0.129484966168869693270611432679082,
+                        0.0])
+
+
+def _converged(inte, err, tol):
+    return amax(abs(err)) <= tol * amax(abs(inte))
+
+
+def _warnNotConverged(rule, inte, err, tol):
+    warnings.warn("%s stopped at its largest number of points before the "
+                  "tolerance %g, relative error %g" %
+                  (rule, tol, amax(abs(err)) / amax(abs(inte))),
+                  RuntimeWarning, stacklevel=3)
+
+
+def _spline_integral(x, f, a, b):
+    tck = make_interp_spline(x, f, k=3, axis=0)
+    return tck.integrate(a, b, extrapolate=False)
+
+
+def spline_quad(func, a, b, n=50, tol=None):
+    """Return the integral of func from a to b, and its error, by the
+    cubic spline over the n points a + i * (b - a) / n, i = 0, ..., n - 1.
+    The error is the difference to the spline over every other point.
+    If tol is given, the grid is refined, reusing the points already
+    evaluated, until the relative error is lower than tol, or it warns
+    when more than MAXPOINTS points would be needed.
+
+    Keyword arguments:
+        func -- integrand, vectorized in its first axis
+        a, b -- limits of integration
+        n -- number of points
+        tol -- relative tolerance
+    """
+    delta = (b - a) / n
+    x = a + arange(n) * delta
+    f = asarray(func(x))
+
+    while(True):
+        inte = _spline_integral(x, f, a, b)
+        err = abs(inte - _spline_integral(x[::2], f[::2], a, b))
+
+        if(tol is None or _converged(inte, err, tol)):
+            return inte, err
+        if(2 * n > MAXPOINTS):
+            _warnNotConverged("spline_quad", inte, err, tol)
+            return inte, err
+
+        n = 2 * n
+        delta = delta / 2.0
+        xNew = a + arange(n) * delta
+        fNew = empty((n,) + f.shape[1:])
+        fNew[::2] = f
+        fNew[1::2] = func(xNew[1::2])
+        x, f = xNew, fNew
+
+
+def _gauss_legendre(func, a, b, n):
+    if(n not in _legendreNodes):
+        _legendreNodes[n] = leggauss(n)
+    nodes, weights = _legendreNodes[n]
+    x = 0.5 * (b - a) * nodes + 0.5 * (b + a)
+    return 0.5 * (b - a) * tensordot(weights, asarray(func(x)), axes=1)
+
+
+def gauss_legendre_quad(func, a, b, n=50, tol=None):
+    """Return the integral of func from a to b, and its error, by the
+    Gauss-Legendre rule of n nodes. The nodes and weights are computed
+    once for each n. The error is the difference to the rule with n // 2
+    nodes. If tol is given, n is doubled until the relative error is
+    lower than tol, or it warns when more than MAXPOINTS nodes would be
+    needed.
+
+    Keyword arguments:
+        func -- integrand, vectorized in its first axis
+        a, b -- limits of integration
+        n -- number of nodes
+        tol -- relative tolerance
+    """
+    inteLow = _gauss_legendre(func, a, b, max(n // 2, 1))
+    inte = _gauss_legendre(func, a, b, n)
+    err = abs(inte - inteLow)
+
+    while(tol is not None and not _converged(inte, err, tol) and
+          2 * n <= MAXPOINTS):
+        n = 2 * n
+        inteLow = inte
+        inte = _gauss_legendre(func, a, b, n)
+        err = abs(inte - inteLow)
+
+    if(tol is not None and not _converged(inte, err, tol)):
+        _warnNotConverged("gauss_legendre_quad", inte, err, tol)
+    return inte, err
+
+
+def gauss_kronrod_quad(func, a, b, tol=None, maxIntervals=None):
+    """Return the integral of func from a to b, and its error, by the
+    adaptive 7-15 Gauss-Kronrod rule. At each step the nodes of all the
+    subintervals not yet converged are evaluated in a single call of func,
+    and the subintervals whose error (the largest one over the other axes
+    of func) is above their share of the tolerance are bisected. When more
+    than maxIntervals subintervals would be evaluated, all of them are
+    accepted and it warns.
+
+    Keyword arguments:
+        func -- integrand, vectorized in its first axis
+        a, b -- limits of integration
+        tol -- relative tolerance (default 1.0e-6)
+        maxIntervals -- (default MAXPOINTS // 15) largest number of
+                        subintervals evaluated in one step
+    """
+    if(tol is None):
+        tol = 1.0e-6
+    if(maxIntervals is None):
+        maxIntervals = MAXPOINTS // 15
+
+    lo = array([a], dtype=float)
+    hi = array([b], dtype=float)
+    inte = 0.0
+    err = 0.0
+    stopped = False
+
+    while(lo.size > 0):
+        center = 0.5 * (hi + lo)
+        half = 0.5 * (hi - lo)
+        x = center[:, None] + half[:, None] * _KRONROD_NODES[None, :]
+        f = asarray(func(x.ravel()))
+        f = f.reshape(x.shape + f.shape[1:])
+
+        scale = half.reshape(half.shape + (1,) * (f.ndim - 2))
+        kronrod = scale * tensordot(f, _KRONROD_WEIGHTS, axes=([1], [0]))
+        gauss = scale * tensordot(f, _GAUSS_WEIGHTS, axes=([1], [0]))
+        errInterval = abs(kronrod - gauss)
+
+        total = inte + kronrod.sum(axis=0)
+        errMax = errInterval.reshape(lo.size, -1).max(axis=1)
+        accept = errMax <= tol * amax(abs(total)) * 2.0 * half / (b - a)
+        if(2 * (~accept).sum() > maxIntervals):
+            accept[:] = True
+            stopped = True
+
+        inte = inte + kronrod[accept].sum(axis=0)
+        err = err + errInterval[accept].sum(axis=0)
+
+        lo, hi = lo[~accept], hi[~accept]
+        center = center[~accept]
+        lo, hi = concatenate((lo, center)), concatenate((center, hi))
+
+    if(stopped):
+        _warnNotConverged("gauss_kronrod_quad", inte, err, tol)
+    return inte, err
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Registry of the models built by the process.
+
+get_model returns the model already built with the same parameters, if it
+is still in use, instead of building a new one, e.g.
+
+    from pycosmicstar.registry import get_model
+    myCSFR = get_model(Cosmicstarformation, Lcdmcosmology, tau=2.5)
+
+The models of the registry are shared, so they can not be changed: their
+methods setDeltaHTinker, setQBurrFunction, setMassFunctionDict and
+putIMFDict raise NameError. A model to be changed is built with its class.
+The registry holds only weak references, so a model no longer used by the
+program is released as usual.
+
+Models with the same cosmology and mass function but other parameters of
+the star formation (tau, eimf, ...) share the tables of the structures,
+see shared_tables.
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import json
+import threading
+from weakref import WeakValueDictionary, WeakSet
+
+from .cachekey import normalize
+
+_models = WeakValueDictionary()
+_tables = WeakValueDictionary()
+_shared = WeakSet()
+_lock = threading.RLock()
+
+
+class Tables(dict):
+    """Dictionary of tables that can be weakly referenced"""
+    pass
+
+
+def _key(*parts):
+    return json.dumps(normalize(list(parts)), sort_keys=True)
+
+
+def get_model(modelClass, cosmology, **kwargs):
+    """Return the model modelClass(cosmology, **kwargs), built only if
+    there is no model of the same class and parameters in use.
+
+    Keyword arguments:
+        modelClass -- Structures, Cosmicstarformation or a subclass
+        cosmology -- class of the cosmology
+        kwargs -- parameters of the model
+    """
+    key = _key(modelClass.__module__, modelClass.__name__,
+               cosmology.__module__, cosmology.__name__, kwargs)
+    with _lock:
+        model = _models.get(key)
+        if(model is None):
+            model = modelClass(cosmology, **kwargs)
+            _models[key] = model
+            _shared.add(model)
+        return model
+
+
+def is_shared(model):
+    """Return True if model was returned by get_model, even after clear,
+    since it may still be used by more than one part of the program.
+    """
+    with _lock:
+        return model in _shared
+
+
+def shared_tables(kind, parameters):
+    """Return the dictionary of tables of kind for parameters, shared by
+    all the models in use with the same parameters. A new one is created
+    if there is none.
+    """
+    key = _key(kind, parameters)
+    with _lock:
+        tables = _tables.get(key)
+        if(tables is None):
+            tables = Tables()
+            _tables[key] = tables
+        return tables
+
+
+def clear():
+    """Forget the models and tables of the registry"""
+    with _lock:
+        _models.clear()
+        _tables.clear()
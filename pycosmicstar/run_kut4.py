@@ -40,31 +40,12 @@ along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 
-from numpy import array
+from .integrators import rk4
 
 
 def rk4_int(F, x, y, xStop, h):
-
-    def run_kut4(F, x, y, h):
-        # Computes increment of y from Eqs. (7.10)
-        K0 = h * F(x, y)
-        K1 = h * F(x + h / 2.0, y + K0 / 2.0)
-        K2 = h * F(x + h / 2.0, y + K1 / 2.0)
-        K3 = h * F(x + h, y + K2)
-        #print 'run',K0,K1,K2,K3
-        return (K0 + 2.0 * K1 + 2.0 * K2 + K3) / 6.0
-
-    X = []
-    Y = []
-    X.append(x)
-    Y.append(y)
-
-    while x < xStop:
-        h = min(h, xStop - x)
-        y = y + run_kut4(F, x, y, h)
-        x = x + h
-
-        X.append(x)
-        Y.append(y)
-
-    return array(X), array(Y)
+    """Return the arrays X and Y of the integration from x to xStop with
+    steps h (see integrators.rk4).
+    """
+    X, Y, dense = rk4(F, x, y, xStop, h)
+    return X, Y
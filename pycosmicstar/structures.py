@@ -42,24 +42,152 @@ along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from numpy import sqrt, pi, log, log10, exp, array, abs
+from numpy import asarray, broadcast_arrays, broadcast_to, where, ndim
+from numpy import zeros, ones, ndindex, ma, clip
+from numpy import minimum, concatenate, diff, arange, ceil
+from numpy import float64 as Float64
 import scipy.interpolate as spint
 from scipy.interpolate import InterpolatedUnivariateSpline as spline
+from scipy.interpolate import CubicSpline, CubicHermiteSpline
+from scipy.interpolate import PchipInterpolator
+from scipy.interpolate import make_interp_spline, make_lsq_spline
 from scipy.special import gamma
 
 from .structuresabstract import Structuresabstract
 
-import sys
-pyversion = sys.version_info
-if pyversion[0] >= 3:
-    from . import filedict
-else:
-    print("Importing filedict for python2.7")
-    from . import filedict_old as filedict
+from .arraycache import ArrayCache
+from .cachekey import cache_name, version_tag
+from .cachemanager import record_access
+from .registry import shared_tables, is_shared
 
 import os
-from .diferencial import dfridr, locate
 
-from .paralleloverlist import parallel_list
+from functools import partial
+from .executor import make_executor
+from .diferencial import dfridr_array, locate_array
+from .quadrature import spline_quad, gauss_legendre_quad, gauss_kronrod_quad
+
+#Steps of the grids in log10(m) and in redshift of the tables. The grids
+#do not depend on lmax or zmax, so a wider range extends the cached tables.
+_LM_STEP = 1.0e-3
+_Z_STEP = 0.02
+
+#Step, in log10(m), of the knots of the least squares spline of sigma, and
+#the largest deviations of log(sigma) from it, decreasing, of the points
+#of the sigma table used by the spline. The numerical sigma has points far
+#from the others, mostly at large masses, that are left out.
+_SIGMA_KNOT_STEP = 0.05
+_SIGMA_DEVIATIONS = (1.0e-1, 1.0e-2, 1.0e-3)
+_SIGMA_ITERATIONS = 50
+
+
+def _rodmz(cosmology, z):
+    return cosmology.rodm(z)[0]
+
+
+def _deltaCz(cosmology, z):
+    return cosmology.getDeltaC() / cosmology.growthFunction(z)
+
+
+def _smoothSigma(km, sg):
+    """Return sigma and d_sigma_dlog10(m) at the points km, from the least
+    squares cubic spline of log(sg) with knots every _SIGMA_KNOT_STEP. The
+    points of the table farther from the spline than each deviation of
+    _SIGMA_DEVIATIONS are left out, and the spline is fitted again, until
+    they do not change.
+    """
+    km = asarray(km, dtype=Float64)
+    logSg = log(asarray(sg, dtype=Float64))
+    knots = concatenate(([km[0]] * 4,
+                         arange(km[0] + _SIGMA_KNOT_STEP,
+                                km[-1] - 0.5 * _SIGMA_KNOT_STEP,
+                                _SIGMA_KNOT_STEP),
+                         [km[-1]] * 4))
+
+    used = ones(len(km), dtype=bool)
+    iterations = 0
+    for deviation in _SIGMA_DEVIATIONS:
+        while(True):
+            iterations = iterations + 1
+            logSpline = make_lsq_spline(km[used], logSg[used], knots, k=3)
+            near = abs(logSg - logSpline(km)) <= deviation
+            if((near == used).all() or iterations >= _SIGMA_ITERATIONS):
+                break
+            used = near
+
+    sgs = exp(logSpline(km))
+    return sgs, sgs * logSpline(km, 1)
+
+
+def _splinePoly(x, y, c):
+    """Return the piecewise polynomial, scipy.interpolate.PPoly, of the
+    cubic function with values y and coefficients c over the nodes x, used
+    by the models to interpolate their tables. The last segment is
+    constant, y[-2], as are the values after it. y and c can have other
+    axes after the first one, interpolated together.
+    """
+    x = asarray(x, dtype=Float64)
+    c = asarray(c, dtype=Float64)
+    y = asarray(y, dtype=Float64).reshape((len(x),) + c.shape[1:])
+    n = len(x) - 2
+    h = (x[:n] - x[1:n + 1]).reshape((n,) + (1,) * (c.ndim - 1))
+    coefficients = zeros((4, n + 1) + c.shape[1:])
+    coefficients[0, :n] = (c[:n] - c[1:n + 1]) / (6.0 * h)
+    coefficients[1, :n] = c[:n] / 2.0
+    coefficients[2, :n] = c[:n] * h / 3.0 + c[1:n + 1] * h / 6.0 \
+                          + (y[:n] - y[1:n + 1]) / h
+    coefficients[3, :] = y[:n + 1]
+    return spint.PPoly(coefficients, x, extrapolate=False)
+
+
+def _cubicPoly(x, y):
+    """Return _splinePoly of the cubic spline that interpolate y over x,
+    along the first axis of y. Repeated nodes are removed.
+    """
+    x = asarray(x, dtype=Float64)
+    y = asarray(y, dtype=Float64)
+    keep = concatenate(([True], diff(x) > 0.0))
+    x, y = x[keep], y[keep]
+    return _splinePoly(x, y, make_interp_spline(x, y, k=3, axis=0).c)
+
+
+class _MethodReference(object):
+    """Reference, by the attribute name, to a method of a model. It is
+    used to pickle the dictionaries of methods, since private methods
+    can not be pickled.
+    """
+
+    def __init__(self, method):
+        name = method.__func__.__name__
+        if(name.startswith('__') and not name.endswith('__')):
+            owner = method.__func__.__qualname__.split('.')[-2]
+            name = '_' + owner.lstrip('_') + name
+        self.name = name
+
+    def method(self, model):
+        return getattr(model, self.name)
+
+
+#The Tinker function is a bit tricky - we use the code from
+#http://cosmo.nyu.edu/~tinker/massfunction/MF_code.tar
+#to aid us.
+_TINKER_DELTA_VIRS = array([200, 300, 400, 600, 800, 1200, 1600, 2400, 3200])
+
+_TINKER_A = array([1.858659e-01, 1.995973e-01, 2.115659e-01,
+                   2.184113e-01, 2.480968e-01, 2.546053e-01,
+                   2.600000e-01, 2.600000e-01, 2.600000e-01])
+
+_TINKER_a = array([1.466904e+00, 1.521782e+00, 1.559186e+00,
+                   1.614585e+00, 1.869936e+00, 2.128056e+00,
+                   2.301275e+00, 2.529241e+00, 2.661983e+00])
+
+_TINKER_b = array([2.571104e+00, 2.254217e+00, 2.048674e+00,
+                   1.869559e+00, 1.588649e+00, 1.507134e+00,
+                   1.464374e+00, 1.436827e+00, 1.405210e+00])
+
+_TINKER_c = array([1.193958e+00, 1.270316e+00, 1.335191e+00,
+                   1.446266e+00, 1.581345e+00, 1.795050e+00,
+                   1.965613e+00, 2.237466e+00, 2.439729e+00])
 
 
 class Structures(Structuresabstract):
@@ -72,6 +200,10 @@ class Structures(Structuresabstract):
     The models used to develop this class was presented for the first time
     in the article of Pereira and Miranda (2010) - (MNRAS, 401, 1924, 2010).
 
+    The tables of sigma, of the redshift functions and of the barionic
+    accretion rate are read from the cache, or calculated, only on their
+    first access.
+
     The cosmologic background model is passed as a instance parameter:
         cosmology
 
@@ -104,6 +236,36 @@ class Structures(Structuresabstract):
         qBurr:
             (default 1) - The q value of Burr Distribuction.
 
+        quadrature:
+            (Integration in mass of halos_n and numerical_density_halos)
+            default 'spline' - cubic spline over an uniform grid
+            'gauss' - fixed Gauss-Legendre nodes
+            'kronrod' - adaptive Gauss-Kronrod
+
+        quadraturePoints:
+            (default 50) - Number of points of 'spline' and 'gauss'.
+
+        quadratureTol:
+            (default None) - Relative tolerance of the integration. If
+            given, 'spline' and 'gauss' add points until it is reached.
+
+        sigmaDerivative:
+            (d_sigma/dlog10(m) of the mass functions)
+            default 'spline' - derivative of the least squares cubic
+                               spline of sigma, tabulated with the sigma
+                               table. fstm is that spline.
+            'dfridr' - dfridr over the steps of the sigma table, with fstm
+                       the cubic spline through the sigma table, as in the
+                       older versions
+
+        executor:
+            (default None) - Backend of the parallel loops of the tables:
+            'serial', 'thread', 'process' or an executor.Executor. By
+            default the pool of processes shared by the models is used.
+
+        n_jobs:
+            (default None) - Number of workers of the executor.
+
     """
 
     def __init__(self, cosmology, **kwargs):
@@ -111,7 +273,9 @@ class Structures(Structuresabstract):
         listParameters = ["lmin", 'lmax', "zmax",
                       "omegam", "omegab", "omegal", "h",
                       "cacheDir", "cacheFile", "massFunctionType",
-                      "delta_halo", "qBurr", "deltaWT"]
+                      "delta_halo", "qBurr", "deltaWT", "quadrature",
+                      "quadraturePoints", "quadratureTol",
+                      "sigmaDerivative", "executor", "n_jobs"]
 
         testeKeysArgs = [Ki for Ki in list(kwargs.keys())
                             if Ki not in  listParameters]
@@ -198,34 +362,71 @@ class Structures(Structuresabstract):
         else:
             self.__deltaWT = 178.0
 
+        if 'quadrature' in list(kwargs.keys()):
+            quadrature = kwargs['quadrature']
+        else:
+            quadrature = "spline"
+
+        if 'quadraturePoints' in list(kwargs.keys()):
+            quadraturePoints = kwargs['quadraturePoints']
+        else:
+            quadraturePoints = 50
+
+        if 'quadratureTol' in list(kwargs.keys()):
+            quadratureTol = kwargs['quadratureTol']
+        else:
+            quadratureTol = None
+
+        if 'sigmaDerivative' in list(kwargs.keys()):
+            sigmaDerivative = kwargs['sigmaDerivative']
+        else:
+            sigmaDerivative = "spline"
+
+        if 'executor' in list(kwargs.keys()):
+            executor = kwargs['executor']
+        else:
+            executor = None
+
+        if 'n_jobs' in list(kwargs.keys()):
+            n_jobs = kwargs['n_jobs']
+        else:
+            n_jobs = None
+
+        self.__quadratureDict = {"spline": spline_quad,
+                                 "gauss": gauss_legendre_quad,
+                                 "kronrod": gauss_kronrod_quad
+                                 }
+
+        if(quadrature not in self.__quadratureDict):
+            raise NameError("Quadrature not defined: " + str(quadrature))
+
+        self.__quadrature = quadrature
+        self.__quadraturePoints = quadraturePoints
+        self.__quadratureTol = quadratureTol
+
+        if(sigmaDerivative not in ["spline", "dfridr"]):
+            raise NameError("Derivative of sigma not defined: " +
+                            str(sigmaDerivative))
+        self.__sigmaDerivative = sigmaDerivative
+
         self._cosmology = cosmology(omegam, omegab, omegal, h)
+        self._executor = make_executor(executor, n_jobs)
 
         if(cacheDir is None):
             self._cacheDir = self. __creatCachDiretory()[0]
         else:
             self._cacheDir = cacheDir
 
-        if(cacheFile is None):
-            if(massFunctionType == "TK"):
-
-                cacheFile = str(self._cacheDir) + "/structures_cache_"\
-                  + massFunctionType + str(delta_halo) + "_" + "_" +\
-                   str(omegab) + "_" \
-                  + str(omegam) + "_" +\
-                   str(omegal) + "_ " \
-                  + str(h) + "_" + str(lmin) \
-                  + "_" + str(self.__lmax) \
-                  + "_" + str(zmax)
-
-            else:
-                cacheFile = str(self._cacheDir) + "/structures_cache_"\
-                      + massFunctionType + "_" + str(omegab) + "_" \
-                      + str(omegam) + "_" + str(omegal) + "_ " \
-                      + str(h) + "_" + str(lmin) \
-                      + "_" + str(self.__lmax) \
-                      + "_" + str(zmax)
-        else:
-            cacheFile = str(self._cacheDir) + cacheFile
+        #The tables of sigma and of the redshift functions depend only on
+        #the cosmology, they are cached in a file shared by all the mass
+        #functions. The other tables are cached in a file of the mass
+        #function, see __openTables. No one depend on lmin, lmax and zmax,
+        #since their grids are extended when needed. The names of the
+        #files are hashes of the parameters (see cachekey).
+        self.__cosmologyParameters = {"cosmology": cosmology.__name__,
+                                      "omegab": omegab, "omegam": omegam,
+                                      "omegal": omegal, "h": h}
+        self.__cacheFile = cacheFile
 
         self.__rangeMassFunction = {"ST": None,
                                    "TK": [-1.7, 0.9],
@@ -249,13 +450,13 @@ class Structures(Structuresabstract):
                                    "R": self.__massFunctionRedd
                                    }
 
-        self._cacheFIle = cacheFile
-
-        self._cache_dict = filedict.FileDict(filename=cacheFile + ".cache")
+        self.__vectorizedMassFunctions = dict(self.__massFunctionDict)
 
         self.__mmin = 1.0e+4
 
         self._zmax = zmax
+        self.__numk = int(1000.0 * log10(self.__mmax / self.__mmin))
+        self.__numz = int(ceil(zmax / _Z_STEP - 1.0e-6))
         self.__lmin = lmin
         self.__deltac = self._cosmology.getDeltaC()
         self.__pst = 0.3
@@ -281,9 +482,34 @@ class Structures(Structuresabstract):
         self.__massFunctionType = massFunctionType
         print(self.__massFunctionType )
         self.__delta_halo = delta_halo
+        self.__tinkerZ = {}
+        self.__openTables()
+
+        #Of the tables of the old cache file, only the sigma table is on
+        #the grid of the new tables.
+        self._cosmology_cache_dict = ArrayCache(
+                                     str(self._cacheDir) + "/" +
+                                     cache_name("cosmology",
+                                                cosmology.__name__,
+                                                self.__cosmologyParameters),
+                                     version=version_tag("cosmology"),
+                                     parameters=self.__cosmologyParameters,
+                                     legacyFile=self.__legacyCacheFile() +
+                                     ".cache",
+                                     legacyKeys=('km', 'sg'))
+        record_access(self._cosmology_cache_dict)
+
+        self.__setTableBuilders()
+        self.__sigmaPoly, self.__dsigmaPoly = None, None
+        self.__massPoly = None
 
-        self.__lmInf, self.__lmSup = None, None
-        self.__startingSigmaAccretion()
+        self.__lmInf, self.__lmSup = self.integrationLimitsMassFunction()
+        self.__accretionKey = ('fbt2', float(self.__lmInf),
+                               float(self.__lmSup))
+
+        print(("The valid log(mass) range for the %s mass function is: "
+                % self.__massFunctionType))
+        print((self.__lmInf, self.__lmSup))
 
     def integrationLimitsMassFunction(self):
         if(self.__dinamicLimits is False):
@@ -304,6 +530,73 @@ class Structures(Structuresabstract):
 
         return self.massRangeSigma(sgmMin, sgmMax)
 
+    def __openTables(self):
+        """Open the cache file of the tables of the mass function and the
+        tables shared by the models in use with the parameters of the
+        model. The tables are built on their first access, see __table.
+        It is called again when delta_halo or qBurr change, so the tables
+        of the other parameters are neither used nor overwritten.
+        """
+        self._cacheParameters = dict(self.__cosmologyParameters,
+                                     massFunctionType=self.__massFunctionType,
+                                     quadrature=self.__quadrature,
+                                     quadraturePoints=self.__quadraturePoints,
+                                     quadratureTol=self.__quadratureTol,
+                                     sigmaDerivative=self.__sigmaDerivative)
+        if(self.__massFunctionType == "TK"):
+            self._cacheParameters["delta_halo"] = self.__delta_halo
+        if(self.__massFunctionType == "B"):
+            self._cacheParameters["qBurr"] = self.__qBurr
+        if(self.__massFunctionType == "WT2"):
+            self._cacheParameters["deltaWT"] = self.__deltaWT
+
+        if(self.__cacheFile is None):
+            tablesFile = str(self._cacheDir) + "/" + \
+                         cache_name("structures", self.__massFunctionType,
+                                    self._cacheParameters)
+        else:
+            tablesFile = str(self._cacheDir) + self.__cacheFile
+        self._cacheFIle = tablesFile
+
+        #None of the tables of the mass function of the old cache file are
+        #on the grid of the new tables, so none is imported.
+        self._cache_dict = ArrayCache(tablesFile,
+                                      version=version_tag("structures"),
+                                      parameters=self._cacheParameters,
+                                      legacyKeys=())
+        record_access(self._cache_dict)
+
+        self.__tables = shared_tables("structures",
+                                      dict(self._cacheParameters,
+                                           lmin=self.__lmin,
+                                           lmax=self.__lmax,
+                                           zmax=self._zmax,
+                                           cacheDir=self._cacheDir,
+                                           cacheFile=self.__cacheFile))
+        self.__builtTables = set()
+        self.__tinkerCoef = None
+
+    def __legacyCacheFile(self):
+        """Return the name, without extension, of the cache file of the
+        model in the old naming of the cache, from where the tables are
+        imported.
+        """
+        if(self.__cacheFile is not None):
+            return str(self._cacheDir) + self.__cacheFile
+        parameters = self.__cosmologyParameters
+        if(self.__massFunctionType == "TK"):
+            cacheFile = str(self._cacheDir) + "/structures_cache_" \
+                      + self.__massFunctionType + str(self.__delta_halo) \
+                      + "__"
+        else:
+            cacheFile = str(self._cacheDir) + "/structures_cache_" \
+                      + self.__massFunctionType + "_"
+        return cacheFile + str(parameters["omegab"]) + "_" \
+               + str(parameters["omegam"]) + "_" \
+               + str(parameters["omegal"]) + "_ " + str(parameters["h"]) \
+               + "_" + str(self.__lmin) + "_" + str(self.__lmax) + "_" \
+               + str(self._zmax)
+
     def __creatCachDiretory(self):
         HOME = os.path.expanduser('~')
         if not os.path.exists(HOME + '/.cosmicstarformation'):
@@ -312,124 +605,347 @@ class Structures(Structuresabstract):
             os.makedirs(HOME + '/.cosmicstarformation')
         return os.path.expanduser('~') + '/.cosmicstarformation', True
 
-    def __ifSigmaNotInCache(self):
-        """Calculate the values necessaries to initialize the
-        numerical function of sigma
+    def __extendedTable(self, cache, keys, n, segment):
+        """Return the tables keys of cache over the first n points of
+        their grid. Points missing in the cache, i0 to n - 1, are
+        calculated by segment(i0, n), that return one array for each key,
+        and are appended to the cached tables. So a wider range costs only
+        the new points. The missing points are calculated under the lock
+        of the tables, so processes sharing the cache calculate them once.
         """
-        numk = 1000.0
-        kscale = self.__mmax / self.__mmin
-        kls = log10(kscale)
-        numk = numk * kls
-        kls1 = kls / numk
-        deltaz = self._zmax / (numk)
-
-        def CalculaKm(i):
-            kmass = (10.0 ** ((i + 1) * kls1)) * self.__mmin
-            return kmass
-
-        def CalculaScale(i):
-            scale = (CalculaKm(i) / self.__ct2) ** self.__ut
-            return scale
-
-        self.__kmass = array([CalculaKm(i) for i in range(int(numk))])
-        self.__scale = array([CalculaScale(i) for i in range(int(numk))])
-        self.__zred = array([self._zmax - i * deltaz
-                                  for i in range(int(numk))])
-
-        e, f = self._cosmology.sigma(self.__kmass)
-
-        self.__km = array([ei for ei in e])
-        self.__sg = array([FI for FI in f])
-
-        self.__t_z = parallel_list(self._cosmology.age, self.__zred)
-
-        self.__d_c2 = parallel_list(self.__deltaCz, self.__zred)
-
-        self.__rdm2 = parallel_list(self.__rodmz, self.__zred)
-
-        self.__rbr2 = parallel_list(self._cosmology.robr, self.__zred)
-
-        #self.__t_z = array([self._cosmology.age(zi) for zi in self.__zred])
-
-        #self.__d_c2 = array([
-            #self.__deltac / self._cosmology.growthFunction(zi)
-                            #for zi in self.__zred
-                            #])
-        #self.__rdm2 = array([self._cosmology.rodm(zi)[0]
-                            #for zi in self.__zred
-                            #])
-        #self.__rbr2 = array([self._cosmology.robr(zi)
-                                #for zi in self.__zred])
-
-        self.__lmInf, self.__lmSup = self.integrationLimitsMassFunction()
-
-    def __rodmz(self, z):
-        return self._cosmology.rodm(z)[0]
-
-    def __deltaCz(self, z):
-        return self.__deltac / self._cosmology.growthFunction(z)
+        def cached():
+            if(cache is None):
+                return None, 0
+            try:
+                tables = cache.get_many(keys)
+            except KeyError:
+                return None, 0
+            i0 = min([len(table) for table in tables])
+            return [table[:i0] for table in tables], i0
+
+        tables, i0 = cached()
+        if(i0 >= n):
+            return [table[:n] for table in tables]
+
+        if(cache is None):
+            return self.__extendTables(None, keys, tables, i0, n, segment)
+
+        with cache.lock(keys[0]):
+            tables, i0 = cached()
+            if(i0 >= n):
+                return [table[:n] for table in tables]
+            return self.__extendTables(cache, keys, tables, i0, n, segment)
+
+    def __extendTables(self, cache, keys, tables, i0, n, segment):
+        newTables = segment(i0, n)
+        if(tables is None):
+            tables = newTables
+        else:
+            tables = [concatenate((table, newTable))
+                      for table, newTable in zip(tables, newTables)]
+        if(cache is not None):
+            cache.update(dict(zip(keys, tables)))
+        self.__builtTables.update(keys)
+        return [table[:n] for table in tables]
+
+    def __massSegment(self, i0, n):
+        """Calculate the sigma table from the point i0 to n - 1
+        """
+        kmass = (10.0 ** ((arange(i0, n) + 1) * _LM_STEP)) * self.__mmin
+        e, f = self._executor.mapChunks(self._cosmology.sigma, kmass)
+        return array(e), array(f)
 
-    def __startingSigmaAccretion(self):
+    def __sigmaTable(self):
+        """Return the values necessaries to initialize the
+        numerical function of sigma
         """
-        Verify if the values are in cache
+        km, sg = self.__extendedTable(self._cosmology_cache_dict,
+                                      ('km', 'sg'), self.__numk,
+                                      self.__massSegment)
+        return {'km': km, 'sg': sg}
+
+    def __smoothSigmaTable(self):
+        """Return the tables of sigma and of d_sigma_dlog10(m) at the
+        masses of the sigma table, from its least squares spline, see
+        _smoothSigma. They are cached for each size of the sigma table,
+        since the spline changes near the end of the table when the table
+        is extended.
         """
-
+        cache = self._cosmology_cache_dict
+        keys = [('sgs', len(self._km)), ('dsg', len(self._km))]
+        if(cache is None):
+            sgs, dsg = _smoothSigma(self._km, self._sg)
+            return {'sgs': sgs, 'dsg': dsg}
         try:
+            sgs, dsg = cache.get_many(keys)
+        except KeyError:
+            with cache.lock(keys[0]):
+                try:
+                    sgs, dsg = cache.get_many(keys)
+                except KeyError:
+                    sgs, dsg = _smoothSigma(self._km, self._sg)
+                    cache.set_many(dict(zip(keys, [sgs, dsg])))
+        return {'sgs': sgs, 'dsg': dsg}
+
+    def __scaleTable(self):
+        return {'scale': (10.0 ** self._km / self.__ct2) ** self.__ut}
+
+    def __redshiftTable(self):
+        return {'zred': arange(self.__numz, -1, -1) * _Z_STEP}
+
+    def __redshiftFunctionTable(self, key, func):
+        """Return the table key of func over zred.
+        """
+        def segment(i0, n):
+            return [self._executor.map(func, arange(i0, n) * _Z_STEP)]
+
+        table, = self.__extendedTable(self._cosmology_cache_dict, (key,),
+                                      self.__numz + 1, segment)
+        return {key: table[::-1]}
+
+    def __setTableBuilders(self):
+        self.__tableBuilders = {'km': self.__sigmaTable,
+                                'sg': self.__sigmaTable,
+                                'sgs': self.__smoothSigmaTable,
+                                'dsg': self.__smoothSigmaTable,
+                                'scale': self.__scaleTable,
+                                'zred': self.__redshiftTable,
+                                't_z': lambda: self.__redshiftFunctionTable(
+                                    't_z', self._cosmology.age),
+                                'd_c2': lambda: self.__redshiftFunctionTable(
+                                    'd_c2',
+                                    partial(_deltaCz, self._cosmology)),
+                                'rdm2': lambda: self.__redshiftFunctionTable(
+                                    'rdm2', partial(_rodmz, self._cosmology)),
+                                'rbr2': lambda: self.__redshiftFunctionTable(
+                                    'rbr2', self._cosmology.robr),
+                                'abt2': self.__startBarionicAccretionRate,
+                                'ascale': self.__startBarionicAccretionRate,
+                                'tck_ab': self.__startBarionicAccretionRate,
+                                'ab_poly': self.__startBarionicAccretionRate
+                                }
+
+    def __getstate__(self):
+        """The cache files are not pickled and the executor runs serially
+        in the copy, so the model can be sent to the workers of a pool of
+        processes. Tables missing in the copy are calculated without
+        cache.
+        """
+        state = self.__dict__.copy()
+        state['_Structures__tableBuilders'] = None
+        for key, value in list(state.items()):
+            if(isinstance(value, ArrayCache)):
+                state[key] = None
+            elif(isinstance(value, dict)):
+                state[key] = dict([(k, _MethodReference(v))
+                                   if getattr(v, '__self__', None) is self
+                                   else (k, v)
+                                   for k, v in list(value.items())])
+        return state
+
+    def __setstate__(self, state):
+        for key, value in list(state.items()):
+            if(isinstance(value, dict)):
+                state[key] = dict([(k, v.method(self))
+                                   if isinstance(v, _MethodReference)
+                                   else (k, v)
+                                   for k, v in list(value.items())])
+        self.__dict__.update(state)
+        self.__setTableBuilders()
+
+    def __table(self, key):
+        """Return the table key, calculated together with the other
+        tables of its builder on the first access.
+        """
+        try:
+            return self.__tables[key]
+        except KeyError:
+            self.__tables.update(self.__tableBuilders[key]())
+            return self.__tables[key]
+
+    @property
+    def _km(self):
+        """log10 of the masses of the sigma table"""
+        return self.__table('km')
+
+    @property
+    def _sg(self):
+        """sigma at the masses of the sigma table"""
+        return self.__table('sg')
+
+    @property
+    def _sgs(self):
+        """sigma at the masses of the sigma table, from its least squares
+        spline"""
+        return self.__table('sgs')
+
+    @property
+    def _dsg(self):
+        """d_sigma_dlog10(m) at the masses of the sigma table, from the
+        least squares spline of sigma"""
+        return self.__table('dsg')
+
+    @property
+    def _scale(self):
+        """Comoving scale of the masses of the sigma table"""
+        return self.__table('scale')
+
+    @property
+    def _zred(self):
+        """Redshifts of the tables t_z, d_c2, rdm2 and rbr2"""
+        return self.__table('zred')
+
+    @property
+    def _t_z(self):
+        """Age of the universe at zred"""
+        return self.__table('t_z')
+
+    @property
+    def _d_c2(self):
+        """Critical overdensity over the growth function at zred"""
+        return self.__table('d_c2')
+
+    @property
+    def _rdm2(self):
+        """Dark matter density at zred"""
+        return self.__table('rdm2')
+
+    @property
+    def _rbr2(self):
+        """Barionic density at zred"""
+        return self.__table('rbr2')
+
+    @property
+    def _abt2(self):
+        """Barionic accretion rate at ascale"""
+        return self.__table('abt2')
+
+    @property
+    def _ascale(self):
+        """Scale factors of the barionic accretion rate table"""
+        return self.__table('ascale')
+
+    @property
+    def _tck_ab(self):
+        """Spline representation of the barionic accretion rate"""
+        return self.__table('tck_ab')
+
+    @property
+    def _abPoly(self):
+        """Piecewise polynomial of the barionic accretion rate"""
+        return self.__table('ab_poly')
+
+    @property
+    def _structuresInCache(self):
+        """True if the barionic accretion rate was read from the cache
+        and not calculated by this instance.
+        """
+        self.__table('abt2')
+        return self.__accretionKey not in self.__builtTables
+
+    def __sigmaInterpolants(self):
+        """Build the piecewise cubic polynomials of sigma(log10(m)) and of
+        its inverse, log10(m)(sigma). Both are evaluated by binary search
+        over the segments. sigma is the Hermite polynomial of the tables
+        of sigma and d_sigma_dlog10(m) from the least squares spline, so
+        it is that spline, and its derivative is d_sigma_dlog10(m). With
+        sigmaDerivative 'dfridr', sigma is the cubic spline through the
+        points of the sigma table, as in the older versions.
+        """
+        if(self.__sigmaPoly is not None):
+            return
+        if(self.__sigmaDerivative == "dfridr"):
+            sg = self._sg
+            self.__sigmaPoly = CubicSpline(self._km, sg)
+        else:
+            sg = self._sgs
+            self.__sigmaPoly = CubicHermiteSpline(self._km, sg, self._dsg)
+            self.__dsigmaPoly = self.__sigmaPoly.derivative()
 
-            self.__km = self._cache_dict['km']
-            self.__scale = self._cache_dict['scale']
-            self.__zred = self._cache_dict['zred']
-            self.__sg = self._cache_dict['sg']
-            self.__t_z = self._cache_dict['t_z']
-            self.__d_c2 = self._cache_dict['d_c2']
-            self.__rdm2 = self._cache_dict['rdm2']
-            self.__rbr2 = self._cache_dict['rbr2']
-            self._abt2 = self._cache_dict['abt2']
-            self._ascale = self._cache_dict['ascale']
-            self._tck_ab = self._cache_dict['tck_ab']
-
-            print("\nStructures Data in Cache\n")
-
-        except:
-            self.__ifSigmaNotInCache()
-            self.__startBarionicAccretionRate()
-            self.__cachingAtribut()
-
-        self.__lmInf, self.__lmSup = self.integrationLimitsMassFunction()
-
-        print(("The valid log(mass) range for the %s mass function is: "
-                % self.__massFunctionType))
-        print((self.__lmInf, self.__lmSup))
-
-    def __cachingAtribut(self):
-        """Caching the values
-        """
-        self._cache_dict['km'] = self.__km
-        self._cache_dict['scale'] = self.__scale
-        self._cache_dict['zred'] = self.__zred
-        self._cache_dict['sg'] = self.__sg
-        self._cache_dict['t_z'] = self.__t_z
-        self._cache_dict['d_c2'] = self.__d_c2
-        self._cache_dict['rdm2'] = self.__rdm2
-        self._cache_dict['rbr2'] = self.__rbr2
-        self._cache_dict['abt2'] = self._abt2
-        self._cache_dict['ascale'] = self._ascale
-        self._cache_dict['tck_ab'] = self._tck_ab
+        #The inverse is built from the decreasing envelope of the table,
+        #since the numerical sigma is not strictly monotonic everywhere.
+        sgEnvelope = minimum.accumulate(sg)
+        decreasing = concatenate(([True], diff(sgEnvelope) < 0))
+        self.__massPoly = PchipInterpolator(sgEnvelope[decreasing][::-1],
+                                            self._km[decreasing][::-1])
 
     def massFunction(self, lm, z):
         """Return the mass function of dark halos.
 
+        lm and z can be scalars or numpy arrays that broadcast against each
+        other. For scalars a float is returned and a mass out of the valid
+        range of the mass function raises NameError. For arrays a
+        numpy.ma.MaskedArray is returned, with the points out of the valid
+        range masked.
+
         Keyword arguments:
             lm -- log10 of the mass of the dark halo
             z -- redshift
         """
-        return self.__massFunctionDict[self.__massFunctionType](lm, z)
-        
+        massFunction = self.__massFunctionDict[self.__massFunctionType]
+
+        if(ndim(lm) == 0 and ndim(z) == 0):
+            return massFunction(lm, z)
+
+        if(self.__massFunctionType in self.__vectorizedMassFunctions and
+           massFunction == self.__vectorizedMassFunctions[
+                                            self.__massFunctionType]):
+            return massFunction(lm, z)
+
+        return self.__massFunctionLoop(massFunction, lm, z)
+
+    def __massFunctionLoop(self, massFunction, lm, z):
+        """Evaluate, point by point, a scalar mass function added by
+        setMassFunctionDict, masking the points where it raises NameError.
+        """
+        lm, z = broadcast_arrays(asarray(lm, dtype=Float64),
+                                 asarray(z, dtype=Float64))
+        dn_dm = zeros(lm.shape)
+        valid = ones(lm.shape, dtype=bool)
+        for i in ndindex(lm.shape):
+            try:
+                dn_dm[i] = massFunction(lm[i], z[i])
+            except NameError:
+                valid[i] = False
+        return ma.masked_array(dn_dm, mask=~valid)
 
     def validadeMassRange(self, sgm, lnMin, lnMax):
-        if(log(sgm) < -1.2 or - log(sgm) > 1.05):
+        if(not self.validMassRange(sgm, lnMin, lnMax).all()):
             raise NameError("Mass of dark Halo outside of the valid range")
 
+    def validMassRange(self, sgm, lnMin, lnMax):
+        """Return a boolean array that is True where sgm is inside of the
+        valid range used by validadeMassRange.
+        """
+        sgm = asarray(sgm)
+        return ~((log(sgm) < -1.2) | (- log(sgm) > 1.05))
+
+    def __massFunctionTerms(self, lm, z):
+        """Return lm and z broadcasted as arrays, together with the terms
+        shared by all mass functions: the mass of the dark halo, the dark
+        matter density, sigma and d_sigma_dlog10(m).
+        """
+        lm, z = broadcast_arrays(asarray(lm, dtype=Float64),
+                                 asarray(z, dtype=Float64))
+        rdmt, drdmt = self._cosmology.rodm(z)
+        kmass = 10.0 ** (lm)
+        sgm = self.fstm(lm)
+        dsgm_dlgm = self.dsgm_dlgm(lm)
+        return lm, z, kmass, rdmt, sgm, dsgm_dlgm
+
+    def __dndm(self, rdmt, kmass, fst, sgm, dsgm_dlgm, valid=True):
+        """Return the mass function from the multiplicity function fst.
+        For scalar input a mass out of the valid range raises NameError,
+        for array input the points out of the range are masked.
+        """
+        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
+        valid = broadcast_to(valid, frst.shape)
+        if(frst.ndim == 0):
+            if(not valid):
+                raise NameError("Mass of dark Halo outside of the valid range")
+            return frst[()]
+        return ma.masked_array(frst, mask=~valid)
+
     def __massFunctionJenkins(self, lm, z):
         """Return the mass function of Jenkins et al. (2003).
          Keyword arguments:
@@ -437,24 +953,12 @@ class Structures(Structuresabstract):
             z -- redshift
         """
 
-        sgm = self.fstm(lm)
-        self.validadeMassRange(sgm, -1.2, 1.05)
-        #gte = self._cosmology.growthFunction(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
-        #sigma1 = self.__deltac / (sgm * gte)
-        #sigma2 = sigma1 ** 2.0
-
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
+        valid = self.validMassRange(sgm, -1.2, 1.05)
 
         fst = 0.315 * exp(- abs(log(1.0 / sgm) + 0.61) ** 3.8)
 
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm, valid)
 
     def __massFunctionPressSchechter(self, lm, z):
         """Return the value of Press-Schechter (1974) mass function.
@@ -463,35 +967,20 @@ class Structures(Structuresabstract):
             z -- redshift
         """
 
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
         gte = self._cosmology.growthFunction(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
         sigma1 = self.__deltac / (sgm * gte)
         sigma2 = sigma1 ** 2.0
         fst = sqrt(2.0 / pi) * (sigma1) * exp(-0.5 * sigma2)
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm)
 
     def _masFunctionWT0(self, lm, z, A, a, b, c):
 
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
-
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
 
         fst = A * (((b / sgm) ** a) + 1.0) * exp(-c / sgm ** 2.0)
 
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm)
 
     def __massFunctionWT1(self, lm, z):
         """
@@ -506,24 +995,16 @@ class Structures(Structuresabstract):
         b = 1.406
         c = 1.21
 
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
         gte = self._cosmology.growthFunction(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
 
-        self.validadeMassRange(sgm, -0.55, 1.31)
+        valid = self.validMassRange(sgm, -0.55, 1.31)
 
         sgmD = sgm * gte
 
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
-
         fst = A * (((b / sgmD) ** a) + 1.0) * exp(-c / sgmD ** 2.0)
 
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm, valid)
 
     def __massFunctionWT2(self, lm, z):
         """
@@ -534,17 +1015,11 @@ class Structures(Structuresabstract):
             z -- redshift
         """
 
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
         gte = self._cosmology.growthFunction(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
 
         sgmD = sgm * gte
 
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
-
         p = 0.072
         q = 2.130
 
@@ -558,40 +1033,30 @@ class Structures(Structuresabstract):
                                          exp(p * (1.0 - delta / 178)
                                              * (1.0 / sig ** q))
 
-        if(z < 0):
+        if(z.ndim == 0 and z < 0):
             raise NameError("z lower than zero.")
 
-        if(z == 0):
-            self.validadeMassRange(sgm, -0.55, 1.05)
-        else:
-            self.validadeMassRange(sgm, -0.06, 1.024)
-
-        if(z == 0):
-            A = 0.194
-            a = 2.267
-            b = 1.805
-            gm = 1.287
-
-        elif(z >= 6):
-            A = 0.563
-            a = 3.810
-            b = 0.874
-            gm = 1.453
-
-        else:
-
-            A = omz * (1.097 * (1.0 + z) ** (-3.216) + 0.074)
-            a = omz * (5.907 * ((1.0 + z) ** (-3.058)) + 2.349)
-            b = omz * (3.136 * ((1.0 + z) ** (-3.599)) + 2.344)
-            gm = 1.318
+        valid = (z >= 0) & where(z == 0,
+                                 self.validMassRange(sgm, -0.55, 1.05),
+                                 self.validMassRange(sgm, -0.06, 1.024))
+
+        A = where(z == 0, 0.194,
+                  where(z >= 6, 0.563,
+                        omz * (1.097 * (1.0 + z) ** (-3.216) + 0.074)))
+        a = where(z == 0, 2.267,
+                  where(z >= 6, 3.810,
+                        omz * (5.907 * ((1.0 + z) ** (-3.058)) + 2.349)))
+        b = where(z == 0, 1.805,
+                  where(z >= 6, 0.874,
+                        omz * (3.136 * ((1.0 + z) ** (-3.599)) + 2.344)))
+        gm = where(z == 0, 1.287,
+                   where(z >= 6, 1.453, 1.318))
 
         fst = A * (((b / sgmD) ** a) + 1.0) * exp(-gm / sgmD ** 2.0)
 
         fst = gammaDSZ(self.__deltaWT, sgmD, z) * fst
 
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm, valid)
 
     def _burrBq(self):
         if(self.__qBurr > 0.0 and self.__qBurr < 1.0):
@@ -618,22 +1083,56 @@ class Structures(Structuresabstract):
         if(self.__qBurr is None):
             raise NameError('The Burr coeficient is None.')
 
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
         gte = self._cosmology.growthFunction(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
         sigma1 = self.__deltac / (sgm * gte)
         sigma2 = sigma1 ** 2.0
         fst = self._burrBq() * sqrt(2.0 / pi) * (sigma1) * (
               1.0 - (1.0 - self.__qBurr) * 0.5 * sigma2
               ) ** (1.0 / (1.0 - self.__qBurr))
 
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm)
+
+    def __tinkerCoefficients(self):
+        """Return the A, a, b and c coefficients of the Tinker mass function
+        for the current delta_halo, interpolated only once for each
+        delta_halo.
+        """
+        if(self.__tinkerCoef is None):
+            A_func = spline(_TINKER_DELTA_VIRS, _TINKER_A)
+            a_func = spline(_TINKER_DELTA_VIRS, _TINKER_a)
+            b_func = spline(_TINKER_DELTA_VIRS, _TINKER_b)
+            c_func = spline(_TINKER_DELTA_VIRS, _TINKER_c)
+
+            self.__tinkerCoef = (A_func(self.__delta_halo),
+                                 a_func(self.__delta_halo),
+                                 b_func(self.__delta_halo),
+                                 c_func(self.__delta_halo),
+                                 exp(-(0.75 / log(self.__delta_halo / 75))
+                                     ** 1.2))
+            self.__tinkerZ = {}
+
+        return self.__tinkerCoef
+
+    def __tinkerParameters(self, z):
+        """Return the A, a, b and c parameters of the Tinker mass function
+        at redshift z. For scalar z they are kept, so that they are
+        computed only once for each redshift.
+        """
+        A_0, a_0, b_0, c_0, alpha = self.__tinkerCoefficients()
+
+        if(z.ndim == 0 and float(z) in self.__tinkerZ):
+            return self.__tinkerZ[float(z)]
+
+        A = A_0 * (1 + z) ** (-0.14)
+        a = a_0 * (1 + z) ** (-0.06)
+        b = b_0 * (1 + z) ** (-alpha)
+        c = c_0
+
+        if(z.ndim == 0):
+            self.__tinkerZ[float(z)] = (A, a, b, c)
+
+        return A, a, b, c
 
     def __massFunctionTinker(self, lm, z):
         """Return the mass function of dark halos of
@@ -648,85 +1147,15 @@ class Structures(Structuresabstract):
         z -- redshift
         """
 
-        #The Tinker function is a bit tricky - we use the code from
-        #http://cosmo.nyu.edu/~tinker/massfunction/MF_code.tar
-        #to aid us.
-        delta_virs = array([200, 300, 400, 600, 800, 1200, 1600, 2400, 3200])
-        A_array = array([1.858659e-01,
-                            1.995973e-01,
-                            2.115659e-01,
-                            2.184113e-01,
-                            2.480968e-01,
-                            2.546053e-01,
-                            2.600000e-01,
-                            2.600000e-01,
-                            2.600000e-01])
-
-        a_array = array([1.466904e+00,
-                            1.521782e+00,
-                            1.559186e+00,
-                            1.614585e+00,
-                            1.869936e+00,
-                            2.128056e+00,
-                            2.301275e+00,
-                            2.529241e+00,
-                            2.661983e+00])
-
-        b_array = array([2.571104e+00,
-                            2.254217e+00,
-                            2.048674e+00,
-                            1.869559e+00,
-                            1.588649e+00,
-                            1.507134e+00,
-                            1.464374e+00,
-                            1.436827e+00,
-                            1.405210e+00])
-
-        c_array = array([1.193958e+00,
-                            1.270316e+00,
-                            1.335191e+00,
-                            1.446266e+00,
-                            1.581345e+00,
-                            1.795050e+00,
-                            1.965613e+00,
-                            2.237466e+00,
-                            2.439729e+00])
-        A_func = spline(delta_virs, A_array)
-        a_func = spline(delta_virs, a_array)
-        b_func = spline(delta_virs, b_array)
-        c_func = spline(delta_virs, c_array)
-
-        A_0 = A_func(self.__delta_halo)
-        a_0 = a_func(self.__delta_halo)
-        b_0 = b_func(self.__delta_halo)
-        c_0 = c_func(self.__delta_halo)
-
-        A = A_0 * (1 + z) ** (-0.14)
-        a = a_0 * (1 + z) ** (-0.06)
-        alpha = exp(-(0.75 / log(self.__delta_halo / 75)) ** 1.2)
-        b = b_0 * (1 + z) ** (-alpha)
-        c = c_0
-
-        #gte = self._cosmology.growthFunction(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
 
-        self.validadeMassRange(sgm, -0.6, 0.4)
+        A, a, b, c = self.__tinkerParameters(z)
 
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
-        #sigma1 = self.__deltac / (sgm * gte)
-        #sigma2 = sigma1 ** 2.0
-
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
+        valid = self.validMassRange(sgm, -0.6, 0.4)
 
         fst = A * ((sgm / b) ** (-a) + 1) * exp(-c / sgm ** 2.0)
 
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm, valid)
 
     def __massFunctionW(self, lm, z):
         # LANL fitting function - Warren et al. 2005, astro-ph/0506395, eqtn. 5
@@ -735,27 +1164,17 @@ class Structures(Structuresabstract):
         b = 0.2538
         c = 1.1982
 
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
         gte = self._cosmology.growthFunction(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
 
-        if(lm < 10 or lm > 15):
-            raise NameError("Mass of dark Halo outside of the valid range")
+        valid = (lm >= 10) & (lm <= 15)
 
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
         sigma1 = self.__deltac / (sgm * gte)
         sigma2 = sigma1 ** 2.0
 
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
-
         fst = A * ((sigma1 ** (-a)) + b) * exp(-c / sigma2)
 
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm, valid)
 
     def __massFunctionST(self, lm, z):
         """Return the mass function of dark halos of
@@ -765,22 +1184,15 @@ class Structures(Structuresabstract):
             lm -- log10 of the mass of the dark halo
             z -- redshift
         """
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
         gte = self._cosmology.growthFunction(z)
         #gte2 = self._cosmology.dgrowth_dt(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
         sigma1 = self.__deltac / (sgm * gte)
         sigma2 = sigma1 ** 2.0
         expn = exp(-self.__ast2 * sigma2 / 2.0)
         fst = self.__ctst * sigma1 * \
             (1.0 + (1.0 / (sigma2 * self.__ast2)) ** self.__pst) * expn
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm)
 
     def __massFunctionRedd(self, lm, z):
         """Return the mass function of dark halos of
@@ -793,14 +1205,9 @@ class Structures(Structuresabstract):
             lm -- log10 of the mass of the dark halo
             z -- redshift
         """
+        lm, z, kmass, rdmt, sgm, dsgm_dlgm = self.__massFunctionTerms(lm, z)
         gte = self._cosmology.growthFunction(z)
-        rdmt, drdmt = self._cosmology.rodm(z)
-        step = lm / 2.0e+1
-        kmsgm = lm
-        kmass = 10.0 ** (kmsgm)
-        sgm = self.fstm(lm)
-        self.validadeMassRange(sgm, -1.7, 0.9)
-        dsgm_dlgm = dfridr(self.fstm, lm, step, err=0.0)
+        valid = self.validMassRange(sgm, -1.7, 0.9)
 
         sigma1 = self.__deltac / (sgm * gte)
 
@@ -817,36 +1224,71 @@ class Structures(Structuresabstract):
                     0.6 * lngauss1 + 0.4 * lngauss2) \
                 * exp(- 0.03 / (neff + 3.0) ** 2.0 * (sigma1) ** 0.6)
 
-        frst = (rdmt / kmass ** 2.0) * fst * abs(dsgm_dlgm) / sgm
-        dn_dm = frst
-        return dn_dm
+        return self.__dndm(rdmt, kmass, fst, sgm, dsgm_dlgm, valid)
 
     def fstm(self, lm):
-        '''Numerical function that return the value of sigm that
-        will be used by dfridr to calculate d_sigma_dlog10(m).
+        '''Numerical function that return the value of sigm, from the
+        least squares cubic spline of the sigma table (see
+        sigmaDerivative). Values of lm out of the table are taken at the
+        closest end of the table.
 
         Keyword arguments:
-            lm -- log10 of the mass of dark halo
+            lm -- log10 of the mass of dark halo, scalar or numpy array
         '''
-        j = locate(self.__km, len(self.__km) - 1, lm)
-        return self.__sg[j]
-
-    def massRangeSigma(self, sgmMin, sgmMax):
-        """Return the mass down and up for a sigma range
-        """
-
-        nElementos = len(self.__sg) - 1
+        self.__sigmaInterpolants()
+        lm = clip(lm, self._km[0], self._km[-1])
+        sgm = self.__sigmaPoly(lm)
+        if(sgm.ndim == 0):
+            return float(sgm)
+        return sgm
+
+    def __sigmaStep(self, lm):
+        '''Return sigma at the point of the sigma table found by locate,
+        the step function of the table.
+        '''
+        return self._sg[locate_array(self._km, lm)]
 
-        jmin = locate(self.__sg[::-1], nElementos, sgmMin)
-        jmax = locate(self.__sg[::-1], nElementos, sgmMax)
+    def dsgm_dlgm(self, lm):
+        '''Return d_sigma_dlog10(m), the derivative of the cubic spline of
+        fstm, from the table cached with the sigma table. Values of lm out
+        of the table are taken at the closest end of the table. With sigmaDerivative 'dfridr' it is the derivative
+        of dfridr with a step lm / 20 over the step function of the sigma
+        table, as in the older versions. Both are evaluated at once for
+        arrays of lm by binary search into the table.
 
-        jmin = (nElementos) - jmin
-        jmax = (nElementos) - jmax
+        Keyword arguments:
+            lm -- log10 of the mass of dark halo, scalar or numpy array
+        '''
+        if(self.__sigmaDerivative == "dfridr"):
+            dsgm_dlgm = dfridr_array(self.__sigmaStep, lm,
+                                     asarray(lm) / 2.0e+1)
+        else:
+            self.__sigmaInterpolants()
+            dsgm_dlgm = self.__dsigmaPoly(clip(lm, self._km[0],
+                                               self._km[-1]))
+        if(dsgm_dlgm.ndim == 0):
+            return float(dsgm_dlgm)
+        return dsgm_dlgm
+
+    def massSigma(self, sgm):
+        """Return the log10 of the mass of dark halo for a given sigma,
+        the inverse of fstm. Values of sgm out of the table are taken at
+        the closest end of the table.
 
-        massMin = self.__km[jmin]
-        massMax = self.__km[jmax]
+        Keyword arguments:
+            sgm -- sigma, scalar or numpy array
+        """
+        self.__sigmaInterpolants()
+        sgm = clip(sgm, self.__massPoly.x[0], self.__massPoly.x[-1])
+        lm = self.__massPoly(sgm)
+        if(lm.ndim == 0):
+            return float(lm)
+        return lm
 
-        return [massMin, massMax]
+    def massRangeSigma(self, sgmMin, sgmMax):
+        """Return the mass down and up for a sigma range
+        """
+        return [self.massSigma(sgmMin), self.massSigma(sgmMax)]
 
     def __fmassM(self, lm, z):
         """Return the mass function of dark halos multiplied by Mass -
@@ -859,92 +1301,116 @@ class Structures(Structuresabstract):
         mdn_dm = kmassa2 * frst
         return mdn_dm
 
-    def halos_n(self, z):
-        """Return the integral of the mass function of dark halos multiplied
-        by mass in the range of log(M_min) a log(M_max)
-
-        Keyword arguments:
-            z -- redshift
+    def __massIntegral(self, func, lmInf, lmSup, z, errorEstimate=False):
+        """Return the integral in log10(m), from lmInf to lmSup, of
+        func(lm, z) for a scalar or an array of redshifts, with the
+        quadrature of the model. The integrand is evaluated at once over
+        the masses of the quadrature by all the redshifts and the
+        integration is made along the mass axis. Points masked by the
+        mass function do not contribute.
+        If errorEstimate is True return also the estimated error.
         """
+        z = asarray(z, dtype=Float64)
 
-        lmInf = self.__lmInf
-        lmSup = self.__lmSup
-
-        fmassM = lambda lm: self.__fmassM(lm, z)
+        def integrand(lm):
+            Fm = ma.filled(func(lm.reshape(lm.shape + (1,) * z.ndim), z), 0.0)
+            return broadcast_to(Fm, lm.shape + z.shape)
 
-        deltal = (lmSup - lmInf) / 50.0
+        quadrature = self.__quadratureDict[self.__quadrature]
+        if(self.__quadrature == "kronrod"):
+            Inte, err = quadrature(integrand, lmInf, lmSup,
+                                   tol=self.__quadratureTol)
+        else:
+            Inte, err = quadrature(integrand, lmInf, lmSup,
+                                   n=self.__quadraturePoints,
+                                   tol=self.__quadratureTol)
+
+        if(ndim(Inte) == 0):
+            Inte = float(Inte)
+        if(errorEstimate):
+            return Inte, err
+        return Inte
 
-        Lm = [lmInf + i * deltal for i in range(50)]
+    def halos_n(self, z, errorEstimate=False):
+        """Return the integral of the mass function of dark halos multiplied
+        by mass in the range of log(M_min) a log(M_max)
 
-        Fm = [fmassM(lm) for lm in Lm]
+        Keyword arguments:
+            z -- redshift, scalar or numpy array
+            errorEstimate -- (default False) if True, return also the
+                             estimated error of the integration
+        """
 
-        tck = spint.splrep(Lm, Fm)
-        Inte = spint.splint(lmInf, lmSup, tck)
-        return Inte
+        return self.__massIntegral(self.__fmassM, self.__lmInf,
+                                   self.__lmSup, z, errorEstimate)
 
     def fbstruc(self, z):
         """Return the faction of barions into structures
 
         Keyword arguments:
-            z -- redshift
+            z -- redshift, scalar or numpy array
         """
         rdm, drdm_dt = self._cosmology.rodm(z)
         fb = self.halos_n(z) / rdm
         return fb
 
-    def numerical_density_halos(self, z):
+    def numerical_density_halos(self, z, errorEstimate=False):
         """Return the numerial density of dark halos
         within the comove volume
 
         Keyword arguments:
-            z- redshift
+            z- redshift, scalar or numpy array
+            errorEstimate -- (default False) if True, return also the
+                             estimated error of the integration
         """
 
-        deltal = (self.__lmax - self.__lmin) / 50.0
-        Lm = [self.__lmin + i * deltal for i in range(50)]
-
-        Fm = [self.massFunction(lm, z) for lm in Lm]
-
-        tck = spint.splrep(Lm, Fm)
-        Inte = spint.splint(self.__lmin, self.__lmax, tck)
-        return Inte
+        return self.__massIntegral(self.massFunction, self.__lmin,
+                                   self.__lmax, z, errorEstimate)
 
     def abt(self, a):
         """Return the accretion rate of barionic matter, as
-        a function of scala factor, into strutures.
+        a function of scala factor, into strutures. It is the cubic
+        interpolation of the table used by the Cosmicstarformation, and a
+        can be a scalar or a numpy array.
 
         Keyword arguments:
             a -- scala factor (1.0 / (1.0 + z))
         """
-        i = locate(self._ascale, len(self._ascale) - 1, a)
-        return self._abt2[i]
+        abPoly = self._abPoly
+        resp = abPoly(clip(asarray(a, dtype=Float64), abPoly.x[0],
+                           abPoly.x[-1]))
+        if(ndim(resp) == 0):
+            return float(resp)
+        return resp
 
     def __startBarionicAccretionRate(self):
-
-        np = 1000
-        deltaz = self._zmax / float(np)
-
-        z = [self._zmax - i * deltaz for i in range(np)]
-        z.append(0)
-        z = array(z)
-        fbt2 = array([self.fbstruc(zi) for zi in z])
-        ascale = array([1.0 / (1.0 + zi) for zi in z])
-        self._ascale = ascale
+        """Return the tables of the barionic accretion rate, abt2, over
+        the scale factors ascale and its spline representation, tck_ab.
+        The fraction of barions into structures is cached over the
+        redshift grid, the accretion rate is derived from it.
+        """
+        def segment(i0, n):
+            #The copies of the model sent to the workers take the sigma
+            #table with them.
+            self.__sigmaInterpolants()
+            return [self._executor.mapChunks(self.fbstruc,
+                                             arange(i0, n) * _Z_STEP)]
+
+        fbt2, = self.__extendedTable(self._cache_dict, (self.__accretionKey,),
+                                     self.__numz + 1, segment)
+        fbt2 = fbt2[::-1]
+        z = self._zred
+        ascale = 1.0 / (1.0 + z)
 
         tck = spint.splrep(ascale, fbt2)
         ab3 = spint.splev(ascale, tck, der=1)
 
-        def a5(z, i):
-            a = 1.0 / (1.0 + z)
-            a2 = a * a
-            a3 = -1.0 * ab3[i] * a2
-            a4 = a3
-            a5 = self._cosmology.getRobr0() * abs(a4) \
+        a2 = ascale * ascale
+        abt2 = self._cosmology.getRobr0() * abs(-1.0 * ab3 * a2) \
                  / self._cosmology.dt_dz(z)
-            return a5
-
-        self._abt2 = array([a5(z[i], i) for i in range(z.size)])
-        self._tck_ab = spint.splrep(self._ascale, self._abt2)
+        tck_ab = spint.splrep(ascale, abt2)
+        return {'abt2': abt2, 'ascale': ascale, 'tck_ab': tck_ab,
+                'ab_poly': _splinePoly(ascale, abt2, tck_ab[1])}
 
     def getCacheDir(self):
         """Return True and cache name if the cache directory existe
@@ -962,8 +1428,13 @@ class Structures(Structuresabstract):
         return [lmInf, lmSup]
 
     def setDeltaHTinker(self, delta_halo):
+        """Set the delta_halo of the Tinker mass function. The tables are
+        then read from, or built into, the cache of the new delta_halo.
+        """
+        self._checkNotShared()
         if(self.__massFunctionType == "TK"):
             self.__delta_halo = delta_halo
+            self.__reopenTables()
             return True
         else:
             return False
@@ -977,9 +1448,29 @@ class Structures(Structuresabstract):
     def setQBurrFunction(self, q):
         """
         Set the q value of dark haloes mass function derived from Burr
-        distribuction.
+        distribuction. The tables are then read from, or built into, the
+        cache of the new q.
         """
+        self._checkNotShared()
         self.__qBurr = q
+        if(self.__massFunctionType == "B"):
+            self.__reopenTables()
+
+    def _checkNotShared(self):
+        """Raise NameError if the model is shared by the registry, see
+        registry.get_model.
+        """
+        if(is_shared(self)):
+            raise NameError("The models of the registry can not be changed, "
+                            "build the model with its class")
+
+    def __reopenTables(self):
+        """Open the tables of the new parameters. A cacheFile given to the
+        model holds the tables of its first parameters, so the ones of the
+        new parameters are cached in the file named by them.
+        """
+        self.__cacheFile = None
+        self.__openTables()
 
     def getmassFunctionDict(self):
         """
@@ -995,5 +1486,6 @@ class Structures(Structuresabstract):
         """
         Add a new key and function in the dark haloes mass function dictionary
         """
+        self._checkNotShared()
 
         self.__massFunctionDict[key] = function
@@ -37,11 +37,14 @@ class Structuresabstract:
         raise NotImplementedError('I need to be implemented!')
 
     def fstm(self, lm):
-        '''Numerical function that return the value of sigm that
-        will be used by dfridr to calculate d_sigma_dlog10(m).'''
+        '''Numerical function that return the value of sigm.'''
         raise NotImplementedError('I need to be implemented!')
 
-    def halos_n(self, z):
+    def dsgm_dlgm(self, lm):
+        '''Return the derivative of sigma with respect to log10(m).'''
+        raise NotImplementedError('I need to be implemented!')
+
+    def halos_n(self, z, errorEstimate=False):
         """Return the integral of the mass function of dark halos multiplied
         by mass in the range of log(M_min) a log(M_max)
         """
@@ -52,7 +55,7 @@ class Structuresabstract:
         """
         raise NotImplementedError('I need to be implemented!')
 
-    def numerical_density_halos(self, z):
+    def numerical_density_halos(self, z, errorEstimate=False):
         """Return the numerial density of dark halos
         within the comove volume
         """
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Sweeps of Cosmicstarformation over grids of parameters.
+
+The grid is a dictionary of parameters as in warmup, e.g.
+
+    {"massFunctionType": ["ST", "TK"], "tau": [2.0, 2.5, 3.0],
+     "nsch": [1, 2], "imfType": ["S", "K"]}
+
+Each model of the grid is a run. The results of the runs, the CSFR and the
+density of gas into structures at the redshifts of the sweep and the
+efficiency, are written to a ResultStore:
+
+    from pycosmicstar.sweep import sweep
+    store = sweep(grid, "results", z=linspace(0.0, 10.0, 101))
+    store.get({"massFunctionType": "ST", "tau": 2.5, ...})["csfr"]
+
+The tables of the cosmologies and of the structures are first built by the
+stages of warmup, once for all the runs that share them. The runs that
+differ only in tau, eimf and nsch are then integrated together (see
+Cosmicstarformation.ensembleResults), in chunks of at most chunk runs
+spread over a pool of processes. The results of each chunk are written to
+the store as soon as the chunk ends, and the runs already in the store are
+not run again. So an interrupted sweep resumes where it stopped.
+
+From the command line:
+
+    pycosmicstar-sweep grid.json results --jobs 8 --redshifts 0 19 191
+
+or python -m pycosmicstar.sweep.
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from functools import partial
+
+from numpy import asarray, array_equal, linspace, nan
+from numpy import float64 as Float64
+
+from .arraycache import ArrayCache
+from .cachekey import cache_key, normalize
+from .registry import get_model
+from .cosmicstarformation import Cosmicstarformation
+from .executor import make_executor, get_executor
+from .warmup import COSMOLOGIES, expand_grid, check_grid, run_stages
+
+#Parameters integrated together by the runs of a chunk
+ENSEMBLE_PARAMETERS = ["tau", "eimf", "nsch"]
+
+#Parameters that do not change the results of a run
+RUN_EXCLUDE = ["executor", "n_jobs", "cacheDir"]
+
+RESULTS = ["csfr", "rho_gas", "efficiency"]
+
+DEFAULT_REDSHIFTS = linspace(0.0, 19.0, 191)
+
+
+def _runParameters(run):
+    return dict([(name, value) for name, value in run.items()
+                 if name not in RUN_EXCLUDE])
+
+
+class ResultStore(object):
+    """Store of the results of the runs of sweeps in the directory path.
+    The results of a run are found by its parameters, and are written all
+    at once, so a run is either complete in the store or not there. The
+    runs are keyed by the version of the CSFR tables too (see cachekey), so
+    the results of older versions are not returned.
+
+    Keyword arguments:
+        path -- directory of the store
+        z -- (default the redshifts of the store, or DEFAULT_REDSHIFTS for
+             a new store) redshifts of the results. It must be the one of
+             the store, if it is not new.
+    """
+
+    def __init__(self, path, z=None):
+        self.__path = path
+        self.__tables = ArrayCache(os.path.join(path, "runs"))
+
+        try:
+            redshifts = asarray(self.__tables["z"])
+        except KeyError:
+            redshifts = None
+        if(redshifts is None):
+            redshifts = DEFAULT_REDSHIFTS if z is None \
+                else asarray(z, dtype=Float64)
+            with self.__tables.lock("z"):
+                if("z" not in self.__tables):
+                    self.__tables["z"] = redshifts
+            redshifts = asarray(self.__tables["z"])
+        if(z is not None and not array_equal(asarray(z, dtype=Float64),
+                                             redshifts)):
+            raise NameError("The redshifts are not the ones of the store " +
+                            str(path))
+        self.__z = redshifts
+
+    def getPath(self):
+        """Return the directory of the store"""
+        return self.__path
+
+    def getRedshifts(self):
+        """Return the redshifts of the results"""
+        return self.__z
+
+    def key(self, run):
+        """Return the key of the run, a dictionary of parameters"""
+        return cache_key("csfr", _runParameters(run))
+
+    def __contains__(self, run):
+        return (self.key(run), "parameters") in self.__tables
+
+    def storedKeys(self):
+        """Return the set of the keys of the runs in the store, read at
+        once, to find which ones of many runs are in the store.
+        """
+        return set([key[0] for key in self.__tables.keys()
+                    if isinstance(key, tuple) and key[1] == "parameters"])
+
+    def __len__(self):
+        return len(self.runs())
+
+    def put(self, runs, csfr, rho_gas, efficiency):
+        """Write the results of the runs, with one row of csfr, rho_gas and
+        efficiency for each run, in a single commit.
+        """
+        tables = {}
+        for i, run in enumerate(runs):
+            key = self.key(run)
+            tables[(key, "parameters")] = asarray(json.dumps(
+                normalize(_runParameters(run)), sort_keys=True))
+            tables[(key, "csfr")] = csfr[i]
+            tables[(key, "rho_gas")] = rho_gas[i]
+            tables[(key, "efficiency")] = efficiency[i]
+        self.__tables.set_many(tables)
+
+    def get(self, run):
+        """Return the results of the run, a dictionary with csfr, rho_gas
+        and efficiency. Raise KeyError if the run is not in the store.
+        """
+        key = self.key(run)
+        return dict(zip(RESULTS, self.__tables.get_many(
+            [(key, name) for name in RESULTS])))
+
+    def runs(self):
+        """Return the parameters of the runs in the store"""
+        return [json.loads(self.__tables[key]) for key in self.__tables
+                if isinstance(key, tuple) and key[1] == "parameters"]
+
+
+def _chunks(runs, chunk):
+    """Return the list of the chunks of runs, each one the parameters
+    shared by its runs and the list of the runs, of at most chunk runs.
+    """
+    groups = {}
+    for run in runs:
+        shared = dict([(name, value) for name, value in run.items()
+                       if name not in ENSEMBLE_PARAMETERS])
+        groups.setdefault(tuple(sorted(shared.items())),
+                          (shared, []))[1].append(run)
+
+    return [(group, members[i:i + chunk])
+            for group, members in groups.values()
+            for i in range(0, len(members), chunk)]
+
+
+def _run(members, z):
+    """Return the CSFR, the gas density and the efficiency of the runs
+    members, integrated together, and the time spent.
+    """
+    start = time.time()
+    kwargs = dict(members[0])
+    cosmology = COSMOLOGIES[kwargs.pop("cosmology", "Lcdmcosmology")]
+    #The CSFR of the model itself is calculated only on its first use,
+    #so here only the ensemble is integrated.
+    model = get_model(Cosmicstarformation, cosmology, **kwargs)
+
+    parameters = [[run[name] for run in members] if name in members[0]
+                  else None for name in ENSEMBLE_PARAMETERS]
+    csfr, rho_gas, efficiency = model.ensembleResults(z, *parameters,
+                                                      fill=nan)
+    return csfr, rho_gas, efficiency, time.time() - start
+
+
+def sweep(grid, path, z=None, n_jobs=None, chunk=100, verbose=True,
+          executor=None):
+    """Run the models of grid that are not in the store path, write their
+    results to it and return the store.
+
+    Keyword arguments:
+        grid -- dictionary of parameters of Cosmicstarformation, with a
+                value or a list of values (see warmup)
+        path -- directory of the store (see ResultStore)
+        z -- (default the redshifts of the store) redshifts of the
+             results. The points out of the range of a model are nan.
+        n_jobs -- (default the processes of the shared executor, see
+                  executor.get_executor) number of processes. With one
+                  process the runs are done in the calling one.
+        chunk -- (default 100) maximum number of runs integrated together
+        verbose -- (default True) print the progress
+        executor -- (default the one of n_jobs, see executor.make_executor)
+                    executor.Executor of the stages and of the chunks
+
+    If a chunk fails, its runs are done again one by one. The results of
+    the runs that do not fail are stored, and the first error is raised
+    at the end.
+    """
+    check_grid(grid)
+    store = ResultStore(path, z)
+    z = store.getRedshifts()
+
+    stored = store.storedKeys()
+    runs = [run for run in expand_grid(grid)
+            if store.key(run) not in stored]
+    if(verbose):
+        print("[sweep] %d runs to do" % len(runs))
+    if(len(runs) == 0):
+        return store
+
+    ownExecutor = executor is None
+    if(ownExecutor):
+        executor = make_executor(None, n_jobs)
+
+    done = 0
+    errors = []
+    try:
+        run_stages(runs, verbose=verbose,
+                   stages=["cosmology", "structures"], executor=executor)
+        start = time.time()
+
+        if(executor.isParallel()):
+            #The runs are already done in parallel
+            runs = [dict(run, executor="serial") for run in runs]
+        pending = [members for group, members in _chunks(runs, chunk)]
+
+        while(len(pending) > 0):
+            retry = []
+            for members, future in executor.mapUnordered(
+                    partial(_run, z=z), pending):
+                try:
+                    csfr, rho_gas, efficiency, elapsed = future.result()
+                except Exception as error:
+                    #A run that fails fails the runs integrated with it, so
+                    #the runs of the chunk are done again one by one.
+                    if(len(members) > 1):
+                        retry.extend([[run] for run in members])
+                        if(verbose):
+                            print("[sweep] chunk of %d runs failed, running "
+                                  "them one by one: %s" % (len(members),
+                                                           error))
+                        continue
+                    errors.append(error)
+                    if(verbose):
+                        print("[sweep] 1 run failed: %s" % error)
+                    continue
+                store.put(members, csfr, rho_gas, efficiency)
+                done = done + len(members)
+                if(verbose):
+                    print("[sweep %d/%d] %d runs in %.2f s" % (done,
+                                                             len(runs),
+                                                             len(members),
+                                                             elapsed))
+                    sys.stdout.flush()
+            pending = retry
+    finally:
+        if(ownExecutor and executor is not get_executor()):
+            executor.shutdown()
+
+    if(len(errors) > 0):
+        raise errors[0]
+
+    if(verbose):
+        print("[sweep] %d runs in %.2f s" % (len(runs), time.time() - start))
+    return store
+
+
+def main(argv=None):
+    """Command line interface of the sweeps"""
+    parser = argparse.ArgumentParser(
+        prog="pycosmicstar-sweep",
+        description="Run a grid of models of pycosmicstar and store their "
+                    "results.")
+    parser.add_argument("grid", help="JSON file with the parameters of the "
+                        "models, each one a value or a list of values")
+    parser.add_argument("store", help="directory of the results")
+    parser.add_argument("--redshifts", nargs=3, type=float, default=None,
+                        metavar=("START", "STOP", "NUM"),
+                        help="redshifts of the results, NUM points from "
+                        "START to STOP (default the ones of the store, "
+                        "or 0 19 191)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="number of processes (default number of cpus)")
+    parser.add_argument("--chunk", type=int, default=100,
+                        help="maximum number of runs integrated together")
+    parser.add_argument("--dir", default=None, help="cache directory")
+    parser.add_argument("--quiet", action="store_true",
+                        help="do not print the progress")
+    args = parser.parse_args(argv)
+
+    with open(args.grid) as fileObject:
+        grid = json.load(fileObject)
+    if(args.dir is not None):
+        grid["cacheDir"] = args.dir
+
+    z = None
+    if(args.redshifts is not None):
+        z = linspace(args.redshifts[0], args.redshifts[1],
+                     int(args.redshifts[2]))
+
+    sweep(grid, args.store, z=z, n_jobs=args.jobs, chunk=args.chunk,
+          verbose=not args.quiet)
+    return 0
+
+
+if(__name__ == "__main__"):
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+
+"""Warm-up of the cache for a grid of models.
+
+The grid is a dictionary of the parameters of Cosmicstarformation, each
+one with a value or a list of values, e.g. the JSON file
+
+    {"omegam": [0.24, 0.27], "h": 0.7,
+     "massFunctionType": ["ST", "TK"], "tau": [2.0, 2.29, 3.0]}
+
+The models of the grid share tables: the tables of the cosmology do not
+depend on the mass function, and the tables of the structures do not
+depend on tau, eimf, nsch, imfType and the integrator. So the cache is
+filled in three stages, each one over a pool of processes and each one
+reusing the tables of the stage before:
+
+    cosmology -- one Structures for each cosmology, the sigma and
+                 redshift tables
+    structures -- one Structures for each mass function, the barionic
+                  accretion rate
+    csfr -- one Cosmicstarformation for each point of the grid
+
+From the command line:
+
+    pycosmicstar-warmup grid.json --jobs 8
+
+or python -m pycosmicstar.warmup.
+
+This file is part of pystar.
+copyright : Eduardo dos Santos Pereira
+
+pystar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+pystar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from functools import partial
+
+from .lcdmcosmology import Lcdmcosmology
+from .structures import Structures
+from .cosmicstarformation import Cosmicstarformation
+from .executor import make_executor, get_executor
+
+COSMOLOGIES = {"Lcdmcosmology": Lcdmcosmology}
+
+STAGES = ["cosmology", "structures", "csfr"]
+
+#Parameters of each stage, the parameters of a stage are also parameters of
+#the next ones.
+COSMOLOGY_PARAMETERS = ["cosmology", "omegam", "omegab", "omegal", "h",
+                        "cacheDir"]
+CSFR_PARAMETERS = ["tau", "eimf", "nsch", "imfType", "integrator",
+                   "integratorTol"]
+
+
+def _modelKey(model):
+    """Return the parameters of model as a tuple, equal for equal models,
+    to find them in a dictionary.
+    """
+    return tuple(sorted(model.items()))
+
+
+def expand_grid(grid):
+    """Return the list of the models of grid, a dictionary of parameters
+    with a value or a list of values. Repeated models are removed.
+    """
+    names = sorted(grid.keys())
+    values = [grid[name] if isinstance(grid[name], (list, tuple))
+              else [grid[name]] for name in names]
+    models = {}
+    for point in itertools.product(*values):
+        models.setdefault(point, dict(zip(names, point)))
+    return list(models.values())
+
+
+def _unique(models, exclude):
+    """Return the models without the parameters exclude, without
+    repetitions.
+    """
+    result = {}
+    for model in models:
+        reduced = dict([(name, value) for name, value in model.items()
+                        if name not in exclude])
+        result.setdefault(_modelKey(reduced), reduced)
+    return list(result.values())
+
+
+def stage_models(models):
+    """Return the models built by each stage of the warm-up of models. The
+    cosmology stage has one model for each cosmology, with the largest
+    zmax, and the structures stage one for each mass function.
+    """
+    structures = _unique(models, CSFR_PARAMETERS)
+
+    cosmology = {}
+    for model in structures:
+        key = tuple([model.get(name) for name in COSMOLOGY_PARAMETERS])
+        other = cosmology.get(key)
+        if(other is None or
+           model.get("zmax", 20.0) > other.get("zmax", 20.0)):
+            cosmology[key] = model
+
+    return {"cosmology": list(cosmology.values()),
+            "structures": structures, "csfr": models}
+
+
+def _build(stage, model):
+    """Build the model of the stage and return the time spent"""
+    start = time.time()
+    kwargs = dict(model)
+    cosmology = COSMOLOGIES[kwargs.pop("cosmology", "Lcdmcosmology")]
+
+    if(stage == "csfr"):
+        #The CSFR is calculated on its first use
+        Cosmicstarformation(cosmology, **kwargs).getEfficiency()
+    else:
+        kwargs.setdefault("zmax", 20.0)
+        structures = Structures(cosmology, **kwargs)
+        if(stage == "cosmology"):
+            for table in ["_sg", "_t_z", "_d_c2", "_rdm2", "_rbr2"]:
+                getattr(structures, table)
+        else:
+            structures._abt2
+
+    return time.time() - start
+
+
+def check_grid(grid):
+    """Raise NameError if a cosmology of grid is not defined, and create
+    the cache directory of grid if it does not exist.
+    """
+    value = grid.get("cosmology", "Lcdmcosmology")
+    for cosmology in (value if isinstance(value, (list, tuple))
+                      else [value]):
+        if(cosmology not in COSMOLOGIES):
+            raise NameError("Cosmology not defined: " + str(cosmology))
+
+    cacheDir = grid.get("cacheDir")
+    if(cacheDir is not None and not os.path.isdir(cacheDir)):
+        os.makedirs(cacheDir)
+
+
+def warmup(grid, n_jobs=None, verbose=True):
+    """Fill the cache with the tables of the models of grid, and return
+    the time spent by each stage.
+
+    Keyword arguments:
+        grid -- dictionary of parameters of Cosmicstarformation, with a
+                value or a list of values. cosmology is the name of the
+                cosmology (default 'Lcdmcosmology').
+        n_jobs -- (default the processes of the shared executor, see
+                  executor.get_executor) number of processes. With one
+                  process the models are built in the calling one.
+        verbose -- (default True) print the progress
+    """
+    check_grid(grid)
+    return run_stages(expand_grid(grid), n_jobs, verbose)
+
+
+def run_stages(models, n_jobs=None, verbose=True, stages=STAGES,
+               executor=None):
+    """Build the models, a list of dictionaries of parameters, by the
+    stages of the warm-up, and return the time spent by each stage. The
+    models are built by executor, by default the one of n_jobs processes
+    (see executor.make_executor).
+    """
+    ownExecutor = executor is None
+    if(ownExecutor):
+        executor = make_executor(None, n_jobs)
+
+    if(executor.isParallel()):
+        #The models are already built in parallel
+        models = [dict(model, executor="serial") for model in models]
+    todoStages = stage_models(models)
+
+    timings = {}
+    try:
+        for stage in stages:
+            start = time.time()
+            todo = todoStages[stage]
+            results = executor.mapUnordered(partial(_build, stage), todo)
+            for i, (model, future) in enumerate(results):
+                elapsed = future.result()
+                if(verbose):
+                    print("[%s %d/%d] %.2f s %s" % (stage, i + 1, len(todo),
+                                                   elapsed,
+                                                   _describe(model)))
+                    sys.stdout.flush()
+            timings[stage] = time.time() - start
+            if(verbose):
+                print("[%s] %d models in %.2f s" % (stage, len(todo),
+                                                   timings[stage]))
+    finally:
+        if(ownExecutor and executor is not get_executor()):
+            executor.shutdown()
+    return timings
+
+
+def _describe(model):
+    return " ".join(["%s=%s" % (name, model[name]) for name in sorted(model)
+                     if name not in ("executor", "cacheDir")])
+
+
+def main(argv=None):
+    """Command line interface of the warm-up"""
+    parser = argparse.ArgumentParser(
+        prog="pycosmicstar-warmup",
+        description="Fill the cache of pycosmicstar for a grid of models.")
+    parser.add_argument("grid", help="JSON file with the parameters of the "
+                        "models, each one a value or a list of values")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="number of processes (default number of cpus)")
+    parser.add_argument("--dir", default=None, help="cache directory")
+    parser.add_argument("--quiet", action="store_true",
+                        help="do not print the progress")
+    args = parser.parse_args(argv)
+
+    with open(args.grid) as fileObject:
+        grid = json.load(fileObject)
+    if(args.dir is not None):
+        grid["cacheDir"] = args.dir
+
+    start = time.time()
+    warmup(grid, n_jobs=args.jobs, verbose=not args.quiet)
+    if(not args.quiet):
+        print("total %.2f s" % (time.time() - start))
+    return 0
+
+
+if(__name__ == "__main__"):
+    sys.exit(main())
@@ -54,6 +54,13 @@ setup(
     install_requires=['numpy', 'scipy'],
     long_description=read('README'),
     ext_modules=Extensions,
+    entry_points={
+        'console_scripts': [
+            'pycosmicstar-cache = pycosmicstar.cachemanager:main',
+            'pycosmicstar-warmup = pycosmicstar.warmup:main',
+            'pycosmicstar-sweep = pycosmicstar.sweep:main',
+        ],
+    },
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Topic :: Utilities",
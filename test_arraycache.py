@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the array cache
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import time
+import unittest
+import tempfile
+import multiprocessing as mpg
+
+from numpy import arange, memmap
+from pycosmicstar.arraycache import ArrayCache
+from pycosmicstar.filedict import FileDict
+
+
+def _fillOnce(cacheName, logName):
+    myCache = ArrayCache(cacheName)
+    with myCache.lock('sg'):
+        if 'sg' not in myCache:
+            time.sleep(0.2)
+            with open(logName, "a") as logFile:
+                logFile.write("calculated\n")
+            myCache['sg'] = arange(3.0)
+
+
+class test_arraycache(unittest.TestCase):
+
+    def setUp(self):
+        self.cacheName = os.path.join(tempfile.mkdtemp(), "tables")
+        self.myCache = ArrayCache(self.cacheName)
+
+    def test_setGet(self):
+        self.myCache.update({'km': arange(10.0), ('fbt2', 6.0, 18.0):
+                             arange(5.0), 'esnor': 0.5})
+        myCache = ArrayCache(self.cacheName)
+        self.assertEqual(len(myCache), 3)
+        self.assertTrue(('fbt2', 6.0, 18.0) in myCache.keys())
+        self.assertEqual(list(myCache['km']), list(arange(10.0)))
+        self.assertEqual(myCache['esnor'], 0.5)
+        self.assertRaises(KeyError, myCache.__getitem__, 'sg')
+
+    def test_getMany(self):
+        self.myCache.set_many({'km': arange(3.0), 'esnor': 0.5})
+        km, esnor = ArrayCache(self.cacheName).get_many(['km', 'esnor'])
+        self.assertEqual(list(km), list(arange(3.0)))
+        self.assertEqual(esnor, 0.5)
+        self.assertRaises(KeyError, self.myCache.get_many, ['km', 'sg'])
+
+    def test_memoryMap(self):
+        self.myCache['km'] = arange(10.0)
+        self.assertTrue(isinstance(self.myCache['km'], memmap))
+        self.assertFalse(self.myCache['km'].flags.writeable)
+
+    def test_commitKeepsOtherTables(self):
+        otherCache = ArrayCache(self.cacheName)
+        self.myCache['km'] = arange(3.0)
+        otherCache['sg'] = arange(3.0)
+        self.assertEqual(sorted(ArrayCache(self.cacheName).keys()),
+                         ['km', 'sg'])
+        self.assertTrue('sg' in self.myCache)
+
+    def test_lock(self):
+        logName = self.cacheName + ".log"
+        processes = [mpg.Process(target=_fillOnce,
+                                 args=(self.cacheName, logName))
+                     for i in range(3)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        with open(logName) as logFile:
+            self.assertEqual(logFile.read(), "calculated\n")
+        self.assertEqual(list(self.myCache['sg']), list(arange(3.0)))
+
+    def test_migration(self):
+        cacheName = os.path.join(tempfile.mkdtemp(), "old")
+        oldCache = FileDict(filename=cacheName + ".cache")
+        oldCache['sg'] = arange(4.0)
+        oldCache['tck'] = (arange(4.0), arange(4.0), 3)
+        del oldCache
+        myCache = ArrayCache(cacheName)
+        self.assertEqual(myCache.keys(), ['sg'])
+        self.assertEqual(list(myCache['sg']), list(arange(4.0)))
+
+if(__name__ == "__main__"):
+    unittest.main()
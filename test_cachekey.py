@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the cache keys
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import unittest
+import tempfile
+
+from numpy import arange, float64, int64
+from pycosmicstar import cachekey
+from pycosmicstar.arraycache import ArrayCache
+
+
+class test_cachekey(unittest.TestCase):
+
+    parameters = {"omegab": 0.04, "h": 0.7, "delta_halo": 200,
+                  "massFunctionType": "TK"}
+
+    def test_normalizedParameters(self):
+        equivalent = {"massFunctionType": "TK", "delta_halo": int64(200),
+                      "h": float64(0.70), "omegab": 0.04 + 1.0e-16}
+        self.assertEqual(cachekey.cache_key("structures", self.parameters),
+                         cachekey.cache_key("structures", equivalent))
+
+    def test_differentParameters(self):
+        other = dict(self.parameters, delta_halo=300)
+        self.assertNotEqual(cachekey.cache_key("structures", self.parameters),
+                            cachekey.cache_key("structures", other))
+
+    def test_version(self):
+        key = cachekey.cache_key("structures", self.parameters)
+        cachekey.ALGORITHM_VERSIONS["structures"] += 1
+        try:
+            self.assertNotEqual(key, cachekey.cache_key("structures",
+                                                        self.parameters))
+        finally:
+            cachekey.ALGORITHM_VERSIONS["structures"] -= 1
+        self.assertRaises(NameError, cachekey.version_tag, "sweep")
+
+    def test_invalidation(self):
+        cacheName = os.path.join(tempfile.mkdtemp(), "tables")
+        myCache = ArrayCache(cacheName, version="1.1")
+        myCache['km'] = arange(3.0)
+        self.assertEqual(len(ArrayCache(cacheName, version="1.1")), 1)
+        myCache = ArrayCache(cacheName, version="1.2")
+        self.assertEqual(len(myCache), 0)
+        self.assertFalse([f for f in os.listdir(myCache.getDirectory())
+                          if f.endswith(".npy")])
+
+if(__name__ == "__main__"):
+    unittest.main()
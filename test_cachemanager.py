@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the cache manager
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import time
+import unittest
+import tempfile
+
+from numpy import zeros
+from pycosmicstar.arraycache import ArrayCache
+from pycosmicstar.cachemanager import CacheManager, parse_size, main
+
+
+class test_cachemanager(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def __fill(self, name, manager):
+        myCache = ArrayCache(os.path.join(self.directory, name))
+        myCache['sg'] = zeros(1000)
+        manager.access(myCache.getDirectory(), hit=False)
+        time.sleep(0.01)
+
+    def test_parseSize(self):
+        self.assertEqual(parse_size("1024"), 1024)
+        self.assertEqual(parse_size("2k"), 2048)
+        self.assertEqual(parse_size("1.5G"), int(1.5 * 1024 ** 3))
+        self.assertRaises(NameError, parse_size, "big")
+
+    def test_entries(self):
+        manager = CacheManager(self.directory)
+        self.__fill("a", manager)
+        self.__fill("b", manager)
+        oldFile = os.path.join(self.directory, "old.cache")
+        open(oldFile, "w").close()
+        os.utime(oldFile, (0, 0))
+        entries = manager.entries()
+        self.assertEqual([entry["name"] for entry in entries],
+                         ["old.cache", "a.arrays", "b.arrays"])
+        self.assertTrue(entries[1]["size"] > 8000)
+        self.assertEqual(manager.usage(),
+                         sum([entry["size"] for entry in entries]))
+
+    def test_lruEviction(self):
+        self.__fill("a", CacheManager(self.directory))
+        self.__fill("b", CacheManager(self.directory))
+        self.__fill("c", CacheManager(self.directory))
+        manager = CacheManager(self.directory)
+        manager.access(os.path.join(self.directory, "a.arrays"), hit=True)
+
+        size = manager.entries()[0]["size"]
+        removed = manager.evict(2 * size)
+        self.assertEqual(removed, ["b.arrays"])
+        self.assertFalse(os.path.exists(os.path.join(self.directory,
+                                                     "b.arrays")))
+
+        stats = manager.getStats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 3)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["entries"], 2)
+
+    def test_budget(self):
+        manager = CacheManager(self.directory)
+        self.__fill("a", manager)
+        size = manager.usage()
+        CacheManager(self.directory).setBudget(size)
+        otherManager = CacheManager(self.directory)
+        self.__fill("b", otherManager)
+        self.assertEqual([entry["name"] for entry in otherManager.entries()],
+                         ["b.arrays"])
+        self.assertEqual(otherManager.getBudget(), size)
+
+        #The tables of an entry removed are calculated again
+        myCache = ArrayCache(os.path.join(self.directory, "a"))
+        self.assertFalse('sg' in myCache)
+
+    def test_commandLine(self):
+        manager = CacheManager(self.directory)
+        self.__fill("a", manager)
+        self.assertEqual(main(["--dir", self.directory, "budget", "1M"]), 0)
+        self.assertEqual(manager.getBudget(), 1024 ** 2)
+        self.assertEqual(main(["--dir", self.directory, "stats"]), 0)
+        self.assertEqual(main(["--dir", self.directory, "clear"]), 0)
+        self.assertEqual(manager.entries(), [])
+
+
+if(__name__ == "__main__"):
+    unittest.main()
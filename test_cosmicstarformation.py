@@ -30,8 +30,11 @@ along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
 
 import unittest
+import tempfile
 
+from numpy import array, ma, linspace
 from pycosmicstar.cosmicstarformation import Cosmicstarformation
+from pycosmicstar.filedict import FileDict
 from pycosmicstar.lcdmcosmology import Lcdmcosmology
 
 
@@ -41,15 +44,147 @@ class test_cosmicstarformation(unittest.TestCase):
 
     def test_cosmicStarsDensity(self):
         self.assertEqual(
-            round(self.myCosmicStar.cosmicStarFormationRate(4.5), 3), 0.159)
+            round(self.myCosmicStar.cosmicStarFormationRate(4.5), 3), 0.152)
 
     def test_gasDensityInStructures(self):
         self.assertEqual(
             round(self.myCosmicStar.gasDensityInStructures(4.5)[0] / 1e8, 2),
-            3.98)
+            3.81)
+
+    def test_cosmicStarsDensityArray(self):
+        csfr = self.myCosmicStar.cosmicStarFormationRate(
+            array([0.0, 4.5, 30.0]))
+        self.assertEqual(csfr.shape, (3,))
+        self.assertEqual(csfr[1],
+                         self.myCosmicStar.cosmicStarFormationRate(4.5))
+        self.assertTrue(ma.is_masked(csfr))
+        self.assertTrue(csfr.mask[2])
+        self.assertRaises(NameError,
+                          self.myCosmicStar.cosmicStarFormationRate, 30.0)
+        self.assertEqual(
+            self.myCosmicStar.cosmicStarFormationRate(30.0, fill=0.0), 0.0)
+
+    def test_gasDensityInStructuresArray(self):
+        rho_gas = self.myCosmicStar.gasDensityInStructures(
+            array([[4.5], [30.0]]), fill=-1.0)
+        self.assertEqual(rho_gas.shape, (2, 1))
+        self.assertEqual(rho_gas[0, 0],
+                         self.myCosmicStar.gasDensityInStructures(4.5)[0])
+        self.assertEqual(rho_gas[1, 0], -1.0)
+
+    def test_integrator(self):
+        myCosmicStar = Cosmicstarformation(cosmology=Lcdmcosmology, tau=2.5,
+                                           integrator="rk45")
+        self.assertAlmostEqual(
+            myCosmicStar.cosmicStarFormationRate(4.5) /
+            self.myCosmicStar.cosmicStarFormationRate(4.5), 1.0, 3)
+        self.assertRaises(NameError, Cosmicstarformation,
+                          cosmology=Lcdmcosmology, integrator="euler")
+
+    def test_ensembleStarFormationRate(self):
+        csfr = self.myCosmicStar.ensembleStarFormationRate(
+            array([4.5, 30.0]), [2.5, 3.0], fill=0.0)
+        self.assertEqual(csfr.shape, (2, 2))
+        self.assertAlmostEqual(
+            csfr[0, 0] / self.myCosmicStar.cosmicStarFormationRate(4.5),
+            1.0, 10)
+        self.assertTrue(csfr[1, 0] < csfr[0, 0])
+        self.assertEqual(csfr[1, 1], 0.0)
+
+    def test_ensembleOtherCosmology(self):
+        z = array([0.5, 4.5, 10.0])
+        csfr = self.myCosmicStar.ensembleStarFormationRate(z, [2.5, 3.0])
+        #lcdmlib is initialised with the parameters of the new cosmology
+        Lcdmcosmology(omegam=0.35).age(1.0)
+        again = self.myCosmicStar.ensembleStarFormationRate(z, [2.5, 3.0])
+        self.assertEqual(again.tolist(), csfr.tolist())
+
+    def test_normalization(self):
+        self.assertAlmostEqual(
+            self.myCosmicStar.cosmicStarFormationRate(0.0) / 1.62593696e-2,
+            1.0, 10)
+        myCosmicStar = Cosmicstarformation(cosmology=Lcdmcosmology, tau=2.5,
+                                           nsch=2)
+        self.assertAlmostEqual(
+            myCosmicStar.cosmicStarFormationRate(0.0) / 1.62593696e-2,
+            1.0, 4)
+        myCosmicStar = Cosmicstarformation(cosmology=Lcdmcosmology, tau=2.5,
+                                           nsch=2, integrator="rk45")
+        self.assertAlmostEqual(
+            myCosmicStar.cosmicStarFormationRate(0.0) / 1.62593696e-2,
+            1.0, 3)
+        #No normalization gives the present CSFR
+        myCosmicStar = Cosmicstarformation(cosmology=Lcdmcosmology, tau=2.5,
+                                           nsch=0)
+        self.assertRaises(NameError, myCosmicStar.cosmicStarFormationRate,
+                          0.0)
+        myCosmicStar = Cosmicstarformation(cosmology=Lcdmcosmology, tau=0.0,
+                                           nsch=2)
+        self.assertRaises(NameError, myCosmicStar.getEfficiency)
+
+    def test_setDeltaHTinker(self):
+        cacheDir = tempfile.mkdtemp()
+        myCosmicStar = Cosmicstarformation(cosmology=Lcdmcosmology, tau=2.5,
+                                           massFunctionType="TK",
+                                           delta_halo=400, cacheDir=cacheDir)
+        csfr400 = myCosmicStar.cosmicStarFormationRate(4.5)
+        myCosmicStar.setDeltaHTinker(200)
+        csfr200 = Cosmicstarformation(cosmology=Lcdmcosmology, tau=2.5,
+                                      massFunctionType="TK",
+                                      cacheDir=tempfile.mkdtemp()
+                                      ).cosmicStarFormationRate(4.5)
+        self.assertNotAlmostEqual(csfr200 / csfr400, 1.0, 3)
+        self.assertEqual(myCosmicStar.cosmicStarFormationRate(4.5), csfr200)
+        self.assertEqual(Cosmicstarformation(cosmology=Lcdmcosmology,
+                                             tau=2.5, massFunctionType="TK",
+                                             delta_halo=400,
+                                             cacheDir=cacheDir
+                                             ).cosmicStarFormationRate(4.5),
+                         csfr400)
+
+    def test_legacyCache(self):
+        #The CSFR of the cache files of the older versions is not used,
+        #even with the tables of the structures in the cache
+        cacheDir = tempfile.mkdtemp()
+        Cosmicstarformation(cosmology=Lcdmcosmology, tau=3.0,
+                            cacheDir=cacheDir).getEfficiency()
+        oldCache = FileDict(filename=cacheDir + "/structures_cache_ST_0.04_"
+                            "0.24_0.73_ 0.7_6.0_18.0_20.0_CSFR_2.5_1.35_1_S"
+                            ".cache")
+        astar = linspace(0.05, 1.0, 100)
+        oldCache['astar'] = astar
+        oldCache['csfr'] = 123.0 + 0.0 * astar
+        oldCache['rho_gas'] = 123.0 + 0.0 * astar
+        oldCache['esnor'] = 7.0
+        myCosmicStar = Cosmicstarformation(cosmology=Lcdmcosmology, tau=2.5,
+                                           cacheDir=cacheDir)
+        self.assertEqual(myCosmicStar.cosmicStarFormationRate(4.5),
+                         self.myCosmicStar.cosmicStarFormationRate(4.5))
+        self.assertEqual(myCosmicStar.getEfficiency(),
+                         self.myCosmicStar.getEfficiency())
+
+    def test_massEjected(self):
+        myCosmicStar = Cosmicstarformation(cosmology=Lcdmcosmology, tau=2.5,
+                                           imfType="K")
+        #The table is exact at its nodes
+        tage = 10.0 ** linspace(7.0, 10.5, 1000)[[100, 500, 900]]
+        for value in (myCosmicStar.massEjected(tage) /
+                      myCosmicStar.massEjected(tage, exact=True)):
+            self.assertTrue(abs(value - 1.0) < 1.0e-10)
+
+        tage = array([5.0e8, 1.0e9, 2.0e9, 5.0e9])
+        for value in (myCosmicStar.massEjected(tage) /
+                      myCosmicStar.massEjected(tage, exact=True)):
+            self.assertTrue(abs(value - 1.0) < 1.0e-4)
+        #The closed form of the Salpeter IMF agrees with the integral to
+        #the tolerance of the integral
+        for value in (self.myCosmicStar.massEjected(tage) /
+                      self.myCosmicStar.massEjected(tage, exact=True)):
+            self.assertTrue(abs(value - 1.0) < 1.0e-3)
 
     def test_phi(self):
         self.assertEqual(round(self.myCosmicStar.phi(1e3), 11), 1.513e-08)
 
+
 if(__name__ == "__main__"):
     unittest.main()
@@ -61,6 +61,15 @@ class test_lcdmcosmology(unittest.TestCase):
     #def test_sigma(self):
     #    self.assertEqual(self.myUniverse.sigma(9.0)[0][0], 0.95424250943932487)
 
+    def test_sigmaExecutor(self):
+        kmass = 10.0 ** array([6.0, 8.0, 10.0, 12.0, 14.0, 16.0])
+        km, sg = self.myUniverse.sigma(kmass)
+        for backend in ["thread", "process"]:
+            myUniverse = Lcdmcosmology(executor=backend, n_jobs=2)
+            kmParallel, sgParallel = myUniverse.sigma(kmass)
+            self.assertEqual(list(kmParallel), list(km))
+            self.assertEqual(list(sgParallel), list(sg))
+
     def test_rodm(self):
         self.assertEqual(self.myUniverse.rodm(0)[0], 32457599999.999996)
 
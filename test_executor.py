@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the executor
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import unittest
+
+from numpy import arange
+from pycosmicstar.executor import Executor
+from pycosmicstar.lcdmcosmology import Lcdmcosmology
+
+
+class test_executor(unittest.TestCase):
+
+    myUniverse = Lcdmcosmology()
+    z = arange(0.0, 10.0, 0.1)
+
+    def test_backends(self):
+        age = [self.myUniverse.age(zi) for zi in self.z]
+        for backend in ["serial", "thread", "process"]:
+            myExecutor = Executor(backend, n_jobs=3)
+            self.assertEqual(list(myExecutor.map(self.myUniverse.age,
+                                                 self.z)), age)
+            myExecutor.shutdown()
+
+    def test_remainder(self):
+        myExecutor = Executor("thread", n_jobs=3, chunksPerJob=1)
+        x = arange(10.0)
+        self.assertEqual(list(myExecutor.map(abs, -x)), list(x))
+        myExecutor.shutdown()
+
+    def test_mapUnordered(self):
+        for backend in ["serial", "thread", "process"]:
+            myExecutor = Executor(backend, n_jobs=3)
+            results = dict([(item, future.result()) for item, future in
+                            myExecutor.mapUnordered(self.myUniverse.age,
+                                                    [0.0, 1.0, 2.0])])
+            self.assertEqual(results, dict([(zi, self.myUniverse.age(zi))
+                                            for zi in [0.0, 1.0, 2.0]]))
+            #An item that fails does not stop the others
+            futures = dict(myExecutor.mapUnordered(abs, [-1.0, "x", 2.0]))
+            self.assertEqual(futures[-1.0].result(), 1.0)
+            self.assertEqual(futures[2.0].result(), 2.0)
+            self.assertRaises(TypeError, futures["x"].result)
+            myExecutor.shutdown()
+
+    def test_backendNotDefined(self):
+        self.assertRaises(NameError, Executor, "mpi")
+
+if(__name__ == "__main__"):
+    unittest.main()
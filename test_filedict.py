@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the persistent dictionary
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import unittest
+import tempfile
+
+from numpy import arange
+from pycosmicstar.filedict import FileDict
+
+
+class test_filedict(unittest.TestCase):
+
+    def setUp(self):
+        self.fileName = os.path.join(tempfile.mkdtemp(), "tables.cache")
+        self.myDict = FileDict(filename=self.fileName)
+
+    def test_setMany(self):
+        self.myDict['km'] = arange(2.0)
+        self.myDict.set_many({'km': arange(3.0), ('fbt2', 6.0, 18.0): 1.5,
+                              'esnor': 0.5})
+        myDict = FileDict(filename=self.fileName)
+        self.assertEqual(len(myDict), 3)
+        self.assertEqual(list(myDict['km']), list(arange(3.0)))
+        self.assertEqual(myDict[('fbt2', 6.0, 18.0)], 1.5)
+
+    def test_getMany(self):
+        self.myDict.update({'km': arange(3.0), 'esnor': 0.5})
+        km, esnor, km2 = self.myDict.get_many(['km', 'esnor', 'km'])
+        self.assertEqual(list(km), list(arange(3.0)))
+        self.assertEqual(esnor, 0.5)
+        self.assertEqual(list(km2), list(arange(3.0)))
+        self.assertEqual(self.myDict.get_many([]), [])
+        self.assertRaises(KeyError, self.myDict.get_many, ['km', 'sg'])
+
+    def test_batch(self):
+        with self.myDict.batch as myDict:
+            myDict.update({'km': arange(3.0)})
+            myDict['esnor'] = 0.5
+        self.assertEqual(FileDict(filename=self.fileName).get_many(
+            ['esnor']), [0.5])
+
+
+if(__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the integrators
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import unittest
+
+from numpy import array, exp, linspace, abs
+from pycosmicstar.integrators import rk4, rk45, get_integrator
+from pycosmicstar.run_kut4 import rk4_int
+
+
+def _decay(x, y):
+    return -2.0 * y
+
+
+class test_integrators(unittest.TestCase):
+
+    def test_rk4(self):
+        X, Y, dense = rk4(_decay, 0.0, array([1.0]), 1.0, 0.03)
+        self.assertEqual(Y.shape, (len(X), 1))
+        self.assertEqual(X[-1], 1.0)
+        self.assertTrue(dense is None)
+        self.assertAlmostEqual(Y[-1, 0], exp(-2.0), 6)
+
+        Xold, Yold = rk4_int(_decay, 0.0, array([1.0]), 1.0, 0.03)
+        self.assertTrue((Xold == X).all() and (Yold == Y).all())
+        self.assertRaises(NameError, rk4, _decay, 0.0, array([1.0]), 1.0)
+
+    def test_rk4Dense(self):
+        X, Y, dense = rk4(_decay, 0.0, array([1.0]), 1.0, 0.01, dense=True)
+        x = linspace(0.0, 1.0, 37)
+        self.assertTrue((abs(dense(x)[:, 0] - exp(-2.0 * x)) < 1e-6).all())
+
+    def test_rk45(self):
+        X, Y, dense = rk45(_decay, 0.0, array([1.0]), 1.0, tol=1.0e-8)
+        self.assertTrue(len(X) < 100)
+        self.assertAlmostEqual(Y[-1, 0], exp(-2.0), 7)
+        x = linspace(0.0, 1.0, 37)
+        self.assertTrue((abs(dense(x)[:, 0] / exp(-2.0 * x) - 1.0)
+                         < 1e-6).all())
+
+    def test_getIntegrator(self):
+        self.assertTrue(get_integrator("rk45") is rk45)
+        self.assertRaises(NameError, get_integrator, "euler")
+
+
+if(__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the quadrature rules
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+
+import unittest
+import warnings
+
+from numpy import arctan, exp, stack, abs
+from pycosmicstar import quadrature
+from pycosmicstar.quadrature import spline_quad, gauss_legendre_quad, \
+    gauss_kronrod_quad
+
+
+def _peak(x):
+    return 1.0 / (1.0e-4 + x ** 2)
+
+
+def _twoColumns(x):
+    return stack([exp(x), x ** 2], axis=1)
+
+
+class test_quadrature(unittest.TestCase):
+
+    exact = exp(1.0) - 1.0
+    exactPeak = 200.0 * arctan(100.0)
+
+    def test_splineQuad(self):
+        #The spline ends at the last point of the grid, b - (b - a) / n
+        inte, err = spline_quad(exp, 0.0, 1.0, n=50)
+        self.assertAlmostEqual(inte / (exp(0.98) - 1.0), 1.0, 9)
+        #The error is the one of the last interval, the estimate follows it
+        self.assertTrue(0.9 * err < abs(inte - self.exact) < 1.1 * err)
+        self.assertTrue(abs(spline_quad(exp, 0.0, 1.0, n=10)[0] -
+                            self.exact) > abs(inte - self.exact))
+
+        inte, err = spline_quad(exp, 0.0, 1.0, n=10, tol=1.0e-3)
+        self.assertTrue(err <= 1.0e-3 * inte)
+        self.assertTrue(abs(inte - self.exact) < 1.1 * err)
+
+    def test_gaussLegendreQuad(self):
+        #Exact for polynomials of degree 2n - 1
+        inte, err = gauss_legendre_quad(lambda x: x ** 9, 0.0, 2.0, n=5)
+        self.assertAlmostEqual(inte / 102.4, 1.0, 12)
+        #The rule with n // 2 nodes is not
+        self.assertTrue(err > 1.0)
+
+        inte, err = gauss_legendre_quad(exp, 0.0, 1.0, n=2, tol=1.0e-12)
+        self.assertAlmostEqual(inte / self.exact, 1.0, 12)
+        self.assertTrue(err <= 1.0e-12 * inte)
+
+    def test_gaussKronrodQuad(self):
+        inte, err = gauss_kronrod_quad(_peak, -1.0, 1.0, tol=1.0e-10)
+        self.assertTrue(abs(inte / self.exactPeak - 1.0) < 1.0e-10)
+        self.assertTrue(err <= 1.0e-10 * inte)
+        inte, err = gauss_kronrod_quad(_peak, -1.0, 1.0)
+        self.assertTrue(abs(inte / self.exactPeak - 1.0) < 1.0e-6)
+        self.assertTrue(err <= 1.0e-6 * inte)
+        #With few subintervals it stops early, with a larger error
+        with self.assertWarns(RuntimeWarning):
+            inte, err = gauss_kronrod_quad(_peak, -1.0, 1.0, tol=1.0e-10,
+                                           maxIntervals=2)
+        self.assertTrue(err > 1.0e-3 * inte)
+        self.assertTrue(abs(inte - self.exactPeak) < err)
+
+    def test_maxPoints(self):
+        #The rules warn when MAXPOINTS stops them before the tolerance
+        maxPoints = quadrature.MAXPOINTS
+        quadrature.MAXPOINTS = 200
+        try:
+            with self.assertWarns(RuntimeWarning):
+                inte, err = spline_quad(_peak, -1.0, 1.0, tol=1.0e-10)
+            self.assertTrue(err > 1.0e-10 * inte)
+            with self.assertWarns(RuntimeWarning):
+                inte, err = gauss_legendre_quad(_peak, -1.0, 1.0,
+                                                tol=1.0e-10)
+            self.assertTrue(err > 1.0e-10 * inte)
+        finally:
+            quadrature.MAXPOINTS = maxPoints
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            spline_quad(exp, 0.0, 1.0, n=10, tol=1.0e-3)
+            gauss_legendre_quad(exp, 0.0, 1.0, n=2, tol=1.0e-12)
+            gauss_kronrod_quad(_peak, -1.0, 1.0, tol=1.0e-10)
+
+    def test_columns(self):
+        exact = [self.exact, 1.0 / 3.0]
+        #The spline ends at 0.98
+        inte, err = spline_quad(_twoColumns, 0.0, 1.0)
+        self.assertEqual(inte.shape, (2,))
+        self.assertEqual(err.shape, (2,))
+        self.assertAlmostEqual(inte[0] / (exp(0.98) - 1.0), 1.0, 9)
+        self.assertAlmostEqual(inte[1] / (0.98 ** 3 / 3.0), 1.0, 9)
+
+        for quad, kwargs in [(gauss_legendre_quad, {"n": 8}),
+                             (gauss_kronrod_quad, {})]:
+            inte, err = quad(_twoColumns, 0.0, 1.0, **kwargs)
+            self.assertEqual(inte.shape, (2,))
+            self.assertEqual(err.shape, (2,))
+            for i in range(2):
+                self.assertAlmostEqual(inte[i] / exact[i], 1.0, 10)
+                self.assertTrue(err[i] < 1.0e-6 * inte[i])
+
+if(__name__ == "__main__"):
+    unittest.main()
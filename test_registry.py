@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the registry of models
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import gc
+import weakref
+import unittest
+import tempfile
+
+from pycosmicstar.lcdmcosmology import Lcdmcosmology
+from pycosmicstar.structures import Structures
+from pycosmicstar.cosmicstarformation import Cosmicstarformation
+from pycosmicstar.registry import get_model, shared_tables, clear, is_shared
+
+
+class test_registry(unittest.TestCase):
+
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        clear()
+
+    def test_getModel(self):
+        myStructures = get_model(Structures, Lcdmcosmology,
+                                 cacheDir=self.cacheDir, omegam=0.24)
+        self.assertTrue(get_model(Structures, Lcdmcosmology,
+                                  cacheDir=self.cacheDir,
+                                  omegam=0.2400) is myStructures)
+        self.assertFalse(get_model(Structures, Lcdmcosmology,
+                                   cacheDir=self.cacheDir,
+                                   omegam=0.25) is myStructures)
+
+    def test_weakReference(self):
+        myStructures = get_model(Structures, Lcdmcosmology,
+                                 cacheDir=self.cacheDir)
+        reference = weakref.ref(myStructures)
+        del myStructures
+        gc.collect()
+        self.assertTrue(reference() is None)
+        tables = shared_tables("structures", {"cacheDir": self.cacheDir})
+        self.assertEqual(len(tables), 0)
+
+    def test_sharedTables(self):
+        myCSFR = Cosmicstarformation(Lcdmcosmology, cacheDir=self.cacheDir,
+                                     zmax=10.0, tau=2.0)
+        otherCSFR = Cosmicstarformation(Lcdmcosmology, cacheDir=self.cacheDir,
+                                        zmax=10.0, tau=3.0)
+        self.assertTrue(otherCSFR._abt2 is myCSFR._abt2)
+        self.assertTrue(otherCSFR._sg is myCSFR._sg)
+        self.assertNotEqual(otherCSFR.cosmicStarFormationRate(1.0),
+                            myCSFR.cosmicStarFormationRate(1.0))
+
+    def test_sharedModelNotChanged(self):
+        myStructures = get_model(Structures, Lcdmcosmology,
+                                 cacheDir=self.cacheDir,
+                                 massFunctionType="TK")
+        self.assertTrue(is_shared(myStructures))
+        self.assertRaises(NameError, myStructures.setDeltaHTinker, 400)
+        self.assertRaises(NameError, myStructures.setQBurrFunction, 0.5)
+        self.assertRaises(NameError, myStructures.setMassFunctionDict,
+                          "X", None)
+        self.assertEqual(myStructures.getDeltaHTinker(), 200)
+        myCSFR = get_model(Cosmicstarformation, Lcdmcosmology,
+                           cacheDir=self.cacheDir, zmax=10.0)
+        self.assertRaises(NameError, myCSFR.putIMFDict, "X", None)
+        clear()
+        self.assertTrue(is_shared(myStructures))
+        #The models built with their class can be changed
+        myStructures = Structures(Lcdmcosmology, cacheDir=self.cacheDir,
+                                  massFunctionType="TK")
+        self.assertFalse(is_shared(myStructures))
+        self.assertTrue(myStructures.setDeltaHTinker(400))
+
+
+if(__name__ == "__main__"):
+    unittest.main()
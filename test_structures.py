@@ -25,8 +25,13 @@ along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 import unittest
+import tempfile
+import pickle
 
-from pycosmicstar.structures import Structures
+from numpy import array, ma, log, abs
+from pycosmicstar.structures import Structures, _smoothSigma
+from pycosmicstar.diferencial import dfridr, locate
+from pycosmicstar.filedict import FileDict
 from pycosmicstar.lcdmcosmology import Lcdmcosmology
 
 
@@ -36,15 +41,212 @@ class test_structures(unittest.TestCase):
 
     def test_massFunction(self):
         self.assertEqual(round(self.myStructures.massFunction(9.0, 1.0), 11),
-                          8.45e-09)
+                          8.46e-09)
+
+    def test_massFunctionArray(self):
+        lm = array([7.0, 9.0, 12.0])
+        z = array([[0.0], [1.0]])
+        dn_dm = self.myStructures.massFunction(lm, z)
+        self.assertEqual(dn_dm.shape, (2, 3))
+        self.assertEqual(round(dn_dm[1, 1], 11), 8.46e-09)
+        self.assertAlmostEqual(dn_dm[0, 2] /
+                               self.myStructures.massFunction(12.0, 0.0), 1.0)
+
+    def test_massFunctionArrayMasked(self):
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       massFunctionType="WT2")
+        dn_dm = self.myStructures.massFunction(9.0, array([-0.5, 1.0]))
+        self.assertTrue(ma.is_masked(dn_dm))
+        self.assertTrue(dn_dm.mask[0])
+        self.assertFalse(dn_dm.mask[1])
+        self.assertRaises(NameError, self.myStructures.massFunction, 9.0, -0.5)
+
+    def test_lazyTables(self):
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       cacheDir=tempfile.mkdtemp())
+        self.assertEqual(len(self.myStructures._cache_dict), 0)
+        self.myStructures.massFunction(9.0, 1.0)
+        self.assertEqual(len(self.myStructures._cache_dict), 0)
+        n = len(self.myStructures._km)
+        self.assertEqual(
+            sorted(self.myStructures._cosmology_cache_dict.keys(), key=str),
+            [('dsg', n), ('sgs', n), 'km', 'sg'])
+
+    def test_sharedCosmologyTables(self):
+        cacheDir = tempfile.mkdtemp()
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       cacheDir=cacheDir)
+        sgm = self.myStructures.fstm(12.0)
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       cacheDir=cacheDir,
+                                       massFunctionType="PS")
+        self.assertTrue('sg' in self.myStructures._cosmology_cache_dict)
+        self.assertEqual(self.myStructures.fstm(12.0), sgm)
+        self.assertEqual(len(self.myStructures._cache_dict), 0)
+
+    def test_lazyTablesOtherCosmology(self):
+        cacheDir = tempfile.mkdtemp()
+        myStructures = Structures(cosmology=Lcdmcosmology, omegam=0.24,
+                                  cacheDir=cacheDir)
+        Structures(cosmology=Lcdmcosmology, omegam=0.35,
+                   cacheDir=cacheDir)._t_z
+        t_z = myStructures._t_z
+        self.myStructures = Structures(cosmology=Lcdmcosmology, omegam=0.24,
+                                       cacheDir=tempfile.mkdtemp())
+        self.assertEqual(list(t_z), list(self.myStructures._t_z))
+
+    def test_legacyCache(self):
+        #Cache file of the model written by the older versions, with the
+        #tables of the redshifts on an other grid
+        cacheDir = tempfile.mkdtemp()
+        oldCache = FileDict(filename=cacheDir + "/structures_cache_ST_0.04_"
+                            "0.24_0.73_ 0.7_6.0_18.0_20.0.cache")
+        km = self.myStructures._km
+        for key in ['scale', 'zred', 't_z', 'd_c2', 'rdm2', 'rbr2']:
+            oldCache[key] = km
+        oldCache['km'] = km
+        oldCache['sg'] = 2.0 * self.myStructures._sg
+        oldCache['abt2'] = km[:1001]
+        oldCache['ascale'] = km[:1001]
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       cacheDir=cacheDir)
+        self.assertEqual(
+            sorted(self.myStructures._cosmology_cache_dict.keys()),
+            ['km', 'sg'])
+        self.assertEqual(len(self.myStructures._cache_dict), 0)
+        self.assertAlmostEqual(self.myStructures.fstm(12.0) /
+                               test_structures.myStructures.fstm(12.0), 2.0)
+
+    def test_extendedTables(self):
+        cacheDir = tempfile.mkdtemp()
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       cacheDir=cacheDir, zmax=10.0)
+        abt = self.myStructures.abt(0.5)
+        fbt2 = self.myStructures._cache_dict[('fbt2', 6.0, 18.0)]
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       cacheDir=cacheDir, zmax=12.0)
+        self.assertEqual(len(self.myStructures._abt2), 601)
+        self.assertFalse(self.myStructures._structuresInCache)
+        fbt2Wide = self.myStructures._cache_dict[('fbt2', 6.0, 18.0)]
+        self.assertEqual(len(fbt2Wide), 601)
+        self.assertTrue((fbt2Wide[:501] == fbt2).all())
+        self.assertAlmostEqual(self.myStructures.abt(0.5) / abt, 1.0, 3)
+
+    def test_executor(self):
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       cacheDir=tempfile.mkdtemp(),
+                                       executor="thread", n_jobs=2)
+        self.assertEqual(self.myStructures._executor.getBackend(),
+                         ("thread", 2))
+        self.assertAlmostEqual(self.myStructures.abt(0.5) /
+                               test_structures.myStructures.abt(0.5), 1.0)
+        self.assertRaises(NameError, Structures, cosmology=Lcdmcosmology,
+                          executor="mpi")
+
+    def test_pickle(self):
+        myCopy = pickle.loads(pickle.dumps(self.myStructures))
+        self.assertEqual(myCopy.halos_n(1.0), self.myStructures.halos_n(1.0))
+        self.assertEqual(myCopy._executor.getBackend()[0], "serial")
 
     def test_fstm(self):
         self.assertEqual(round(self.myStructures.fstm(6.0), 2),
-                          515.94)
+                          515.85)
+
+    def test_fstmArray(self):
+        sgm = self.myStructures.fstm(array([6.0, 9.0]))
+        self.assertEqual(sgm.shape, (2,))
+        self.assertEqual(sgm[1], self.myStructures.fstm(9.0))
+
+    def test_massSigma(self):
+        sgm = self.myStructures.fstm(array([6.3, 9.7]))
+        self.assertEqual(
+            [round(lm, 3) for lm in self.myStructures.massSigma(sgm)],
+            [6.3, 9.7])
+
+    def test_dsgm_dlgm(self):
+        self.assertEqual(round(self.myStructures.dsgm_dlgm(9.0), 2),
+                          -89.66)
+        #The derivative of the spline of fstm
+        lm = array([6.0, 9.3, 12.7, 17.5])
+        dsgm_dlgm = self.myStructures.dsgm_dlgm(lm)
+        h = 1.0e-4
+        for i in range(len(lm)):
+            self.assertEqual(dsgm_dlgm[i], self.myStructures.dsgm_dlgm(lm[i]))
+            self.assertAlmostEqual(
+                (self.myStructures.fstm(lm[i] + h) -
+                 self.myStructures.fstm(lm[i] - h)) / (2.0 * h) /
+                dsgm_dlgm[i], 1.0, 5)
+
+    def test_smoothSigma(self):
+        km = self.myStructures._km
+        sg = self.myStructures._sg
+        sgs, dsg = _smoothSigma(km, sg)
+        self.assertTrue((abs(log(sgs / sg)) <= 1.0e-3).mean() > 0.95)
+        #A block of bad points of the table is left out of the spline
+        sgBad = sg.copy()
+        sgBad[5000:5050] = 1.5 * sgBad[5000:5050]
+        sgsBad, dsgBad = _smoothSigma(km, sgBad)
+        self.assertTrue((abs(sgsBad / sgs - 1.0) < 1.0e-5).all())
+        self.assertTrue((abs(dsgBad - dsg) < 1.0e-5 * abs(dsg).max()).all())
+
+    def test_sigmaDerivativeDfridr(self):
+        #The sigma and the derivative of the older versions
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       sigmaDerivative="dfridr")
+        self.assertEqual(round(self.myStructures.massFunction(9.0, 1.0), 11),
+                          8.45e-09)
+        self.assertEqual(round(self.myStructures.halos_n(0.0), 2),
+                          23602166227.09)
+        self.assertEqual(round(self.myStructures.dsgm_dlgm(9.0), 2),
+                          -89.57)
+        #The derivative of dfridr over the step function of the table
+        km = self.myStructures._km
+        sg = self.myStructures._sg
+        lm = array([6.0, 9.3, 12.7, 17.99])
+        dsgm_dlgm = self.myStructures.dsgm_dlgm(lm)
+        for i in range(len(lm)):
+            self.assertEqual(dsgm_dlgm[i],
+                             dfridr(lambda x: sg[locate(km, len(km) - 1, x)],
+                                    lm[i], lm[i] / 2.0e+1, err=0.0))
+        self.assertNotEqual(self.myStructures._cacheParameters,
+                            test_structures.myStructures._cacheParameters)
+        self.assertRaises(NameError, Structures, cosmology=Lcdmcosmology,
+                          sigmaDerivative="ridders")
 
     def test_halos_n(self):
         self.assertEqual(round(self.myStructures.halos_n(0.0), 2),
-                          23584651682.25)
+                          23637715508.57)
+
+    def test_halos_nArray(self):
+        halos = self.myStructures.halos_n(array([0.0, 2.0]))
+        self.assertEqual(halos.shape, (2,))
+        self.assertAlmostEqual(halos[0] / self.myStructures.halos_n(0.0), 1.0)
+        self.assertAlmostEqual(halos[1] / self.myStructures.halos_n(2.0), 1.0)
+
+    def test_halos_nErrorEstimate(self):
+        halos, err = self.myStructures.halos_n(0.0, errorEstimate=True)
+        self.assertEqual(halos, self.myStructures.halos_n(0.0))
+        self.assertTrue(0.0 < err < 0.05 * halos)
+
+    def test_halos_nGaussQuadrature(self):
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       quadrature="gauss",
+                                       quadraturePoints=20)
+        halos, err = self.myStructures.halos_n(0.0, errorEstimate=True)
+        self.assertAlmostEqual(halos / 23637715508.57, 1.0, 1)
+        self.assertTrue(err < 0.05 * halos)
+
+    def test_halos_nKronrodQuadrature(self):
+        myStructures = Structures(cosmology=Lcdmcosmology,
+                                  quadrature="kronrod", quadratureTol=1.0e-8)
+        halos, err = myStructures.halos_n(0.0, errorEstimate=True)
+        self.assertEqual(round(halos / 1.0e+3), 23594029)
+        self.assertTrue(err < 1.0e-8 * halos)
+        reference = Structures(cosmology=Lcdmcosmology,
+                               quadratureTol=1.0e-7).halos_n(0.0)
+        self.assertAlmostEqual(halos / reference, 1.0, 7)
+        self.assertAlmostEqual(
+            myStructures.halos_n(array([0.0, 2.0]))[0] / halos, 1.0, 7)
 
     def test_fbstruc(self):
         self.assertEqual(round(self.myStructures.fbstruc(0.0), 2),
@@ -53,11 +255,20 @@ class test_structures(unittest.TestCase):
     def test_numerical_density_halos(self):
         self.assertEqual(
             round(self.myStructures.numerical_density_halos(0.0), 7),
-                          6.76e-05)
+                          6.77e-05)
 
     def test_abt(self):
         self.assertEqual(round(self.myStructures.abt(1.0), 4),
-                            0.0082)
+                            0.0093)
+
+    def test_abtArray(self):
+        ascale = self.myStructures._ascale
+        abt = self.myStructures.abt(array([ascale[10], 0.5, 1.0]))
+        self.assertEqual(abt.shape, (3,))
+        self.assertAlmostEqual(abt[0] / self.myStructures._abt2[10], 1.0)
+        self.assertEqual(abt[2], self.myStructures.abt(1.0))
+        self.assertEqual(self.myStructures.abt(0.01),
+                         self.myStructures._abt2[0])
 
     def test_creatCachDiretory(self):
         self.assertTrue(self.myStructures.getCacheDir()[0],
@@ -68,11 +279,41 @@ class test_structures(unittest.TestCase):
                                        massFunctionType="TK")
         self.assertTrue(self.myStructures.setDeltaHTinker(200))
 
+    def test_setDeltaHTinkerMassFunction(self):
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       massFunctionType="TK")
+        dn_dm200 = self.myStructures.massFunction(9.0, 1.0)
+        self.myStructures.setDeltaHTinker(400)
+        self.assertNotEqual(self.myStructures.massFunction(9.0, 1.0),
+                            dn_dm200)
+        self.myStructures.setDeltaHTinker(200)
+        self.assertEqual(self.myStructures.massFunction(9.0, 1.0), dn_dm200)
+
+    def test_setDeltaHTinkerTables(self):
+        cacheDir = tempfile.mkdtemp()
+        self.myStructures = Structures(cosmology=Lcdmcosmology,
+                                       massFunctionType="TK", zmax=10.0,
+                                       cacheDir=cacheDir, delta_halo=400)
+        abt400 = self.myStructures.abt(0.5)
+        self.myStructures.setDeltaHTinker(200)
+        abt200 = Structures(cosmology=Lcdmcosmology, massFunctionType="TK",
+                            zmax=10.0, cacheDir=tempfile.mkdtemp()).abt(0.5)
+        self.assertNotAlmostEqual(abt200 / abt400, 1.0, 3)
+        self.assertEqual(self.myStructures.abt(0.5), abt200)
+        #The tables of the cache are the ones of their delta_halo
+        self.assertEqual(Structures(cosmology=Lcdmcosmology,
+                                    massFunctionType="TK", zmax=10.0,
+                                    cacheDir=cacheDir).abt(0.5), abt200)
+        self.assertEqual(Structures(cosmology=Lcdmcosmology,
+                                    massFunctionType="TK", zmax=10.0,
+                                    cacheDir=cacheDir,
+                                    delta_halo=400).abt(0.5), abt400)
+
     def test_massfunctioR(self):
         self.myStructures = Structures(cosmology=Lcdmcosmology,
                                        massFunctionType="R")
         self.assertEqual(round(self.myStructures.massFunction(9.0, 1.0), 11),
-                          8.45e-09)
+                          8.46e-09)
 
     def test_fbstrucR(self):
         self.myStructures = Structures(cosmology=Lcdmcosmology,
@@ -84,7 +325,7 @@ class test_structures(unittest.TestCase):
         self.myStructures = Structures(cosmology=Lcdmcosmology,
                                        massFunctionType="PS")
         self.assertEqual(round(self.myStructures.massFunction(9.0, 1.0), 11),
-                          4.54e-09)
+                          4.55e-09)
 
     def test_fbstrucPS(self):
         self.myStructures = Structures(cosmology=Lcdmcosmology,
@@ -114,7 +355,7 @@ class test_structures(unittest.TestCase):
         self.myStructures = Structures(cosmology=Lcdmcosmology,
                                        massFunctionType="WT2")
         self.assertEqual(round(self.myStructures.fbstruc(0.0), 2),
-                          0.87)
+                          0.88)
 
     #def test_massfunctioJK(self):
         #self.myStructures = Structures(cosmology=Lcdmcosmology,
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the sweeps of models
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import unittest
+import tempfile
+
+from numpy import array, isnan
+
+from pycosmicstar.lcdmcosmology import Lcdmcosmology
+from pycosmicstar.cosmicstarformation import Cosmicstarformation
+from pycosmicstar.executor import Executor
+from pycosmicstar.sweep import ResultStore, sweep, _chunks
+
+
+class test_sweep(unittest.TestCase):
+
+    def test_chunks(self):
+        runs = [{"massFunctionType": mf, "tau": tau}
+                for mf in ["ST", "TK"] for tau in [2.0, 2.5, 3.0]]
+        chunks = _chunks(runs, 2)
+        self.assertEqual([len(members) for group, members in chunks],
+                         [2, 1, 2, 1])
+        self.assertEqual(chunks[2][0], {"massFunctionType": "TK"})
+        #The runs of a group are together whatever their order
+        chunks = _chunks(runs[::2] + runs[1::2], 3)
+        self.assertEqual([(group["massFunctionType"], len(members))
+                          for group, members in chunks],
+                         [("ST", 3), ("TK", 3)])
+
+    def test_sweep(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "results")
+        grid = {"cacheDir": os.path.join(directory, "cache"), "zmax": 10.0,
+                "tau": [2.0, 2.5], "nsch": [1, 2]}
+        z = array([0.0, 4.5, 12.0])
+
+        store = sweep(grid, path, z=z, n_jobs=1, verbose=False)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.storedKeys(),
+                         set([store.key({"zmax": 10.0, "tau": tau,
+                                         "nsch": nsch})
+                              for tau in [2.0, 2.5] for nsch in [1, 2]]))
+
+        results = store.get({"zmax": 10.0, "tau": 2.5, "nsch": 2})
+        myCSFR = Cosmicstarformation(Lcdmcosmology, cacheDir=grid["cacheDir"],
+                                     zmax=10.0, tau=2.5, nsch=2)
+        self.assertAlmostEqual(
+            results["csfr"][1] / myCSFR.cosmicStarFormationRate(4.5), 1.0, 10)
+        self.assertTrue(isnan(results["rho_gas"][2]))
+        self.assertAlmostEqual(results["efficiency"],
+                               myCSFR.getEfficiency()[0], 10)
+
+        #Only the new runs are done
+        grid["tau"] = [2.0, 2.5, 3.0]
+        store = sweep(grid, path, n_jobs=1, verbose=False)
+        self.assertEqual(len(store), 6)
+        self.assertEqual(list(store.getRedshifts()), list(z))
+        self.assertRaises(NameError, ResultStore, path, z=[1.0])
+        self.assertRaises(KeyError, store.get, {"zmax": 10.0, "tau": 4.0,
+                                                "nsch": 1})
+
+    def test_sweepProcesses(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "results")
+        grid = {"cacheDir": os.path.join(directory, "cache"), "zmax": 10.0,
+                "tau": 2.5, "nsch": [1, 0, 2]}
+
+        #The run of nsch = 0 fails, its chunk is run again one by one and
+        #the other runs are stored
+        self.assertRaises(NameError, sweep, grid, path, z=array([4.5]),
+                          n_jobs=2, verbose=False)
+        store = ResultStore(path)
+        self.assertEqual(len(store), 2)
+        self.assertRaises(KeyError, store.get, {"zmax": 10.0, "tau": 2.5,
+                                                "nsch": 0})
+        serialPath = os.path.join(directory, "serial")
+        self.assertRaises(NameError, sweep, grid, serialPath,
+                          z=array([4.5]), n_jobs=1, verbose=False)
+        self.assertEqual(len(ResultStore(serialPath)), 2)
+        myExecutor = Executor("process", n_jobs=2)
+        executorPath = os.path.join(directory, "executor")
+        self.assertRaises(NameError, sweep, grid, executorPath,
+                          z=array([4.5]), chunk=1, verbose=False,
+                          executor=myExecutor)
+        self.assertEqual(len(ResultStore(executorPath)), 2)
+        #The executor given is not stopped
+        self.assertTrue(myExecutor._Executor__pool is not None)
+        myExecutor.shutdown()
+        #The runs do not calculate the CSFR of single models
+        self.assertEqual([name for name in os.listdir(grid["cacheDir"])
+                          if name.startswith("csfr")], [])
+
+        myCSFR = Cosmicstarformation(Lcdmcosmology, cacheDir=grid["cacheDir"],
+                                     zmax=10.0, tau=2.5, nsch=2)
+        self.assertAlmostEqual(
+            store.get({"zmax": 10.0, "tau": 2.5, "nsch": 2})["csfr"][0] /
+            myCSFR.cosmicStarFormationRate(4.5), 1.0, 10)
+
+
+if(__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# *-* Coding: UTF-8 *-*
+
+__author__ = "Eduardo dos Santos Pereira"
+__email__ = "pereira.somoza@gmail.com"
+__credits__ = ["Eduardo dos Santos Pereira"]
+__license__ = "GPLV3"
+__version__ = "1.0.1"
+__maintainer__ = "Eduardo dos Santos Pereira"
+__status__ = "Stable"
+
+"""Unit Test module for the warm-up of the cache
+
+This file is part of cosmicstar.
+copyright : Eduardo dos Santos Pereira
+
+cosmicstar is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License.
+cosmicstar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import unittest
+import tempfile
+
+from pycosmicstar.lcdmcosmology import Lcdmcosmology
+from pycosmicstar.cosmicstarformation import Cosmicstarformation
+from pycosmicstar.cachemanager import CacheManager
+from pycosmicstar.executor import Executor
+from pycosmicstar.warmup import expand_grid, stage_models, warmup, \
+    run_stages
+
+
+class test_warmup(unittest.TestCase):
+
+    def test_stages(self):
+        grid = {"omegam": [0.24, 0.3], "h": 0.7, "zmax": [10.0, 20.0],
+                "massFunctionType": ["ST", "TK"], "tau": [2.0, 2.29, 2.29]}
+        models = expand_grid(grid)
+        self.assertEqual(len(models), 16)
+        stages = stage_models(models)
+        self.assertEqual(len(stages["structures"]), 8)
+        self.assertEqual(len(stages["cosmology"]), 2)
+        self.assertEqual([model["zmax"] for model in stages["cosmology"]],
+                         [20.0, 20.0])
+        self.assertRaises(NameError, warmup, {"cosmology": "wCDM"})
+
+    def test_warmup(self):
+        cacheDir = tempfile.mkdtemp()
+        timings = warmup({"cacheDir": cacheDir, "zmax": 10.0}, n_jobs=1,
+                         verbose=False)
+        self.assertEqual(sorted(timings.keys()),
+                         ["cosmology", "csfr", "structures"])
+
+        manager = CacheManager(cacheDir)
+        manager.resetStats()
+        myCSFR = Cosmicstarformation(Lcdmcosmology, cacheDir=cacheDir,
+                                     zmax=10.0)
+        myCSFR.getEfficiency()
+        self.assertTrue(myCSFR._structuresInCache)
+        stats = manager.getStats()
+        self.assertEqual(stats["misses"], 0)
+        self.assertEqual(stats["hits"], 3)
+
+    def test_runStagesExecutor(self):
+        cacheDir = tempfile.mkdtemp()
+        myExecutor = Executor("thread", n_jobs=2)
+        models = expand_grid({"cacheDir": cacheDir, "zmax": 10.0,
+                              "tau": [2.0, 3.0]})
+        timings = run_stages(models, verbose=False, executor=myExecutor)
+        self.assertEqual(sorted(timings.keys()),
+                         ["cosmology", "csfr", "structures"])
+        self.assertTrue(Cosmicstarformation(Lcdmcosmology, cacheDir=cacheDir,
+                                            zmax=10.0,
+                                            tau=3.0)._structuresInCache)
+        #The executor given is not stopped
+        self.assertTrue(myExecutor._Executor__pool is not None)
+        myExecutor.shutdown()
+
+
+if(__name__ == "__main__"):
+    unittest.main()